@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Print the analysis of some decks (see game/deck_analysis.py), e.g. to select decks for benchmarks.
+Usage: python analyse_decks.py [-n NUM_PLAYERS] [-d DECK_TYPE] [-s MAX_SCORE] DECK_FILE...
+With -s, only the decks whose maximum score is at most MAX_SCORE are printed.
+"""
+
+import sys
+from collections import Counter
+
+from game.deck import DECK50, VARIANTS
+from game.deck_analysis import read_deck, analyse_deck
+
+if __name__ == "__main__":
+    # default values
+    num_players = 5
+    deck_type = DECK50
+    max_score = None
+
+    args = sys.argv[1:]
+    files = []
+    while args:
+        option = args.pop(0)
+        if option == '-n':
+            num_players = int(args.pop(0))
+        elif option == '-d':
+            name = args.pop(0)
+            deck_type = DECK50 if name == 'standard' else name
+            assert deck_type in VARIANTS
+        elif option == '-s':
+            max_score = int(args.pop(0))
+        else:
+            files.append(option)
+
+    results = []
+    for filename in files:
+        analysis = analyse_deck(read_deck(filename), num_players, deck_type)
+        if max_score is None or analysis.max_score <= max_score:
+            print("%s: max score %d, pace %d, bottom fives %d" % (filename, analysis.max_score, analysis.pace, analysis.bottom_fives))
+            results.append(analysis)
+
+    if results:
+        print("Decks:", len(results))
+        print("Maximum scores:", sorted(Counter(analysis.max_score for analysis in results).items()))
+        print("Average pace:", float(sum(analysis.pace for analysis in results)) / len(results))
+        print("Bottom fives:", sorted(Counter(analysis.bottom_fives for analysis in results).items()))
@@ -4,9 +4,14 @@
 import sys
 
 from game.card import *
+from game.deck import DECK50, VARIANTS
+
+# usage: python build_deck.py FILENAME [DECK_TYPE] (a key of VARIANTS, default deck50)
+deck_type = sys.argv[2] if len(sys.argv) > 2 else DECK50
+colors = VARIANTS[deck_type].colors
 
 my_deck = []
-model_deck = set(deck())
+model_deck = set(VARIANTS[deck_type].deck())
 
 def get_card():
     # read and validate new card from stdin
@@ -18,10 +23,10 @@ def get_card():
             number, color = line
             number = int(number)
             assert 1 <= number <= Card.NUM_NUMBERS
-            assert color in Card.COLORS
+            assert color in colors
         
         except Exception:
-            print("Unrecognized card, try again (format: 1/2/3/4/5 %s)" % "/".join(Card.COLORS))
+            print("Unrecognized card, try again (format: 1/2/3/4/5 %s)" % "/".join(colors))
             continue
     
         print("Recognized card: %d %s" % (number, color))
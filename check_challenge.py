@@ -9,6 +9,7 @@ Ideally, it should be part of some test suite (maybe).
 import sys
 
 from game.game import Game
+from game.deck import DECK55
 
 SCORES = {
     '2016-07-21': {
@@ -78,6 +79,7 @@ for (date, stats) in SCORES.items():
                 strategy_log=False,
                 dump_deck_to=None,
                 load_deck_from="challenges/challenge-%s/game%d.txt" % (date, i),
+                deck_type=DECK55,
             )
             
             game.setup()
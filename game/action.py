@@ -82,14 +82,16 @@ class ClueAction(Action):
     
     
     def __repr__(self):
-        return "Clue to player %d about %r" % (self.player_id, self.value)
+        return "Clue to player %d about %r" % (self.target_id, self.value)
     
     def apply(self, game):
         # populate other fields, using information from the game
         super(ClueAction, self).apply(game)
         
-        player = game.players[self.target_id]
-        self.cards_pos = [i for (i, card) in enumerate(player.hand) if card is not None and (card.number == self.number or card.color == self.color)]
+        from .clues import touch, action_clue_code, cards_positions
+        
+        self.touched = touch(game.hand_masks[self.target_id], action_clue_code(self, game.variant))
+        self.cards_pos = cards_positions(self.touched)
         assert len(self.cards_pos) > 0
 
 
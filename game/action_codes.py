@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Actions represented by integer codes, and fast generation of the legal actions (e.g. for search AIs).
+
+The codes do not depend on the number of players or cards per hand:
+- playing the card in position card_pos is card_pos;
+- discarding it is MAX_K + card_pos;
+- giving clue (code, see clues.py) to player target_id is CLUE_BASE + MAX_NUM_CLUES * target_id + clue,
+  where MAX_NUM_CLUES is the largest number of clue codes of a type of deck (see deck.py).
+
+The legal actions are derived from the masks of the hands kept by the game (see Game.hand_masks and clues.py).
+"""
+
+from itertools import compress
+
+from .action import Action, PlayAction, DiscardAction, ClueAction
+from .card import Card
+from .clues import action_clue_code
+from .deck import VARIANTS
+from .game import Game
+
+
+MAX_K = max(Game.CARDS_PER_PLAYER.values())     # maximum number of cards per hand
+MAX_PLAYERS = max(Game.NUM_PLAYERS_CHOICES)
+MAX_NUM_CLUES = max(variant.num_clues for variant in VARIANTS.values())
+
+CLUE_BASE = 2 * MAX_K
+NUM_CODES = CLUE_BASE + MAX_NUM_CLUES * MAX_PLAYERS
+
+# codes of the plays of the cards in each mask of positions
+PLAYS = [[card_pos for card_pos in range(MAX_K) if mask >> card_pos & 1] for mask in range(1 << MAX_K)]
+DISCARDS = [[MAX_K + card_pos for card_pos in plays] for plays in PLAYS]
+
+# codes of the clues to each player (in the order of the clue codes, as the masks of a hand)
+TARGET_CLUES = [[CLUE_BASE + MAX_NUM_CLUES * target_id + clue for clue in range(MAX_NUM_CLUES)] for target_id in range(MAX_PLAYERS)]
+
+# number of number clues, which come last in every type of deck (every card is touched by exactly one of them)
+NUM_NUMBER_CLUES = Card.NUM_NUMBERS
+assert all(variant.clues[-NUM_NUMBER_CLUES:] == [(Action.NUMBER, number) for number in range(1, Card.NUM_NUMBERS + 1)]
+           for variant in VARIANTS.values())
+
+
+def action_code(action, variant):
+    """
+    Code of the given Action, in a game with the given type of deck (see Game.variant).
+    """
+    if action.type == Action.PLAY:
+        return action.card_pos
+    elif action.type == Action.DISCARD:
+        return MAX_K + action.card_pos
+    else:
+        return CLUE_BASE + MAX_NUM_CLUES * action.target_id + action_clue_code(action, variant)
+
+
+def code_action(code, variant):
+    """
+    Construct the Action with the given code, in a game with the given type of deck (see Game.variant).
+    It still has to be applied to the game, see Action.apply().
+    """
+    if code < MAX_K:
+        return PlayAction(code)
+    elif code < CLUE_BASE:
+        return DiscardAction(code - MAX_K)
+    else:
+        (target_id, clue) = divmod(code - CLUE_BASE, MAX_NUM_CLUES)
+        (clue_type, value) = variant.clues[clue]
+        return ClueAction(target_id, clue_type=clue_type, value=value)
+
+
+def occupied_positions(masks):
+    """
+    Mask of the non-empty positions of a hand, given its masks.
+    """
+    res = 0
+    for clue in range(len(masks) - NUM_NUMBER_CLUES, len(masks)):
+        res |= masks[clue]
+    return res
+
+
+def legal_actions(game, player_id):
+    """
+    List of the codes of the legal actions of the given player: plays, discards (also with all the clues,
+    as in Game.run_action()) and clues touching at least one card (if there are clues left).
+    The game can be any object with the attributes clues and hand_masks (e.g. a Game, see also Game.clone()).
+    """
+    all_masks = game.hand_masks
+    occupied = occupied_positions(all_masks[player_id])
+    res = PLAYS[occupied] + DISCARDS[occupied]
+
+    if game.clues > 0:
+        for (target_id, masks) in enumerate(all_masks):
+            if target_id != player_id:
+                res += compress(TARGET_CLUES[target_id], masks)
+    return res
+
+
+def fill_legal_actions(buffer, game, player_id):
+    """
+    Write the codes of the legal actions of the given player (see legal_actions()) at the beginning
+    of the given buffer, which must have at least NUM_CODES elements (e.g. array('B', bytes(NUM_CODES))),
+    and return their number.
+    """
+    all_masks = game.hand_masks
+    occupied = occupied_positions(all_masks[player_id])
+    n = 0
+    for code in PLAYS[occupied]:
+        buffer[n] = code
+        n += 1
+    for code in DISCARDS[occupied]:
+        buffer[n] = code
+        n += 1
+
+    if game.clues > 0:
+        for (target_id, masks) in enumerate(all_masks):
+            if target_id != player_id:
+                for code in compress(TARGET_CLUES[target_id], masks):
+                    buffer[n] = code
+                    n += 1
+    return n
@@ -4,8 +4,9 @@
 import sys
 import itertools
 import copy
+import zlib
 
-from ...action import Action, PlayAction, DiscardAction, HintAction
+from ...action import Action, PlayAction, DiscardAction, ClueAction
 from ...card import Card
 
 
@@ -24,32 +25,27 @@ class BaseHintsManager(object):
         self.full_deck = strategy.full_deck
         self.board = strategy.board
         self.knowledge = strategy.knowledge
+        self.colors = strategy.colors
         
-        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(Card.COLORS)}
+        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(self.colors)}
     
     
     def log(self, message):
         self.strategy.log(message)
     
     
+    def set_knowledge(self, player_id, card_pos, attribute):
+        """
+        Update the common knowledge about the given card (the update is applied when the next turn begins).
+        """
+        self.strategy.common_knowledge.set(player_id, card_pos, attribute)
+    
+    
     def is_duplicate(self, card):
         """
         Says if the given card is owned by some player who knows everything about it.
         """
-        # check other players' hands
-        for (player_id, hand) in self.strategy.hands.items():
-            for card_pos in range(self.k):
-                kn = self.knowledge[player_id][card_pos]
-                if kn.knows_exactly() and hand[card_pos] is not None and hand[card_pos].equals(card):
-                    return True
-        
-        # check my hand
-        for card_pos in range(self.k):
-            kn = self.knowledge[self.id][card_pos]
-            if kn.knows_exactly() and any(card.equals(c) for c in self.strategy.possibilities[card_pos]):
-                return True
-        
-        return False
+        return self.strategy.duplicates.is_duplicate(card)
     
     
     def is_usable(self, hinter_id):
@@ -63,22 +59,19 @@ class BaseHintsManager(object):
         """
         Receive hint given by player_id and update knowledge.
         """
-        if action.player_id == self.id:
+        if action.target_id == self.id:
             # process direct hint
             for (i, p) in enumerate(self.possibilities):
                 for card in self.strategy.full_deck_composition:
-                    if not card.matches_hint(action, i) and card in p:
+                    if not card.matches_clue(action, i) and card in p:
                         # self.log("removing card %r from position %d due to hint" % (card, i))
                         # p.remove(card)
                         del p[card]
         
-        # update knowledge
-        for card_pos in action.cards_pos:
-            kn = self.knowledge[action.player_id][card_pos]
-            if action.hint_type == Action.COLOR:
-                kn.color = True
-            else:
-                kn.number = True
+        # update knowledge (only one player records the update of the common knowledge)
+        if self.strategy.owns_turn:
+            for card_pos in action.cards_pos:
+                self.set_knowledge(action.target_id, card_pos, 'color' if action.clue_type == Action.COLOR else 'number')
         
         assert self.possibilities is self.strategy.possibilities
         assert self.board is self.strategy.board
@@ -150,12 +143,20 @@ class SumBasedHintsManager(BaseHintsManager):
     def compute_hash_sum(self, hinter_id):
         """
         Compute the sum of the hashes of the hands of the other players, excluding the hinter and myself.
+        The hash of each hand is computed once per hint, and shared with the other players of the game.
         """
+        hashes = self.strategy.common_knowledge.cache(self.__class__.__name__)
+        turn = self.strategy.turn
+        modulo = self.modulo(hinter_id)
+        
         res = 0
         for (player_id, hand) in self.strategy.hands.items():
             if player_id != hinter_id:
-                h = self.hash(hand, player_id, hinter_id)
-                assert 0 <= h < self.modulo(hinter_id)
+                key = (turn, hinter_id, player_id)
+                if key not in hashes:
+                    hashes[key] = self.hash(hand, player_id, hinter_id)
+                h = hashes[key]
+                assert 0 <= h < modulo
                 res += h
         return res
     
@@ -187,7 +188,7 @@ class SumBasedHintsManager(BaseHintsManager):
         matching = {}
         
         # analyze hints on color
-        for color in Card.COLORS:
+        for color in self.colors:
             cards_pos = [card_pos for (card_pos, card) in enumerate(hand) if card is not None and card.matches(color=color)]
             if len(cards_pos) > 0:
                 # pick the leftmost
@@ -212,7 +213,7 @@ class SumBasedHintsManager(BaseHintsManager):
         From the hint, understand the important card.
         This is the inverse of cards_to_hints.
         """
-        if action.hint_type == Action.COLOR:
+        if action.clue_type == Action.COLOR:
             # pick the leftmost card
             return min(action.cards_pos)
         else:
@@ -258,7 +259,7 @@ class SumBasedHintsManager(BaseHintsManager):
         Returns the number of different choices for the integer that needs to be communicated.
         """
         # for our protocol, such number is the number of cards of the other players
-        return len(self.relevant_cards(hinter_id)) / 2
+        return len(self.relevant_cards(hinter_id)) // 2
     
     
     def get_hint(self):
@@ -275,7 +276,7 @@ class SumBasedHintsManager(BaseHintsManager):
         
         if card_pos in matching:
             hint_type, value = matching[card_pos]
-            return HintAction(player_id=player_id, hint_type=hint_type, value=value)
+            return ClueAction(player_id, clue_type=hint_type, value=value)
         
         else:
             # unable to give hint on that card
@@ -284,13 +285,13 @@ class SumBasedHintsManager(BaseHintsManager):
     
     def hint_to_integer(self, hinter_id, action):
         """
-        Decode an HintAction and get my integer.
+        Decode a ClueAction and get my integer.
         """
         # this only makes sense if I am not the hinter
         assert self.id != hinter_id
         
         # compute passed integer
-        player_id = action.player_id
+        player_id = action.target_id
         card_pos = self.hint_to_card(action)
         
         relevant_cards = self.relevant_cards(hinter_id)
@@ -313,7 +314,9 @@ class SumBasedHintsManager(BaseHintsManager):
         else:
             data = None
         
-        self.update_knowledge(player_id, data)
+        if self.strategy.owns_turn:
+            # I have to update the common knowledge
+            self.update_knowledge(player_id, data)
         
         super(SumBasedHintsManager, self).receive_hint(player_id, action)
         
@@ -333,12 +336,11 @@ class ValueHintsManager(BaseHintsManager):
     
     def __init__(self, *args, **kwargs):
         super(ValueHintsManager, self).__init__(*args, **kwargs)
-        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(Card.COLORS)}
     
     
     def shift(self, turn):
         # a variable shift in the hint
-        return turn + turn / self.num_players
+        return turn + turn // self.num_players
     
     
     def choose_card(self, player_id, target_id, turn, hint_type):
@@ -361,8 +363,22 @@ class ValueHintsManager(BaseHintsManager):
     def choose_all_cards(self, player_id, turn, hint_type):
         """
         Choose all cards that receive hints (of the given type) from the given player in the given turn.
+        The choice only depends on public information, so it is computed once per turn and shared with
+        the other players (the returned dictionary must not be modified).
         """
-        return {target_id: self.choose_card(player_id, target_id, turn, hint_type) for target_id in range(self.num_players) if target_id != player_id and self.choose_card(player_id, target_id, turn, hint_type) is not None}
+        targets = self.strategy.common_knowledge.cache(self.__class__.__name__)
+        key = (player_id, turn, hint_type)
+        
+        if key not in targets:
+            cards_pos = {}
+            for target_id in range(self.num_players):
+                if target_id != player_id:
+                    card_pos = self.choose_card(player_id, target_id, turn, hint_type)
+                    if card_pos is not None:
+                        cards_pos[target_id] = card_pos
+            targets[key] = cards_pos
+        
+        return targets[key]
     
     
     def infer_playable_cards(self, player_id, action):
@@ -374,7 +390,7 @@ class ValueHintsManager(BaseHintsManager):
         - the choice of the type of hint (color/number) is primarily based on the number of playable cards.
         Call this function before decode_hint(), i.e. before knowledge is updated.
         """
-        hint_type = action.hint_type
+        hint_type = action.clue_type
         opposite_hint_type = Action.NUMBER if hint_type == Action.COLOR else Action.COLOR
         
         cards_pos = self.choose_all_cards(player_id, action.turn, hint_type)
@@ -384,14 +400,14 @@ class ValueHintsManager(BaseHintsManager):
             # I already knew about one of the two cards
             return None
 
-        if action.player_id == self.id:
+        if action.target_id == self.id:
             # the hint was given to me, so I haven't enough information to infer something
             return None
         
         if hint_type == Action.NUMBER:
             # the alternative hint would have been on colors
             visible_colors = set(card.color for (i, hand) in self.strategy.hands.items() for card in hand if i != player_id and card is not None)   # numbers visible by me and by the hinter
-            if len(visible_colors) < Card.NUM_COLORS:
+            if len(visible_colors) < len(self.colors):
                 # maybe the hinter was forced to make his choice because the color he wanted was not available
                 return None
             
@@ -403,7 +419,7 @@ class ValueHintsManager(BaseHintsManager):
                 return None
         
         
-        involved_cards = [hand[cards_pos[i]] for (i, hand) in self.strategy.hands.items() if i != player_id and i in cards_pos] + [self.strategy.hands[action.player_id][card_pos] for card_pos in action.cards_pos if (action.player_id not in cards_pos or card_pos != cards_pos[action.player_id])]
+        involved_cards = [hand[cards_pos[i]] for (i, hand) in self.strategy.hands.items() if i != player_id and i in cards_pos] + [self.strategy.hands[action.target_id][card_pos] for card_pos in action.cards_pos if (action.target_id not in cards_pos or card_pos != cards_pos[action.target_id])]
         
         my_card_pos = cards_pos[self.id]
         num_playable = sum(1 for card in involved_cards if card.playable(self.strategy.board) and not self.is_duplicate(card))
@@ -428,23 +444,20 @@ class ValueHintsManager(BaseHintsManager):
         """
         Decode hint given by someone else (not necessarily directly to me).
         """
-        hint_type = action.hint_type
+        hint_type = action.clue_type
         cards_pos = self.choose_all_cards(player_id, action.turn, hint_type)
         # self.log("%r" % cards_pos)
         
         # update knowledge
-        for (target_id, card_pos) in cards_pos.items():
-            kn = self.knowledge[target_id][card_pos]
-            if hint_type == Action.COLOR:
-                kn.color = True
-            else:
-                kn.number = True
+        if self.strategy.owns_turn:
+            for (target_id, card_pos) in cards_pos.items():
+                self.set_knowledge(target_id, card_pos, 'color' if hint_type == Action.COLOR else 'number')
         
         # decode my hint
         if self.id in cards_pos:
             n = action.number if hint_type == Action.NUMBER else self.COLORS_TO_NUMBERS[action.color]
             my_card_pos = cards_pos[self.id]
-            modulo = Card.NUM_NUMBERS if hint_type == Action.NUMBER else Card.NUM_COLORS
+            modulo = Card.NUM_NUMBERS if hint_type == Action.NUMBER else len(self.colors)
             
             involved_cards = [hand[cards_pos[i]] for (i, hand) in self.strategy.hands.items() if i != player_id and i in cards_pos]
             
@@ -457,7 +470,7 @@ class ValueHintsManager(BaseHintsManager):
             number = my_value if hint_type == Action.NUMBER else None
             if number == 0:
                 number = 5
-            color = Card.COLORS[my_value] if hint_type == Action.COLOR else None
+            color = self.colors[my_value] if hint_type == Action.COLOR else None
             
             return my_card_pos, color, number
         
@@ -474,7 +487,7 @@ class ValueHintsManager(BaseHintsManager):
         # maybe I wasn't given a hint because I didn't have the right cards
         # recall: the hint is given to the first suitable person after the one who gives the hint
         for i in list(range(player_id + 1, self.num_players)) + list(range(player_id)):
-            if i == action.player_id:
+            if i == action.target_id:
                 # reached hinted player
                 break
             
@@ -483,7 +496,7 @@ class ValueHintsManager(BaseHintsManager):
                 # I am between the hinter and the hinted player!
                 for (i, p) in enumerate(self.possibilities):
                     for card in self.full_deck:
-                        if not card.matches_hint(action, -1) and card in p:
+                        if not card.matches_clue(action, -1) and card in p:
                             # self.log("removing card %r from position %d due to hint skip" % (card, i))
                             del p[card]
         
@@ -506,7 +519,7 @@ class ValueHintsManager(BaseHintsManager):
         
         if res is not None:
             card_pos, color, number = res
-            # self.log("thanks to indirect hint, understood that card %d has " % card_pos + ("number %d" % number if action.hint_type == Action.NUMBER else "color %s" % color))
+            # self.log("thanks to indirect hint, understood that card %d has " % card_pos + ("number %d" % number if action.clue_type == Action.NUMBER else "color %s" % color))
         
             p = self.possibilities[card_pos]
             for card in self.full_deck:
@@ -529,7 +542,7 @@ class ValueHintsManager(BaseHintsManager):
             return None
         
         # compute sum of visible cards in the given positions
-        modulo = Card.NUM_NUMBERS if hint_type == Action.NUMBER else Card.NUM_COLORS
+        modulo = Card.NUM_NUMBERS if hint_type == Action.NUMBER else len(self.colors)
         involved_cards = [hand[cards_pos[i]] for (i, hand) in self.strategy.hands.items() if i in cards_pos]
         assert all(card is not None for card in involved_cards)
         m = sum(card.number if hint_type == Action.NUMBER else self.COLORS_TO_NUMBERS[card.color] for card in involved_cards) + self.shift(turn)
@@ -538,7 +551,7 @@ class ValueHintsManager(BaseHintsManager):
         number = m if hint_type == Action.NUMBER else None
         if number == 0:
             number = 5
-        color = Card.COLORS[m] if hint_type == Action.COLOR else None
+        color = self.colors[m] if hint_type == Action.COLOR else None
         
         return color, number
     
@@ -548,9 +561,9 @@ class ValueHintsManager(BaseHintsManager):
         Choose the best hint to give, if any.
         """
         # try the two possible hint_type values
-        possibilities = {hint_type: None for hint_type in Action.HINT_TYPES}
+        possibilities = {hint_type: None for hint_type in Action.CLUE_TYPES}
         
-        for hint_type in Action.HINT_TYPES:
+        for hint_type in Action.CLUE_TYPES:
             # compute which cards would be involved in this indirect hint
             cards_pos = self.choose_all_cards(self.id, self.strategy.turn, hint_type)
             involved_cards = [self.strategy.hands[i][card_pos] for (i, card_pos) in cards_pos.items()]
@@ -581,7 +594,7 @@ class ValueHintsManager(BaseHintsManager):
                     # found player to give the hint to
                     involved_cards += [card for (card_pos, card) in enumerate(self.strategy.hands[player_id]) if card is not None and card.matches(color=color, number=number) and not self.knowledge[player_id][card_pos].knows(hint_type) and (player_id not in cards_pos or card_pos != cards_pos[player_id])]
                     
-                    num_relevant = sum(1 for card in involved_cards if card.relevant(self.strategy.board, self.strategy.full_deck, self.strategy.discard_pile) and not self.is_duplicate(card))
+                    num_relevant = sum(1 for card in involved_cards if card.critical(self.strategy.board, self.strategy.full_deck, self.strategy.discard_pile) and not self.is_duplicate(card))
                     num_playable = sum(1 for card in involved_cards if card.playable(self.strategy.board) and not self.is_duplicate(card))
                     num_useful = sum(1 for card in involved_cards if card.useful(self.strategy.board, self.strategy.full_deck, self.strategy.discard_pile) and not self.is_duplicate(card))
                     
@@ -595,7 +608,7 @@ class ValueHintsManager(BaseHintsManager):
                     if num_useful > 0:
                         possibilities[hint_type] = (
                                 (num_playable, num_relevant, len(involved_cards)),
-                                HintAction(player_id=player_id, color=color, number=number)
+                                ClueAction(player_id, color=color, number=number)
                             )
         
         # choose between color and number
@@ -618,14 +631,33 @@ class PlayabilityHintsManager(SumBasedHintsManager):
     """
     Playability hints manager.
     A hint communicates to every other player which of their cards are playable (duplicate cards are excluded).
+    The information is encoded as a bitmask, where the leftmost card corresponds to the most significant bit.
     """
     
+    def playable_cards(self):
+        """
+        Set of cards which are playable on the current board (the table is kept by the variant).
+        """
+        return self.strategy.variant.playable_cards(self.board)
+    
+    
+    def slot_bit(self, card_pos):
+        """
+        Bit of the hash corresponding to the given card.
+        """
+        return 1 << (self.k - 1 - card_pos)
+    
+    
     def hash(self, hand, player_id, hinter_id):
         """
-        This hash encodes which cards are playable (as a binary integer).
+        This hash encodes which cards are playable (as a bitmask).
         """
-        string = "".join(["1" if card.playable(self.board) and not self.is_duplicate(card) else "0" for card in hand])
-        return int(string, 2)
+        playable = self.playable_cards()
+        x = 0
+        for (card_pos, card) in enumerate(hand):
+            if card in playable and not self.is_duplicate(card):
+                x |= self.slot_bit(card_pos)
+        return x
     
     
     def hash_range(self, hinter_id):
@@ -640,25 +672,29 @@ class PlayabilityHintsManager(SumBasedHintsManager):
         Process the given hash of my hand, passed through a hint.
         """
         assert 0 <= x < 2 ** self.k
-        string = str(bin(x))[2:].zfill(self.k)
-        assert len(string) == self.k
-        playable_list = [True if c == "1" else False for c in string]
-        self.log("received playable string %s" % string)
+        self.log("received playable mask %s" % format(x, '0%db' % self.k))
         
         # update possibilities
-        for (card_pos, playable) in enumerate(playable_list):
-            for card in self.full_deck:
-                p = self.possibilities[card_pos]
-                if card in p:
-                    if playable and (not card.playable(self.board) or self.is_duplicate(card)):
-                        # self.log("removing %r from position %d" % (card, card_pos))
-                        del p[card]
-                    elif not playable and card.playable(self.board) and not self.is_duplicate(card):
+        playable = self.playable_cards()
+        for (card_pos, p) in enumerate(self.possibilities):
+            # playable cards which are not duplicate
+            # (computed for each position, since removing possibilities can change duplicates)
+            candidates = [card for card in playable if not self.is_duplicate(card)]
+            
+            if x & self.slot_bit(card_pos):
+                # only candidates are possible
+                for card in [card for card in p if card not in candidates]:
+                    # self.log("removing %r from position %d" % (card, card_pos))
+                    del p[card]
+            else:
+                # candidates are not possible
+                for card in candidates:
+                    if card in p:
                         # self.log("removing %r from position %d" % (card, card_pos))
                         del p[card]
         
         # return data for update_knowledge
-        return playable_list
+        return x
     
     
     def update_knowledge(self, hinter_id, data):
@@ -667,26 +703,19 @@ class PlayabilityHintsManager(SumBasedHintsManager):
         """
         if hinter_id != self.id:
             # update my knowledge
-            playable_list = data
-            for (card_pos, playable) in enumerate(playable_list):
-                kn = self.knowledge[self.id][card_pos]
-                if playable:
-                    kn.playable = True
-                else:
-                    kn.non_playable = True
+            x = data
+            for card_pos in range(self.k):
+                self.set_knowledge(self.id, card_pos, 'playable' if x & self.slot_bit(card_pos) else 'non_playable')
         
         # update knowledge of players different by me and the hinter
+        playable = self.playable_cards()
         for (p_id, hand) in self.strategy.hands.items():
             if p_id == hinter_id:
                 # skip the hinter
                 continue
             
             for (card_pos, card) in enumerate(hand):
-                kn = self.knowledge[p_id][card_pos]
-                if card.playable(self.board):
-                    kn.playable = True
-                else:
-                    kn.non_playable = True
+                self.set_knowledge(p_id, card_pos, 'playable' if card in playable else 'non_playable')
     
 
 
@@ -713,7 +742,7 @@ class CardHintsManager(SumBasedHintsManager):
         """
         hand = self.strategy.my_hand if target_id == self.id else self.strategy.hands[target_id]
         knowledge = self.knowledge[target_id]
-        n = hash("%d,%d" % (target_id, turn))
+        n = zlib.crc32(b"%d,%d" % (target_id, turn))   # the same in every process (unlike hash())
         
         possible_cards = [card_pos for (card_pos, kn) in enumerate(knowledge) if hand[card_pos] is not None and not kn.knows_exactly() and not kn.useless]
         
@@ -793,7 +822,7 @@ class CardHintsManager(SumBasedHintsManager):
         
         elif kn.number or kn.playable or kn.high:
             # communicate the color
-            for color in Card.COLORS:
+            for color in self.colors:
                 if counter >= self.modulo(hinter_id):
                     # reached maximum number of information available
                     break
@@ -808,7 +837,7 @@ class CardHintsManager(SumBasedHintsManager):
             
             while counter < self.modulo(hinter_id) and sum(Card.NUM_NUMBERS - n for n in fake_board.values()) > 0:
                 # pick next color
-                color = Card.COLORS[c % Card.NUM_COLORS]
+                color = self.colors[c % len(self.colors)]
                 c += 1
                 
                 number = fake_board[color] + 1
@@ -852,7 +881,7 @@ class CardHintsManager(SumBasedHintsManager):
             # the card is useless
             return matching[self.USELESS]
         
-        elif card.relevant(self.board, self.full_deck, self.strategy.discard_pile):
+        elif card.critical(self.board, self.full_deck, self.strategy.discard_pile):
             # the card is high and relevant
             return matching[self.HIGH_RELEVANT]
         
@@ -897,7 +926,7 @@ class CardHintsManager(SumBasedHintsManager):
                     if any(x in matching for x in [(card.color, card.number), (card.color, None), (None, card.number)]):
                         del p[card]
                         # self.log("removing %r from position %d" % (card, card_pos))
-                    elif not card.relevant(self.board, self.full_deck, self.strategy.discard_pile):
+                    elif not card.critical(self.board, self.full_deck, self.strategy.discard_pile):
                         del p[card]
                         # self.log("removing %r from position %d" % (card, card_pos))
                 
@@ -905,7 +934,7 @@ class CardHintsManager(SumBasedHintsManager):
                     if any(x in matching for x in [(card.color, card.number), (card.color, None), (None, card.number)]):
                         del p[card]
                         # self.log("removing %r from position %d" % (card, card_pos))
-                    elif card.relevant(self.board, self.full_deck, self.strategy.discard_pile):
+                    elif card.critical(self.board, self.full_deck, self.strategy.discard_pile):
                         del p[card]
                         # self.log("removing %r from position %d" % (card, card_pos))
                     elif not card.useful(self.board, self.full_deck, self.strategy.discard_pile):
@@ -931,20 +960,19 @@ class CardHintsManager(SumBasedHintsManager):
         if hinter_id != self.id and data is not None:
             # update my knowledge
             card_pos, information = data
-            kn = self.knowledge[self.id][card_pos]
             
             if information == self.USELESS:
-                kn.useless = True
+                self.set_knowledge(self.id, card_pos, 'useless')
             elif information == self.HIGH_RELEVANT or information == self.HIGH_DISCARDABLE:
-                kn.high = True
+                self.set_knowledge(self.id, card_pos, 'high')
             else:
                 color, number = information
                 if color is not None:
                     # I know the color
-                    kn.color = True
+                    self.set_knowledge(self.id, card_pos, 'color')
                 if number is not None:
                     # I know the number
-                    kn.number = True
+                    self.set_knowledge(self.id, card_pos, 'number')
         
         
         # update knowledge of players different by me and the hinter
@@ -961,24 +989,24 @@ class CardHintsManager(SumBasedHintsManager):
                 
                 if (card.color, card.number) in matching:
                     # hint on the exact values
-                    kn.color = True
-                    kn.number = True
+                    self.set_knowledge(player_id, card_pos, 'color')
+                    self.set_knowledge(player_id, card_pos, 'number')
                 
                 elif (card.color, None) in matching:
                     # hint on color
-                    kn.color = True
+                    self.set_knowledge(player_id, card_pos, 'color')
                 
                 elif (None, card.number) in matching:
                     # hint on number
-                    kn.number = True
+                    self.set_knowledge(player_id, card_pos, 'number')
                 
                 elif not card.useful(self.board, self.full_deck, self.strategy.discard_pile):
                     # the card is useless
-                    kn.useless = True
+                    self.set_knowledge(player_id, card_pos, 'useless')
                 
                 else:
                     # the card is high
-                    kn.high = True
+                    self.set_knowledge(player_id, card_pos, 'high')
 
 
     
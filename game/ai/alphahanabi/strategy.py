@@ -4,29 +4,32 @@
 import sys
 import itertools
 import copy
+import weakref
 from collections import Counter
 
-from ...action import Action, PlayAction, DiscardAction, HintAction
+from ...action import Action, PlayAction, DiscardAction, ClueAction
 from ...card import Card, get_appearance
-from ...deck import DECKS
+from ...deck import DECKS, VARIANTS
 from ...base_strategy import BaseStrategy
+from ...knowledge import DuplicatesIndex, KnowledgeArray, KnowledgeView, Flag
 from .hints_manager import ValueHintsManager, PlayabilityHintsManager, CardHintsManager
 
 
 
 
-class Knowledge:
+class Knowledge(KnowledgeView):
     """
     An instance of this class represents what a player knows about a card, as known by everyone.
+    It is a view on a bitfield of a KnowledgeArray.
     """
+    __slots__ = ()
     
-    def __init__(self, color=False, number=False):
-        self.color = color                  # know the color
-        self.number = number                # know the number
-        self.playable = False               # at some point, this card was playable
-        self.non_playable = False           # at some point, this card was not playable
-        self.useless = False                # this card is useless
-        self.high = False                   # at some point, this card was high (see CardHintsManager)
+    color = Flag(0)                     # know the color
+    number = Flag(1)                    # know the number
+    playable = Flag(2)                  # at some point, this card was playable
+    non_playable = Flag(3)              # at some point, this card was not playable
+    useless = Flag(4)                   # this card is useless
+    high = Flag(5)                      # at some point, this card was high (see CardHintsManager)
     
     
     def __repr__(self):
@@ -37,7 +40,7 @@ class Knowledge:
         """
         Does the player know the color/number?
         """
-        assert hint_type in Action.HINT_TYPES
+        assert hint_type in Action.CLUE_TYPES
         if hint_type == Action.COLOR:
             return self.color
         else:
@@ -51,6 +54,111 @@ class Knowledge:
 
 
 
+class CommonKnowledge:
+    """
+    Knowledge of all players, shared by all the strategies of the same game.
+    
+    Knowledge only depends on public information, so the updates caused by a turn are computed
+    only by the first player who processes the turn (the owner of the turn). The updates are
+    recorded and applied when the next turn begins: in this way, the players who process the
+    turn later still see the knowledge as it was when the turn was played.
+    Private information (the possibilities of each player) is not shared.
+    
+    Values which only depend on public information can also be cached here, so that they are
+    computed once per turn for all the players (see cache()).
+    """
+    
+    # game -> {difficulty: CommonKnowledge}
+    instances = weakref.WeakKeyDictionary()
+    
+    
+    @classmethod
+    def get(cls, game, difficulty, num_players, k):
+        """
+        Get the common knowledge of the given game.
+        Without a game (e.g. in a simulation), a private instance is returned.
+        """
+        if game is None:
+            return cls(num_players, k)
+        
+        shared = cls.instances.setdefault(game, {})
+        if difficulty not in shared or shared[difficulty].turn is not None:
+            # new game (or the game was set up again)
+            shared[difficulty] = cls(num_players, k)
+        return shared[difficulty]
+    
+    
+    def __init__(self, num_players, k):
+        self.knowledge = [KnowledgeArray(Knowledge, k) for i in range(num_players)]
+        
+        self.turn = None        # turn whose updates are being recorded
+        self.owner = None       # id of the player who records the updates of this turn
+        self.updates = []       # recorded updates, to be applied when the next turn begins
+        self.caches = {}        # name -> dict of cached values, cleared when knowledge changes
+        self.listeners = []     # functions to be called with the id of each player whose knowledge changed
+    
+    
+    def sync(self, turn):
+        """
+        Apply the recorded updates, if they refer to a turn before the given one.
+        """
+        if self.turn is not None and self.turn < turn:
+            changed = set()
+            for (player_id, card_pos, attribute) in self.updates:
+                changed.add(player_id)
+                if attribute is None:
+                    # the card was played or discarded, and a new card was drawn
+                    self.knowledge[player_id].shift(card_pos)
+                else:
+                    setattr(self.knowledge[player_id][card_pos], attribute, True)
+            
+            self.updates = []
+            self.turn = None
+            self.owner = None
+            self.caches = {}
+            
+            for player_id in sorted(changed):
+                for listener in self.listeners:
+                    listener(player_id)
+    
+    
+    def begin_turn(self, turn, player_id):
+        """
+        Called by each player when processing the given turn.
+        Returns True if the player is the owner of the turn, i.e. it has to record the updates.
+        """
+        self.sync(turn)
+        if self.turn is None:
+            self.turn = turn
+            self.owner = player_id
+        
+        assert self.turn == turn
+        return self.owner == player_id
+    
+    
+    def cache(self, name):
+        """
+        Dictionary (with the given name) of cached values depending only on public information.
+        It is emptied whenever the knowledge is updated, so keys should include the turn.
+        """
+        return self.caches.setdefault(name, {})
+    
+    
+    def set(self, player_id, card_pos, attribute):
+        """
+        Record that the given attribute of the knowledge (e.g. 'color') becomes True.
+        """
+        self.updates.append((player_id, card_pos, attribute))
+    
+    
+    def reset(self, player_id, card_pos):
+        """
+        Record that the given card leaves the hand (a new card is inserted on the left).
+        """
+        self.updates.append((player_id, card_pos, None))
+
+
+
 class HintsScheduler:
     """
     Decides which HintsManager should be used each time.
@@ -104,6 +212,9 @@ class Strategy(BaseStrategy):
         5: 4,
     }   # k (number of cards per hand): size of the deck when we want to consider all combinations of cards
     
+    SEARCH_CHECK = 256      # iterations of a search between two checks of the deadline
+    SEARCH_MARGIN = 0.01    # time (in seconds) left for the rest of the decision when the deadline stops a search
+    
     MODERATE = 'moderate'
     HARD = 'hard'
     HARDEST = 'hardest'
@@ -111,7 +222,6 @@ class Strategy(BaseStrategy):
     DIFFICULTY_LEVELS = [MODERATE, HARD, HARDEST]
     
     def __init__(self, verbose=False, params={}):
-        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(Card.COLORS)}
         self.verbose = verbose
         self.params = params
         
@@ -123,7 +233,7 @@ class Strategy(BaseStrategy):
             self.difficulty = self.HARDEST
     
     
-    def initialize(self, id: int, num_players: int, k: int, board, deck_type, my_hand, hands, discard_pile, deck_size):
+    def initialize(self, id: int, num_players: int, k: int, board, deck_type, my_hand, hands, discard_pile, deck_size, game=None):
         """
         To be called once before the beginning.
         """
@@ -132,6 +242,11 @@ class Strategy(BaseStrategy):
         self.k = k  # number of cards per hand
         self.board = board
         self.deck_type = deck_type
+        self.game = game
+        
+        # tables of the type of deck (see deck.py)
+        self.variant = VARIANTS[deck_type]
+        self.colors = self.variant.colors
         
         # store a copy of the full deck
         self.full_deck = get_appearance(DECKS[deck_type]())
@@ -153,8 +268,14 @@ class Strategy(BaseStrategy):
         # remove cards of other players from possibilities
         self.update_possibilities()
         
-        # knowledge of all players
-        self.knowledge = [[Knowledge(color=False, number=False) for j in range(k)] for i in range(num_players)]
+        # knowledge of all players (shared with the other players of the game)
+        self.common_knowledge = CommonKnowledge.get(game, self.difficulty, num_players, k)
+        self.knowledge = self.common_knowledge.knowledge
+        self.owns_turn = False  # am I recording the updates of the common knowledge for this turn?
+        
+        # cards known exactly by their owners
+        self.duplicates = DuplicatesIndex(self)
+        self.common_knowledge.listeners.append(self.duplicates.refresh)
         
         # hints scheduler
         self.hints_scheduler = HintsScheduler(self)
@@ -175,18 +296,29 @@ class Strategy(BaseStrategy):
         """
         Update possibilities removing visible cards.
         """
-        visible_cards = self.visible_cards()
-        for p in self.possibilities:
-            for card in self.full_deck_composition:
-                if card in p:
-                    # this card is still possible
-                    # update the number of possible occurrences
-                    p[card] = self.full_deck_composition[card] - visible_cards[card]
-                    
-                    if p[card] == 0:
-                        # remove this card
+        beliefs = self.game.beliefs if self.game is not None else None
+        if beliefs is not None:
+            # simulation mode: read the counts kept by the game for all the players (see belief_array.py)
+            for (p, counts) in zip(self.possibilities, beliefs.counts[self.id].tolist()):
+                for card in list(p):
+                    if counts[self.variant.card_index(card)] > 0:
+                        p[card] = counts[self.variant.card_index(card)]
+                    else:
                         del p[card]
         
+        else:
+            visible_cards = self.visible_cards()
+            for p in self.possibilities:
+                for card in self.full_deck_composition:
+                    if card in p:
+                        # this card is still possible
+                        # update the number of possible occurrences
+                        p[card] = self.full_deck_composition[card] - visible_cards[card]
+                        
+                        if p[card] == 0:
+                            # remove this card
+                            del p[card]
+        
         assert all(sum(p.values()) > 0 or self.my_hand[card_pos] is None for (card_pos, p) in enumerate(self.possibilities))    # check to have at least one possible card!
     
     
@@ -194,6 +326,7 @@ class Strategy(BaseStrategy):
         """
         Update possibilities examining all combinations of my hand.
         Better to do it with only few cards remaining!
+        If the deadline comes first, the possibilities are left as they are.
         """
         possible_cards = Counter()
         for p in self.possibilities:
@@ -206,7 +339,11 @@ class Strategy(BaseStrategy):
         assert num_cards <= self.k
         
         # cycle over all combinations
-        for comb in itertools.permutations(list(possible_cards.elements()), num_cards):
+        for (n, comb) in enumerate(itertools.permutations(list(possible_cards.elements()), num_cards)):
+            if n % self.SEARCH_CHECK == 0 and self.out_of_time():
+                self.log("out of time, possibilities not updated with combinations")
+                return
+            
             # construct hand
             hand = copy.copy(self.my_hand)
             i = 0
@@ -234,6 +371,13 @@ class Strategy(BaseStrategy):
         self.update_possibilities() # set the right multiplicities
     
     
+    def out_of_time(self):
+        """
+        Should a search stop, to leave time for the rest of the decision before the deadline?
+        """
+        return self.remaining_time() < self.SEARCH_MARGIN
+    
+    
     def next_player_id(self):
         return (self.id + 1) % self.num_players
     
@@ -243,8 +387,7 @@ class Strategy(BaseStrategy):
     
     # Update knowledge 
     def reset_knowledge(self, player_id, card_pos, new_card_exists):
-        self.knowledge[player_id].pop(card_pos)
-        self.knowledge[player_id].insert(0, Knowledge(False, False))
+        self.common_knowledge.reset(player_id, card_pos)
         
     
     
@@ -262,17 +405,21 @@ class Strategy(BaseStrategy):
         """
         Receive information about a played turn.
         """
+        # the first player processing the turn updates the common knowledge
+        self.owns_turn = self.common_knowledge.begin_turn(action.turn, self.id)
+        
         if action.type in [Action.PLAY, Action.DISCARD]:
             # reset knowledge of the player
             new_card = self.my_hand[0] if player_id == self.id else self.hands[player_id][0]
-            self.reset_knowledge(player_id, action.card_pos, new_card is not None)
+            if self.owns_turn:
+                self.reset_knowledge(player_id, action.card_pos, new_card is not None)
             
             if player_id == self.id:
                 # check for my new card
                 self.possibilities.pop(action.card_pos)
                 self.possibilities.insert(0, Counter(self.full_deck) if self.my_hand[0] is not None else Counter())
         
-        elif action.type == Action.HINT:
+        elif action.type == Action.CLUE:
             # someone gave a hint!
             # the suitable hints manager must process it
             hints_manager = self.hints_scheduler.select_hints_manager(player_id, action.turn)
@@ -287,13 +434,27 @@ class Strategy(BaseStrategy):
 
     
     
+    def cards_replaced(self):
+        """
+        The cards of the game have been replaced (e.g. in a rollout, see Game.deal()).
+        """
+        self.common_knowledge.caches = {}
+        for player_id in self.other_players_id():
+            self.duplicates.refresh(player_id)
+        self.update_possibilities()
+    
+    
     def get_best_discard(self):
         """
         Choose the best card to be discarded.
         """
+        # as Counters, which make useful() and critical() much faster
+        full_deck = self.full_deck_composition
+        discard_pile = Counter(self.discard_pile)
+        
         # first see if I can be sure to discard a useless card
         for (card_pos, p) in enumerate(self.possibilities):
-            if len(p) > 0 and all(not card.useful(self.board, self.full_deck, self.discard_pile) for card in p):
+            if len(p) > 0 and all(not card.useful(self.board, full_deck, discard_pile) for card in p):
                 self.log("considering to discard useless card")
                 return card_pos, 0.0, 0.0
         
@@ -307,14 +468,14 @@ class Strategy(BaseStrategy):
         
         for (card_pos, p) in enumerate(self.possibilities):
             if len(p) > 0:
-                num_relevant = sum(p[card] for card in p if card.relevant(self.board, self.full_deck, self.discard_pile))
-                relevant_weight_sum = sum(WEIGHT[card.number] * p[card] for card in p if card.relevant(self.board, self.full_deck, self.discard_pile))
+                num_relevant = sum(p[card] for card in p if card.critical(self.board, full_deck, discard_pile))
+                relevant_weight_sum = sum(WEIGHT[card.number] * p[card] for card in p if card.critical(self.board, full_deck, discard_pile))
                 
                 relevant_ratio = float(num_relevant) / sum(p.values())
                 relevant_weight = float(relevant_weight_sum) / sum(p.values())
                 
-                num_useful = sum(p[card] for card in p if card.useful(self.board, self.full_deck, self.discard_pile))
-                useful_weight_sum = sum(WEIGHT[card.number] * p[card] for card in p if card.useful(self.board, self.full_deck, self.discard_pile))
+                num_useful = sum(p[card] for card in p if card.useful(self.board, full_deck, discard_pile))
+                useful_weight_sum = sum(WEIGHT[card.number] * p[card] for card in p if card.useful(self.board, full_deck, discard_pile))
                 useful_ratio = float(num_useful) / sum(p.values())
                 useful_weight = float(useful_weight_sum) / sum(p.values())
                 
@@ -378,6 +539,7 @@ class Strategy(BaseStrategy):
         """
         Choose the best card to play in the last round of the game.
         The players know almost everything, and it is reasonable to examine all the possibilities.
+        If the deadline comes first, the best of the positions examined so far is chosen.
         """
         best_card_pos = None
         best_avg_score = 0.0
@@ -390,31 +552,10 @@ class Strategy(BaseStrategy):
                 
                 for card in p:
                     # simulate what happens if I play this card
-                    best_score = 0
-                    for comb in itertools.product(list(range(self.k)), repeat = self.last_turn - self.turn):
-                        turn = self.turn
-                        board = copy.copy(self.board)
-                        player_id = self.id
-                        lives = self.lives
-                        
-                        if card.playable(board):
-                            board[card.color] += 1
-                        else:
-                            lives -= 1
-                        
-                        if lives >= 1:
-                            # simulate other players
-                            for (i, c_pos) in enumerate(comb):
-                                turn += 1
-                                player_id = (player_id + 1) % self.num_players
-                                
-                                # this player plays the card in position c_pos
-                                c = self.hands[player_id][c_pos]
-                                if c.playable(board):
-                                    board[c.color] += 1
-                        
-                        score = sum(board.values())
-                        best_score = max(score, best_score) # assume that the other players play optimally! :)
+                    best_score = self.best_score_last_round(card)
+                    if best_score is None:
+                        self.log("out of time, choosing among the positions examined so far")
+                        return best_card_pos
                     
                     # self.log("simulation for card %r in position %d gives best score %d" % (card, card_pos, best_score))
                     # self.log("obtained possible score %d (multiplicity %d)" % (best_score, p[card]))
@@ -429,12 +570,52 @@ class Strategy(BaseStrategy):
         if best_card_pos is not None:
             self.log("playing card in position %d is the best choice" % best_card_pos)
             return best_card_pos
+    
+    
+    def best_score_last_round(self, card):
+        """
+        Best score that can be obtained if I play the given card now, and the other players play one card each
+        until the end of the game (None if the deadline comes first).
+        """
+        best_score = 0
+        for (n, comb) in enumerate(itertools.product(list(range(self.k)), repeat = self.last_turn - self.turn)):
+            if n % self.SEARCH_CHECK == 0 and self.out_of_time():
+                return None
+            
+            turn = self.turn
+            board = copy.copy(self.board)
+            player_id = self.id
+            lives = self.lives
+            
+            if card.playable(board):
+                board[card.color] += 1
+            else:
+                lives -= 1
+            
+            if lives >= 1:
+                # simulate other players
+                for (i, c_pos) in enumerate(comb):
+                    turn += 1
+                    player_id = (player_id + 1) % self.num_players
+                    
+                    # this player plays the card in position c_pos
+                    c = self.hands[player_id][c_pos]
+                    if c.playable(board):
+                        board[c.color] += 1
+            
+            score = sum(board.values())
+            best_score = max(score, best_score) # assume that the other players play optimally! :)
+        
+        return best_score
 
     
     def get_turn_action(self):
         """
         Choose action for this turn.
         """
+        # apply the updates of the common knowledge caused by the previous turn
+        self.common_knowledge.sync(self.turn)
+        
         # update possibilities checking all combinations
         if self.deck_size < self.DECK_SIZE_BEFORE_FULL_SEARCH[self.k]:
             self.update_possibilities_with_combinations()
@@ -456,12 +637,12 @@ class Strategy(BaseStrategy):
         
             
         
-        if self.hints == 0:
+        if self.clues == 0:
             # discard card
             return DiscardAction(card_pos=self.get_best_discard()[0])
         
         
-        if self.hints <= 1 and self.deck_size >= 2:
+        if self.clues <= 1 and self.deck_size >= 2:
             # better to discard if the next player has many important cards
             self.log("there is only one hint, should I discard?")
             card_pos, relevant_weight, useful_weight = self.get_best_discard()
@@ -474,7 +655,7 @@ class Strategy(BaseStrategy):
                 # discard is surely good
                 return DiscardAction(card_pos=card_pos)
             
-            elif all(card.relevant(self.board, self.full_deck, self.discard_pile) for card in self.hands[self.next_player_id()]):
+            elif all(card.critical(self.board, self.full_deck, self.discard_pile) for card in self.hands[self.next_player_id()]):
                 if relevant_weight < 0.5 + tolerance:
                     # close your eyes and discard
                     self.log("next player has only relevant cards, so I discard")
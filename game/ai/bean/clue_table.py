@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+
+from ...action import ClueAction
+from ...clues import hand_masks, touch, cards_positions
+
+
+# a clue which can be given to some player:
+# mask of the touched positions (bit i is position i), touched positions, focus, touched cards
+ClueCandidate = namedtuple("ClueCandidate", "mask cards_pos focus cards")
+
+
+class ClueTable:
+    """
+    For each other player and each clue (color or number) touching some of his cards,
+    the touched positions, the focus of the clue and whether it is a good touch.
+
+    The table must be refreshed (see refresh()) for a player whenever his hand or his knowledge
+    changes. Only the entries of that player are computed again, except good touch verdicts,
+    which are computed again for everyone if the set of clued cards changed.
+    Entries are computed when they are first asked for, since only a few clues are looked at in a turn.
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+
+        self.hands = {}             # player_id -> hand and masks of the hand (see clues.py)
+        self.candidates = {}        # player_id -> {(clue_type, value): ClueCandidate or None}
+        self.chops = {}             # player_id -> chop index
+        self.good_touch = {}        # player_id -> {(clue_type, value): bool}
+
+        self.clued = {}             # player_id -> list of (card, card_pos) of the cards already clued
+        self.clued_positions = {}   # card -> list of positions where the card is already clued
+        self.version = 0            # incremented when the clued cards change
+        self.good_touch_version = {}    # player_id -> version of the good touch verdicts
+
+        self.variant = strategy.variant
+
+        from .strategy import PublicKnowledge
+        self.clued_bits = PublicKnowledge.CLUED
+
+        for player_id in strategy.other_players_id():
+            self.refresh(player_id)
+
+
+    def refresh(self, player_id):
+        """
+        Compute the entries of the given player again.
+        """
+        if player_id == self.strategy.id:
+            return
+
+        hand = self.strategy.hands[player_id]
+        knowledge = self.strategy.knowledge[player_id]
+
+        # clued cards
+        clued = [(hand[card_pos], card_pos) for card_pos in cards_positions(knowledge.mask(self.clued_bits)) if hand[card_pos] is not None]
+        if clued != self.clued.get(player_id):
+            for (card, card_pos) in self.clued.get(player_id, []):
+                self.clued_positions[card].remove(card_pos)
+            for (card, card_pos) in clued:
+                self.clued_positions.setdefault(card, []).append(card_pos)
+            self.clued[player_id] = clued
+            self.version += 1
+
+        self.hands[player_id] = (hand, hand_masks(hand, self.variant))
+        self.candidates[player_id] = {}
+        self.chops[player_id] = self.strategy.chop_index(player_id)
+        self.good_touch_version[player_id] = None
+
+
+    def candidate(self, target_id, clue_type, value):
+        """
+        The ClueCandidate of the given clue, or None if the clue touches no card.
+        """
+        candidates = self.candidates[target_id]
+        clue = (clue_type, value)
+        if clue not in candidates:
+            candidates[clue] = self.compute_candidate(target_id, clue)
+        return candidates[clue]
+
+
+    def compute_candidate(self, target_id, clue):
+        code = self.variant.clue_codes.get(clue)
+        if code is None:
+            return None
+        (hand, masks) = self.hands[target_id]
+        mask = touch(masks, code)
+        if mask == 0:
+            return None
+
+        cards_pos = cards_positions(mask)
+        chop_idx = self.chops[target_id]
+        focus_idx = chop_idx if chop_idx in cards_pos else cards_pos[0]
+        return ClueCandidate(mask, cards_pos, focus_idx, [hand[card_pos] for card_pos in cards_pos])
+
+
+    def is_good_touch(self, target_id, clue_type, value):
+        """
+        Does the given clue touch cards which are not already touched?
+        (The focused card is not compared with clued cards in the same position.)
+        """
+        if self.good_touch_version[target_id] != self.version:
+            self.good_touch[target_id] = {}
+            self.good_touch_version[target_id] = self.version
+
+        good_touch = self.good_touch[target_id]
+        clue = (clue_type, value)
+        if clue not in good_touch:
+            good_touch[clue] = self.compute_good_touch(self.candidate(target_id, clue_type, value))
+        return good_touch[clue]
+
+
+    def compute_good_touch(self, candidate):
+        # check within clue
+        if len(set(candidate.cards)) < len(candidate.cards):
+            return False
+
+        # check other hands
+        for card in candidate.cards:
+            if any(card_pos != candidate.focus for card_pos in self.clued_positions.get(card, [])):
+                return False
+
+        return True
+
+
+    def clue_action(self, target_id, clue_type, value):
+        """
+        Construct the ClueAction for the given clue.
+        """
+        candidate = self.candidate(target_id, clue_type, value)
+        clue_action = ClueAction(target_id, clue_type=clue_type, value=value)
+        clue_action.touched = candidate.mask
+        clue_action.cards_pos = list(candidate.cards_pos)
+        clue_action.former_chop = self.chops[target_id]
+        return clue_action
@@ -6,7 +6,7 @@ import itertools
 import copy
 
 from ...action import Action, PlayAction, DiscardAction, ClueAction
-from ...card import Card
+from ...clues import action_clue_code
 
 
 class CluesManager(object):
@@ -24,8 +24,6 @@ class CluesManager(object):
         self.full_deck = strategy.full_deck
         self.board = strategy.board
         self.knowledge = strategy.knowledge
-        
-        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(Card.COLORS)}
     
     
     def log(self, message):
@@ -36,20 +34,7 @@ class CluesManager(object):
         """
         Says if the given card is owned by some player who knows everything about it.
         """
-        # check other players' hands
-        for (player_id, hand) in self.strategy.hands.items():
-            for card_pos in range(self.k):
-                kn = self.knowledge[player_id][card_pos]
-                if kn.knows_exactly() and hand[card_pos] is not None and hand[card_pos].equals(card):
-                    return True
-        
-        # check my hand
-        for card_pos in range(self.k):
-            kn = self.knowledge[self.id][card_pos]
-            if kn.knows_exactly() and any(card.equals(c) for c in self.strategy.possibilities[card_pos]):
-                return True
-        
-        return False
+        return self.strategy.duplicates.is_duplicate(card)
     
     
     def is_usable(self, clue_giver_id):
@@ -67,12 +52,16 @@ class CluesManager(object):
             - For every type that it is identified to be, 
             - 	Update self.possibilities using convention based information
         """
+        empathy = self.strategy.empathy
+        empathy.clue(clue_action.target_id, clue_action.touched, action_clue_code(clue_action, self.strategy.variant))
+        
         # Clue is for me
         if clue_action.target_id == self.id:
             # process direct clue
             for (i, p) in enumerate(self.possibilities):
-                for card in self.strategy.full_deck_composition:
-                    if not card.matches_clue(clue_action, i) and card in p:
+                mask = empathy[self.id][i]
+                for card in list(p):
+                    if not mask >> self.strategy.variant.card_index(card) & 1:
                         del p[card]
         
         # update explicit knowledge
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import Counter
+
+from ...action import Action
+from ...card import Card
+from ...clues import clue_code
+
+
+# numbers of the critical cards which are saved on the chop
+SAVE_NUMBERS = [2, 5]
+
+
+class Conventions:
+    """
+    Compiled tables for the conventions of bean, shared by all the strategies with the same hand size
+    and type of deck (see deck.py).
+
+    Hands are described by masks of positions (bit i is position i): chop, finesse and focus are
+    looked up from the mask of the clued cards and the mask of the touched cards.
+    The intent of a play clue is looked up from the board and the clue code (see clues.py).
+    """
+
+    instances = {}  # (k, type of deck) -> Conventions
+
+    @classmethod
+    def get(cls, k, variant):
+        if (k, variant.name) not in cls.instances:
+            cls.instances[k, variant.name] = Conventions(k, variant)
+        return cls.instances[k, variant.name]
+
+
+    def __init__(self, k, variant):
+        self.k = k
+        self.variant = variant
+        masks = range(1 << k)
+
+        # clued mask -> rightmost (chop) or leftmost (finesse) unclued position, or None
+        self.chop = [max((card_pos for card_pos in range(k) if not mask >> card_pos & 1), default=None) for mask in masks]
+        self.finesse = [min((card_pos for card_pos in range(k) if not mask >> card_pos & 1), default=None) for mask in masks]
+
+        # chop (k if None) -> touched mask -> focus
+        self.focus = [[chop if chop < k and mask >> chop & 1 else (mask & -mask).bit_length() - 1 for mask in masks] for chop in range(k + 1)]
+
+        # (board, clue code) -> intent of a play clue
+        self.intents = {}
+
+
+    def focus_index(self, chop, touched):
+        """
+        Focus of a clue touching the given mask, given the chop of the target before the clue.
+        """
+        return self.focus[self.k if chop is None else chop][touched]
+
+
+    def intent(self, board, clue):
+        """
+        Intent of a play clue, in the form (focus_cards, implicit_values): the focused card can only
+        be one of focus_cards, and the implicit numbers (for a color clue) or colors (for a number clue)
+        which are inferred.
+        """
+        variant = self.variant
+        key = (tuple(board[color] for color in variant.colors), clue)
+        if key not in self.intents:
+            (clue_type, value) = variant.clues[clue]
+            if clue_type == Action.COLOR:
+                # the focused card is the next one of the given color
+                number = board[value] + 1
+                implicit_values = [number] if number <= Card.NUM_NUMBERS else []
+                focus_cards = frozenset(card for card in variant.cards if card.number == number)
+            else:
+                # the focused card is playable
+                implicit_values = [color for color in variant.colors if board[color] + 1 == value]
+                focus_cards = frozenset(card for card in variant.cards if card.color in implicit_values)
+            self.intents[key] = (focus_cards, implicit_values)
+
+        return self.intents[key]
+
+
+    def save_clue(self, card, board, full_deck, discard_pile):
+        """
+        Code of the save clue for the given card on the chop, or None if it must not be saved.
+        """
+        if card.number in SAVE_NUMBERS and card.critical(board, full_deck, Counter(discard_pile)):
+            return clue_code(Action.NUMBER, card.number, self.variant)
+        return None
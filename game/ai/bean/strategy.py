@@ -9,33 +9,41 @@ from collections import Counter
 
 from ...action import Action, PlayAction, DiscardAction, ClueAction
 from ...card import Card, CardAppearance, get_appearance
-from ...deck import DECKS
+from ...deck import DECKS, VARIANTS
 from ...base_strategy import BaseStrategy
+from ...clues import action_clue_code
+from ...knowledge import DuplicatesIndex, Empathy, KnowledgeArray, KnowledgeView, Flag, Field, SetField
 from .clues_manager import CluesManager
+from .clue_table import ClueTable
+from .conventions import Conventions
 import random
-from collections import deque
 
 
 
 
-class PublicKnowledge:
+class PublicKnowledge(KnowledgeView):
     """
-    An instance of this class represents what a player knows about a card
+    An instance of this class represents what a player knows about a card.
+    It is a view on a bitfield of a KnowledgeArray.
     """
+    __slots__ = ()
     
-    def __init__(self, color=None, number=None):
-        self.color: str = color                  # know exact color, CARD.COLOR enum
-        self.number: int = number                # know exact number, int
-        self.playable: bool = False               # at some point, this card was playable
-        self.play_queue: deque = deque()         # Order in which player will play their playable cards
-        self.implicit_colors = []
-        self.implicit_numbers = []
-
-        self.non_playable: bool = False           # at some point, this card was not playable
-        self.useless: bool = False                # this card is useless    
+    TYPECODE = 'L'
+    
+    NUMBERS = range(1, Card.NUM_NUMBERS + 1)
+    
+    color = Field(0, Card.ALL_COLORS)               # know exact color, CARD.COLOR enum (None if unknown)
+    number = Field(3, NUMBERS)                      # know exact number, int (None if unknown)
+    playable = Flag(6)                              # at some point, this card was playable
+    non_playable = Flag(7)                          # at some point, this card was not playable
+    useless = Flag(8)                               # this card is useless
+    implicit_colors = SetField(9, Card.ALL_COLORS)  # colors inferred from conventions
+    implicit_numbers = SetField(16, NUMBERS)        # numbers inferred from conventions
+    
+    # bits of the cards touched by some clue
+    CLUED = color.mask | number.mask
     
     def __repr__(self):
-        print
         return ("C" if self.color else "-") + ("N" if self.number else "-") + ("P" if self.playable else "-") + ("Q" if self.non_playable else "-") + ("L" if self.useless else "-")
     
     
@@ -69,7 +77,6 @@ class Strategy(BaseStrategy):
     
     
     def __init__(self, verbose=False, params={}):
-        self.COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(Card.COLORS)}
         self.verbose = verbose
         self.params = params
     
@@ -83,6 +90,7 @@ class Strategy(BaseStrategy):
         self.k = k  # number of cards per hand
         self.board = board
         self.deck_type = deck_type
+        self.variant = VARIANTS[deck_type]   # tables of the type of deck (see deck.py)
         
         # store a copy of the full deck
         self.full_deck = get_appearance(DECKS[deck_type]())
@@ -102,7 +110,21 @@ class Strategy(BaseStrategy):
         self.possibilities = [Counter(self.full_deck) for i in range(self.k)]
         
         # knowledge of all players
-        self.knowledge = [[PublicKnowledge(color=False, number=False) for j in range(k)] for i in range(num_players)]
+        self.knowledge = [KnowledgeArray(PublicKnowledge, k) for i in range(num_players)]
+        
+        # what each player considers possible for his own cards
+        self.empathy = Empathy(self)
+        
+        # compiled conventions, and save clues of the chop cards seen since the discard pile changed
+        self.conventions = Conventions.get(k, self.variant)
+        self.save_clues = None
+        self.save_clues_version = None
+        
+        # cards known exactly by their owners
+        self.duplicates = DuplicatesIndex(self)
+        
+        # clues that can be given to the other players
+        self.clue_table = ClueTable(self)
         
         self.clues_manager = CluesManager(self)   
 
@@ -127,18 +149,29 @@ class Strategy(BaseStrategy):
         """
         Update possibilities removing visible cards.
         """
-        visible_cards = self.visible_cards()
-        for p in self.possibilities:
-            for card in self.full_deck_composition:
-                if card in p:
-                    # this card is still possible
-                    # update the number of possible occurrences
-                    p[card] = self.full_deck_composition[card] - visible_cards[card]
-                    
-                    if p[card] == 0:
-                        # remove this card
+        beliefs = self.game.beliefs if self.game is not None else None
+        if beliefs is not None:
+            # simulation mode: read the counts kept by the game for all the players (see belief_array.py)
+            for (p, counts) in zip(self.possibilities, beliefs.counts[self.id].tolist()):
+                for card in list(p):
+                    if counts[self.variant.card_index(card)] > 0:
+                        p[card] = counts[self.variant.card_index(card)]
+                    else:
                         del p[card]
         
+        else:
+            visible_cards = self.visible_cards()
+            for p in self.possibilities:
+                for card in self.full_deck_composition:
+                    if card in p:
+                        # this card is still possible
+                        # update the number of possible occurrences
+                        p[card] = self.full_deck_composition[card] - visible_cards[card]
+                        
+                        if p[card] == 0:
+                            # remove this card
+                            del p[card]
+        
         # TODO: why does this not work?
         # print("my hand: ", self.my_hand)
         # print("my knowledge: ", self.knowledge[self.id])
@@ -207,9 +240,7 @@ class Strategy(BaseStrategy):
         """
 
         "*** BEGIN SOLUTION ***"
-        for i, kn in enumerate(self.knowledge[player_id]):
-            if not (kn.knows(Action.COLOR) or kn.knows(Action.NUMBER)):
-                return i
+        return self.conventions.finesse[self.knowledge[player_id].mask(PublicKnowledge.CLUED)]
         "*** END SOLUTION ***"
 
 
@@ -219,10 +250,7 @@ class Strategy(BaseStrategy):
         """
 
         "*** BEGIN SOLUTION ***"
-        for i, kn in enumerate(self.knowledge[player_id][::-1]):
-            if not (kn.knows(Action.COLOR) or kn.knows(Action.NUMBER)):
-                return (self.k - 1) - i
-        return None
+        return self.conventions.chop[self.knowledge[player_id].mask(PublicKnowledge.CLUED)]
         "*** END SOLUTION ***"
 
 
@@ -232,13 +260,12 @@ class Strategy(BaseStrategy):
         """
 
         chop_idx = self.chop_index(clue_action.target_id) if clue_action.former_chop is None else clue_action.former_chop
-        focus_idx = chop_idx if chop_idx in clue_action.cards_pos else clue_action.cards_pos[0]
-        return focus_idx
+        return self.conventions.focus_index(chop_idx, clue_action.touched)
 
 
     def update_knowledge(self, player_id, card_pos, new_card_exists):
-        self.knowledge[player_id].pop(card_pos)
-        self.knowledge[player_id].insert(0, PublicKnowledge(None, None))
+        self.knowledge[player_id].shift(card_pos)
+        self.empathy.shift(player_id, card_pos, new_card_exists)
     
     
     def print_knowledge(self):
@@ -264,6 +291,9 @@ class Strategy(BaseStrategy):
                 # check for my new card
                 self.possibilities.pop(action.card_pos)
                 self.possibilities.insert(0, Counter(self.full_deck) if self.my_hand[0] is not None else Counter())
+            
+            self.duplicates.refresh(player_id)
+            self.clue_table.refresh(player_id)
         
         elif action.type == Action.CLUE:
             # someone gave a clue!
@@ -271,45 +301,53 @@ class Strategy(BaseStrategy):
         
         # update possibilities with visible cards
         self.update_possibilities()
+        self.empathy.refresh()
 
         if action.type == Action.CLUE:
             self.infer_clue_intent(player_id, action)
+            self.duplicates.refresh(action.target_id)
+            self.clue_table.refresh(action.target_id)
         
         # print knowledge
         if self.verbose and self.id == self.num_players-1:
             self.print_knowledge()
     
 
+    def cards_replaced(self):
+        """
+        The cards of the game have been replaced (e.g. in a rollout, see Game.deal()).
+        """
+        for player_id in self.other_players_id():
+            self.duplicates.refresh(player_id)
+            self.clue_table.refresh(player_id)
+        self.update_possibilities()
+        self.empathy.refresh()
+    
+    
     def infer_clue_intent(self, clue_giver_id: int, clue_action: ClueAction):
+        former_chop_idx = clue_action.former_chop
+        if clue_action.clue_type == ClueAction.NUMBER and former_chop_idx and clue_action.touched >> former_chop_idx & 1:
+            # It was a save clue
+            return
+        
+        # Else, it was a play clue: the focused card is the one given by the conventions
         focus_idx = self.focus_index(clue_action)
+        (focus_cards, implicit_values) = self.conventions.intent(self.board, action_clue_code(clue_action, self.variant))
+        
+        # Delete other possibilities
         card_possibilities = self.possibilities[focus_idx]
+        for card in list(card_possibilities):
+            if card not in focus_cards:
+                del card_possibilities[card]
+        
         kn = self.knowledge[clue_action.target_id][focus_idx]
+        # a color clue implies the numbers, a number clue the colors (before the bitfields, the inferred colors
+        # were appended to implicit_numbers by mistake; neither field is read yet, so the moves do not change)
         if clue_action.clue_type == ClueAction.COLOR:
-            # Color Clue
-            # Infer immediate play
-            inferred_number = self.board[clue_action.color] + 1
-
-            # Delete other possibilities
-            for card in copy.copy(card_possibilities):
-                if card.number != inferred_number:
-                    del card_possibilities[card]
-            kn.implicit_numbers.append(inferred_number)
-            kn.playable = True
+            kn.implicit_numbers += implicit_values
         else:
-            # Number clue
-            former_chop_idx = clue_action.former_chop
-            if former_chop_idx and former_chop_idx in clue_action.cards_pos:
-                # It was a save clue
-                return
-
-            # Else, it was a play clue
-            inferred_colors = [color for color, number in self.board.items() if clue_action.number == number + 1]
-            
-            for card in copy.copy(card_possibilities):
-                if card.color not in inferred_colors:
-                    del card_possibilities[card]
-            kn.implicit_numbers.extend(inferred_colors)
-            kn.playable = True
+            kn.implicit_colors += implicit_values
+        kn.playable = True
         
         
     def get_best_play(self):
@@ -349,20 +387,13 @@ class Strategy(BaseStrategy):
             for card_pos in range(self.k):
                     card = self.hands[target_id][card_pos]
                     kn = self.knowledge[target_id][card_pos]
-                    if card and card.playable(self.board):
-                        chop_idx = self.chop_index(target_id)
-                        color_clue = ClueAction(target_id, color=card.color)
-                        color_clue.apply(self.game)
-                        color_clue.former_chop = chop_idx
-
-                        number_clue = ClueAction(target_id, number=card.number)
-                        number_clue.apply(self.game)
-                        number_clue.former_chop = chop_idx
-
-                        if self.check_focus_match(color_clue, card_pos) and not kn.knows(ClueAction.COLOR) and self.is_good_touch(color_clue) and not kn.playable:
-                            play_clues.append(color_clue)
-                        elif self.check_focus_match(number_clue, card_pos) and not kn.knows(ClueAction.NUMBER) and self.is_good_touch(number_clue) and not kn.playable:
-                            play_clues.append(number_clue)
+                    if card and card.playable(self.board) and not kn.playable:
+                        # try a color clue, then a number clue
+                        for (clue_type, value) in [(ClueAction.COLOR, card.color), (ClueAction.NUMBER, card.number)]:
+                            candidate = self.clue_table.candidate(target_id, clue_type, value)
+                            if candidate.focus == card_pos and not kn.knows(clue_type) and self.clue_table.is_good_touch(target_id, clue_type, value):
+                                play_clues.append(self.clue_table.clue_action(target_id, clue_type, value))
+                                break
                 
         if len(play_clues) > 0:
             return random.choice(play_clues)
@@ -371,18 +402,22 @@ class Strategy(BaseStrategy):
 
 
     def get_best_save_clue(self):
+        if self.save_clues_version != len(self.discard_pile):
+            # the board and the discard pile changed
+            self.save_clues = {}
+            self.save_clues_version = len(self.discard_pile)
+        
+        # save the critical chop card of the first player
         target_id = self.next_player_id()
         while target_id != self.id:
-            for card_pos in range(self.k):
-                card = self.hands[target_id][card_pos]
-                chop_idx = self.chop_index(target_id)
-                if card and card_pos == chop_idx and card.critical(self.board, self.full_deck, self.discard_pile):
-                    if card.number == 5 or card.number == 2:
-                        clue_action = ClueAction(target_id, number=card.number)
-                        clue_action.apply(self.game)
-                        clue_action.former_chop = chop_idx
-                        return clue_action
-
+            chop_idx = self.chop_index(target_id)
+            if chop_idx is not None:
+                card = self.hands[target_id][chop_idx]
+                if card and card not in self.save_clues:
+                    self.save_clues[card] = self.conventions.save_clue(card, self.board, self.full_deck_composition, self.discard_pile)
+                if card and self.save_clues[card] is not None:
+                    return self.clue_table.clue_action(target_id, *self.variant.clues[self.save_clues[card]])
+            
             target_id = (target_id + 1) % self.num_players
         return None
 
@@ -431,7 +466,7 @@ class Strategy(BaseStrategy):
         """
 
         # If you see a critical card on someone's chop_index, save clue it. Clue the earliest person in play order
-        if self.game.clues > 0:
+        if self.clues > 0:
             best_save_clue = self.get_best_save_clue()
             if best_save_clue:
                 return best_save_clue
@@ -442,7 +477,7 @@ class Strategy(BaseStrategy):
             return best_play
 
         # Otherwise, try to give a play clue if there are clues left.
-        if self.game.clues > 0:
+        if self.clues > 0:
             best_play_clue = self.get_best_play_clue()
             if best_play_clue:
                 return best_play_clue
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import math
+import random
+import time
+
+from ...card import get_appearance
+from ...deck import DECKS
+from ...base_strategy import BaseStrategy
+from ...state import Tracker, to_action
+
+
+class Strategy(BaseStrategy):
+    """
+    Information Set Monte Carlo Tree Search (single observer).
+
+    Each iteration samples a deal consistent with what I know (see belief.DealSampler), descends the tree
+    with UCB on that deal, expands one node and finishes the game with the heuristic policy of State.
+    The tree only holds my turns: the other players follow the policy of State on the deal, since they see
+    my cards (searching their turns would average their choices over my possible hands).
+    The action of the policy is expanded first, and it is kept unless another action has a better mean score
+    by more than twice the standard error of the difference (see root_action()).
+    The nodes are identified by the public information (my cards are not part of the key, see key()):
+    their statistics are shared by all the deals, and by all the orders of actions leading to the same
+    public information (transpositions). The table of nodes is kept between turns: after the observed
+    turns, the new root is looked up in the table, so the statistics of the explored subtree are reused.
+
+    The knowledge of the players is the public knowledge of State, which is also tracked during the real game
+    (see state.Tracker), and by default only the clues following the convention of State are searched
+    (see State.useful_clue()).
+
+    Parameters (ai_params):
+    - time: time per move, in milliseconds (default: 1000; the deadline given by the game is also respected);
+    - max_iterations: maximum number of iterations per move (default: no limit);
+    - exploration: exploration constant of UCB, for scores divided by the maximum score (default: 0.2);
+    - conventional: only search the clues which follow the convention of State (default: True).
+    """
+
+    def __init__(self, verbose=False, params={}):
+        super(Strategy, self).__init__(verbose=verbose, params=params)
+        self.params = params
+
+        self.time = params.get('time', 1000) / 1000.0
+        self.max_iterations = params.get('max_iterations', None)
+        self.exploration = params.get('exploration', 0.2)
+        self.conventional = params.get('conventional', True)
+
+
+    def initialize(self, id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game):
+        """
+        To be called once before the beginning.
+        """
+        super(Strategy, self).initialize(id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game)
+        self.full_deck = get_appearance(DECKS[deck_type]())
+
+        # public knowledge of each player (see State), and what each player can infer from the visible cards
+        self.tracker = Tracker(self)
+
+        # information set key -> {action: [visits, total score, availability]}
+        self.table = {}
+        self.best_action = None
+
+
+    def feed_turn(self, player_id, action):
+        """
+        Receive information about a played turn.
+        """
+        self.tracker.feed_turn(player_id, action)
+
+
+    def key(self, state):
+        """
+        Key of the node of the given state: its public information.
+        The hands are not part of the key, so the cards drawn by the other players are treated as chance
+        events which are averaged in the statistics (the hands of the root are the same for all deals).
+        """
+        return (state.turn, tuple(state.board), state.clues, state.lives, tuple(state.discarded), tuple(state.clued),
+                tuple(tuple(knowledge) for knowledge in state.knowledge))
+
+
+    def iterate(self, root, sampler):
+        """
+        Run one iteration of the search from the given root state.
+        """
+        state = self.tracker.deal(root, sampler)
+
+        # selection and expansion (the other players follow the policy of State on the deal)
+        path = []
+        while not state.over:
+            player_id = state.turn % state.num_players
+            if player_id != self.id:
+                state.step(state.policy_action(player_id))
+                continue
+
+            key = self.key(state)
+            node = self.table.get(key)
+            if node is None:
+                node = self.table[key] = {}
+
+            actions = state.legal_actions(player_id, conventional=self.conventional) or state.legal_actions(player_id)
+            untried = []
+            for action in actions:
+                stats = node.get(action)
+                if stats is None:
+                    stats = node[action] = [0, 0.0, 0, 0.0]
+                stats[2] += 1
+                if stats[0] == 0:
+                    untried.append(action)
+
+            if untried:
+                # the action of the policy is tried first
+                policy_action = state.policy_action(player_id)
+                action = policy_action if policy_action in untried else random.choice(untried)
+                path.append(node[action])
+                state.step(action)
+                break
+
+            action = max(actions, key=lambda action: self.ucb(node[action]))
+            path.append(node[action])
+            state.step(action)
+
+        # simulation and backpropagation
+        score = state.rollout()
+        for stats in path:
+            stats[0] += 1
+            stats[1] += score
+            stats[3] += score * score
+
+
+    def ucb(self, stats):
+        (visits, total, availability, squares) = stats
+        return total / visits / self.variant.max_score + self.exploration * math.sqrt(math.log(availability) / visits)
+
+
+    def root_action(self, node, legal, policy_action):
+        """
+        The legal action of the root with the best mean score, if it is better than the action of the policy
+        by more than twice the standard error of the difference (the best of many actions is often lucky),
+        or else the action of the policy. The nodes reused from the previous turns may contain clues which
+        are not legal in the real game (the hands are not part of the key), hence the given legal actions.
+        """
+        policy_stats = node.get(policy_action)
+        if policy_stats is None or policy_stats[0] < 2:
+            return to_action(policy_action, self.variant)
+
+        def mean_variance(stats):
+            # mean score, and variance of the mean
+            (visits, total, availability, squares) = stats
+            mean = total / visits
+            return (mean, max(squares / visits - mean * mean, 0.0) / (visits - 1))
+
+        (policy_mean, policy_variance) = mean_variance(policy_stats)
+        best = policy_action
+        best_mean = policy_mean
+        for (action, stats) in node.items():
+            if action in legal and stats[0] >= max(3, policy_stats[0] // 2):
+                (mean, variance) = mean_variance(stats)
+                if mean - 2 * math.sqrt(variance + policy_variance) > policy_mean and mean > best_mean:
+                    best = action
+                    best_mean = mean
+        return to_action(best, self.variant)
+
+
+    def get_turn_action(self):
+        """
+        Choose action for this turn.
+        """
+        deadline = time.perf_counter() + min(self.time, self.remaining_time())
+        root = self.tracker.state()
+        self.best_action = None
+
+        # forget the information sets of the previous turns
+        for key in [key for key in self.table if key[0] < root.turn]:
+            del self.table[key]
+
+        sampler = self.tracker.sampler()
+
+        # the action of the policy and the legal actions do not depend on my cards, only on my knowledge
+        state = self.tracker.deal(root, sampler)
+        policy_action = state.policy_action(self.id)
+        legal = set(state.legal_actions(self.id))
+
+        key = self.key(root)
+        node = self.table.setdefault(key, {})
+        reused = sum(stats[0] for stats in node.values())
+
+        iterations = 0
+        while time.perf_counter() < deadline and (self.max_iterations is None or iterations < self.max_iterations):
+            self.iterate(root, sampler)
+            iterations += 1
+            if iterations % 16 == 0:
+                self.best_action = self.root_action(node, legal, policy_action)
+
+        self.best_action = self.root_action(node, legal, policy_action)
+        self.log("%d iterations (%d reused), action %r" % (iterations, reused, self.best_action))
+        return self.best_action if self.best_action is not None else super(Strategy, self).default_action()
+
+
+    def default_action(self):
+        """
+        The best action found so far.
+        """
+        if self.best_action is not None:
+            return self.best_action
+        return super(Strategy, self).default_action()
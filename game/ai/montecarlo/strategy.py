@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import math
+import time
+
+from ...card import Card, get_appearance
+from ...deck import DECKS
+from ...action_codes import action_code, code_action, legal_actions
+from ...base_strategy import BaseStrategy
+from ...belief import DealSampler
+from ...state import Tracker, to_action
+
+
+class Strategy(BaseStrategy):
+    """
+    Monte Carlo strategy, built on top of a rollout policy.
+
+    At each turn, the candidate actions are the action chosen by the policy and all the legal actions.
+    Deals consistent with what I know are sampled, and on each deal the candidates are played in turn,
+    each one followed by a rollout of the game where all players use the policy; the first candidate of
+    each deal changes (round-robin), so that the candidates get the same number of deals when the time runs out.
+    The action of the policy is replaced by the candidate with the best mean gain over it, on the same deals.
+    The search is anytime: it stops when the time per move is over, or after the maximum number of deals.
+
+    By default the policy is the heuristic policy of State (see State.policy_action()), and the rollouts
+    are played on the compact State, starting from the public knowledge of the players (see state.Tracker).
+    Another AI can be used as the policy: the policies of the rollouts then keep what they learnt during
+    the game, since a copy of the game where every seat uses the policy (see Game.fork()) follows the real one,
+    and each rollout starts from a clone of it, with its strategies, on the sampled deal (see Game.deal()).
+    Such rollouts are much slower (tens of milliseconds instead of one).
+
+    Parameters (ai_params):
+    - rollout_ai: AI used as rollout policy (default: the policy of State);
+    - rollout_params: parameters of the rollout policy;
+    - time: time per move, in milliseconds (default: 1000; the deadline given by the game is also respected);
+    - max_deals: maximum number of sampled deals per move (default: no limit);
+    - min_deals: minimum number of deals on which an action must be evaluated to be preferred
+      to the action of the policy (default: half the number of deals expected within the time, and at least 3).
+    """
+
+    def __init__(self, verbose=False, params={}):
+        super(Strategy, self).__init__(verbose=verbose, params=params)
+        self.params = params
+
+        self.rollout_ai = params.get('rollout_ai', None)
+        self.rollout_params = params.get('rollout_params', {})
+        self.time = params.get('time', 1000) / 1000.0
+        self.max_deals = params.get('max_deals', None)
+        self.min_deals = params.get('min_deals', None)
+
+
+    def initialize(self, id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game):
+        """
+        To be called once before the beginning.
+        """
+        super(Strategy, self).initialize(id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game)
+
+        self.full_deck = get_appearance(DECKS[deck_type]())
+        self.tracker = Tracker(self)
+
+        if self.rollout_ai is not None:
+            # the game played by the rollout policy, which follows the real one (my seat is the policy itself)
+            self.rollout_game = game.fork(ai=self.rollout_ai, ai_params=self.rollout_params)
+            self.policy = self.rollout_game.players[id]
+        else:
+            self.rollout_game = None
+
+
+    def feed_turn(self, player_id, action):
+        """
+        Receive information about a played turn.
+        """
+        self.tracker.feed_turn(player_id, action)
+
+        if self.rollout_game is not None:
+            # the action is already populated, and the rollout game has the same cards
+            self.rollout_game.play_turn(action)
+
+
+    def default_action(self):
+        """
+        The action chosen by the policy.
+        """
+        return self.policy_action
+
+
+    def candidate_actions(self, policy_action):
+        """
+        The action chosen by the policy, followed by the other legal actions.
+        """
+        policy_code = action_code(policy_action, self.variant)
+        return [policy_action] + [code_action(code, self.variant) for code in legal_actions(self.game, self.id) if code != policy_code]
+
+
+    def sampler(self):
+        """
+        Sampler of the deals consistent with what the policy knows about my hand (its possibilities, if it keeps
+        them, as alphahanabi and bean do: the rollout policies expect its conventions to hold), or else with the clues.
+        A position where the possibilities of the policy are empty only follows the clues.
+        """
+        masks = list(self.tracker.empathy[self.id])
+        possibilities = getattr(self.policy.strategy, 'possibilities', None)
+        if possibilities is not None:
+            try:
+                policy_masks = [sum(1 << self.variant.card_index(card) for card in p) for p in possibilities]
+                return DealSampler.from_strategy(self, [mask & policy_mask or mask for (mask, policy_mask) in zip(masks, policy_masks)])
+            except ValueError:
+                self.log("the conventions of the policy are not consistent, sampling from the clues")
+        return DealSampler.from_strategy(self, masks)
+
+
+    def fork_rollout(self, action, hand, deck):
+        """
+        Score of the game obtained playing the given action on the given deal, followed by the policy
+        (on a clone of the rollout game).
+        """
+        hands = [None] * self.num_players
+        hands[self.id] = [Card(id=-1 - i, color=card.color, number=card.number) if card is not None else None for (i, card) in enumerate(hand)]
+        deck = [Card(id=-1 - self.k - i, color=card.color, number=card.number) for (i, card) in enumerate(deck)]
+        game = self.rollout_game.clone(with_strategies=True)
+        game.deal(hands=hands, deck=deck)
+
+        action = copy.copy(action)
+        action.apply(game)
+        game.play_turn(action)
+
+        if not game.end_game:
+            for _ in game.run_game():
+                pass
+        return game.get_current_score()
+
+
+    def get_turn_action(self):
+        """
+        Choose action for this turn.
+        """
+        deadline = time.perf_counter() + min(self.time, self.remaining_time())
+        if self.rollout_game is not None:
+            return self.fork_turn_action(deadline)
+
+        root = self.tracker.state()
+        try:
+            sampler = self.tracker.sampler()
+        except ValueError:
+            self.log("no consistent deal, following the policy")
+            state = root.copy()
+            state.hands[self.id] = [0 if card is not None else -1 for card in self.my_hand]
+            self.policy_action = to_action(state.policy_action(self.id), self.variant)
+            return self.policy_action
+
+        # the action of the policy and the legal actions do not depend on my cards, only on my knowledge
+        state = self.tracker.deal(root, sampler)
+        policy_action = state.policy_action(self.id)
+        self.policy_action = to_action(policy_action, self.variant)
+        candidates = [policy_action] + [action for action in state.legal_actions(self.id) if action != policy_action]
+
+        def evaluate(action, state):
+            state = state.copy()
+            state.step(action)
+            return state.rollout()
+
+        best = self.search(candidates, lambda: self.tracker.deal(root, sampler), evaluate, deadline)
+        return to_action(candidates[best], self.variant)
+
+
+    def fork_turn_action(self, deadline):
+        """
+        Choose the action of this turn, with the rollouts of another AI.
+        """
+        policy_action = self.policy_action = self.policy.get_turn_action()     # the policy updates itself first
+        candidates = self.candidate_actions(policy_action)
+
+        try:
+            sampler = self.sampler()
+        except ValueError:
+            self.log("no consistent deal, following the policy")
+            return policy_action
+
+        best = self.search(candidates, lambda: sampler.sample(1)[0], lambda action, deal: self.fork_rollout(action, *deal), deadline)
+        return candidates[best]
+
+
+    def search(self, candidates, sample, evaluate, deadline):
+        """
+        Evaluate the candidates (the first one is the action of the policy) on deals given by sample(),
+        with evaluate(action, deal), until the deadline, and return the index of the chosen candidate.
+        """
+        # a rollout is started only if it would end before the deadline, if it took as long as the longest one so far
+        scores = [{} for action in candidates]     # deal number -> score
+        num_deals = 0
+        longest = 0     # longest time of a rollout
+        start = time.perf_counter()
+        while self.max_deals is None or num_deals < self.max_deals:
+            deal = sample()
+            offset = num_deals % len(candidates)
+            order = list(range(offset, len(candidates))) + list(range(offset))
+            num_deals += 1
+            for i in order:
+                rollout_start = time.perf_counter()
+                if rollout_start + longest >= deadline:
+                    break
+                scores[i][num_deals] = evaluate(candidates[i], deal)
+                longest = max(longest, time.perf_counter() - rollout_start)
+            else:
+                continue
+            break
+
+        # the deals expected within the time, from the rate of the rollouts
+        min_deals = self.min_deals
+        if min_deals is None:
+            elapsed = time.perf_counter() - start
+            expected = sum(len(s) for s in scores) / len(candidates) * (deadline - start) / elapsed if elapsed > 0 else 0
+            if self.max_deals is not None:
+                expected = min(expected, self.max_deals)
+            min_deals = max(3, int(expected / 2))
+
+        # compare each candidate with the policy action on the same deals: the gain must be larger than
+        # twice its standard error, since the best of many candidates is often lucky
+        best = 0
+        best_gain = 0
+        for i in range(1, len(candidates)):
+            gains = [scores[i][deal] - scores[0][deal] for deal in scores[i] if deal in scores[0]]
+            n = len(gains)
+            if n >= min_deals:
+                gain = sum(gains) / n
+                variance = sum((g - gain) ** 2 for g in gains) / max(n - 1, 1)
+                if gain - 2 * math.sqrt(variance / n) > 0 and gain > best_gain:
+                    best = i
+                    best_gain = gain
+
+        self.log("%d deals, best action %r (gain %.2f over the policy)" % (num_deals, candidates[best], best_gain))
+        return best
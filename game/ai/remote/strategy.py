@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from ...bot_protocol import RemoteStrategy
+
+
+class Strategy(RemoteStrategy):
+    """
+    A seat played by a bot process (see bot_protocol.py), e.g. with the parameters
+    {'command': 'python -m game.bot_protocol bean', 'processes': 4}.
+    """
+    pass
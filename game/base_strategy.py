@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import math
+import time
+
 from .card import Card, CardAppearance
-from .action import Action
+from .action import Action, DiscardAction
+from .clues import legal_clues
+from .deck import VARIANTS
 from typing import List, Dict
 
 
@@ -26,6 +31,7 @@ class BaseStrategy(object):
         self.k: int = k  # number of cards per hand
         self.board: Dict[str, int] = board # board state, a dict of color to int
         self.deck_type = deck_type
+        self.variant = VARIANTS[deck_type]  # tables of the type of deck (see deck.py)
         
         self.my_hand: List[CardAppearance] = my_hand 
         self.hands: List[List[CardAppearance]] = hands
@@ -35,9 +41,12 @@ class BaseStrategy(object):
     
     
     def update(self, clues: int, lives: int, my_hand: List[CardAppearance], hands: List[List[CardAppearance]], 
-                     discard_pile: List[Card], turn: int, last_turn: bool, deck_size: int, game) -> None:
+                     discard_pile: List[Card], turn: int, last_turn: bool, deck_size: int, game,
+                     hand_masks: Dict[int, List[int]] = None, deadline: float = None) -> None:
         """
         To be called immediately after every turn.
+        The masks of the other players' hands (see clues.py) are kept up to date by the game, and must not be modified.
+        The deadline (see time.perf_counter()) of the phase which follows is None if it has no time limit.
         """
         self.clues: int = clues
         self.lives: int = lives
@@ -49,6 +58,32 @@ class BaseStrategy(object):
         self.hands: List[List[CardAppearance]] = hands
         self.discard_pile: List[CardAppearance] = discard_pile
         self.game = game
+        self.hand_masks: Dict[int, List[int]] = hand_masks
+        self.deadline: float = deadline
+    
+    
+    def remaining_time(self) -> float:
+        """
+        Time (in seconds) before the deadline of the current phase (infinite if there is no deadline).
+        """
+        if self.deadline is None:
+            return math.inf
+        return self.deadline - time.perf_counter()
+    
+    
+    def cards_replaced(self) -> None:
+        """
+        Called after update() when the cards of the game have been replaced (see Game.deal()), e.g. in a copy
+        of the game used for a rollout: recompute what depends on the cards seen. By default, nothing.
+        """
+        pass
+    
+    
+    def legal_clues(self, player_id: int) -> List[int]:
+        """
+        Codes of the clues which can be given to the given player (see clues.py).
+        """
+        return legal_clues(self.hand_masks[player_id])
     
     
     def feed_turn(self, player_id: int, action: Action) -> None:
@@ -63,6 +98,16 @@ class BaseStrategy(object):
         Choose action for this turn.
         """
         raise NotImplementedError
+    
+    
+    def default_action(self) -> Action:
+        """
+        Cheap action, used instead of the chosen one if get_turn_action() misses the deadline
+        and the game enforces deadlines (once get_turn_action() has returned: it is not interrupted).
+        By default, discard the rightmost card.
+        """
+        card_pos = max(card_pos for (card_pos, card) in enumerate(self.my_hand) if card is not None)
+        return DiscardAction(card_pos)
 
 
     def log(self, message):
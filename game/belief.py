@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Sampling of the deals (my hand and the order of the deck) which are consistent with what a player knows.
+"""
+
+import random
+
+
+class DealSampler:
+    """
+    Samples my hand and the remaining deck, given the cards which are possible in each position of my hand
+    (as masks, see clues.py; 0 for empty positions) and the number of unseen copies of each card
+    (indexed as in the cards of the given type of deck, see deck.py).
+
+    Every physical assignment of the unseen copies is equally likely: a hand with two copies of a card
+    among three unseen copies is weighted accordingly. Hands are sampled position by position, from
+    the exact conditional distribution (no rejection): the number of completions of a partial hand is
+    computed once and cached, and the cache is shared by all the samples of the sampler.
+    The deck is a uniformly random permutation of the remaining cards, in the order of Game.deck
+    (the next card to be drawn is the last one).
+    """
+
+    def __init__(self, masks, unseen, variant):
+        self.k = len(masks)
+        self.unseen = list(unseen)
+        self.cards = variant.cards
+        num_cards = variant.num_cards
+
+        # non-empty positions, and the cards which can be there
+        self.slots = [card_pos for (card_pos, mask) in enumerate(masks) if mask]
+        self.candidates = [[i for i in range(num_cards) if masks[card_pos] >> i & 1 and self.unseen[i] > 0] for card_pos in self.slots]
+
+        # cards with the same number of unseen copies and the same set of possible positions are interchangeable
+        signatures = {}
+        self.classes = [signatures.setdefault((self.unseen[i], tuple(i in candidates for candidates in self.candidates)), len(signatures)) for i in range(num_cards)]
+
+        self.branches = {}      # partial hand -> (candidates, cumulative weights)
+        self.counts = {}        # state (canonical form of a partial hand) -> number of completions
+
+        self.used = [0] * num_cards
+        self.total = self.count(0, ())
+        if self.total == 0:
+            raise ValueError("No deal is consistent with the given knowledge")
+
+
+    @classmethod
+    def from_strategy(cls, strategy, masks=None):
+        """
+        Construct the sampler for the given strategy, which must have the attributes id, variant, full_deck,
+        discard_pile and hands, and (if masks are not given) empathy (see knowledge.Empathy).
+        """
+        variant = strategy.variant
+        card_index = variant.card_index
+        unseen = [0] * variant.num_cards
+        for card in strategy.full_deck:
+            unseen[card_index(card)] += 1
+        for card in strategy.discard_pile:
+            unseen[card_index(card)] -= 1
+        for hand in strategy.hands.values():
+            for card in hand:
+                if card is not None:
+                    unseen[card_index(card)] -= 1
+
+        return cls(masks if masks is not None else strategy.empathy[strategy.id], unseen, variant)
+
+
+    def state(self, depth, stack):
+        # canonical form of a partial hand (the cards of the first positions, in stack)
+        return (depth, tuple(sorted((self.classes[i], self.used[i]) for i in set(stack))))
+
+
+    def branch(self, depth, stack):
+        """
+        Possible cards in the next position, with cumulative weights (numbers of completions).
+        """
+        key = (depth, tuple(sorted(stack)))
+        if key not in self.branches:
+            candidates = []
+            cum_weights = []
+            total = 0
+            for i in self.candidates[depth]:
+                available = self.unseen[i] - self.used[i]
+                if available > 0:
+                    self.used[i] += 1
+                    weight = available * self.count(depth + 1, stack + (i,))
+                    self.used[i] -= 1
+                    if weight > 0:
+                        total += weight
+                        candidates.append(i)
+                        cum_weights.append(total)
+            self.branches[key] = (candidates, cum_weights)
+            self.counts[self.state(depth, stack)] = total
+
+        return self.branches[key]
+
+
+    def count(self, depth, stack):
+        """
+        Number of completions of the given partial hand.
+        """
+        if depth == len(self.slots):
+            return 1
+        state = self.state(depth, stack)
+        if state not in self.counts:
+            self.branch(depth, stack)
+        return self.counts[state]
+
+
+    def sample_hand(self, rng=random):
+        """
+        Sample my hand, as a list of card indices (None for empty positions).
+        """
+        hand = [None] * self.k
+        stack = ()
+        for (depth, card_pos) in enumerate(self.slots):
+            (candidates, cum_weights) = self.branch(depth, stack)
+            i = rng.choices(candidates, cum_weights=cum_weights)[0]
+            hand[card_pos] = i
+            self.used[i] += 1
+            stack += (i,)
+
+        # restore the state of the sampler
+        for i in stack:
+            self.used[i] -= 1
+        return hand
+
+
+    def sample_deal(self, rng=random):
+        """
+        Sample a deal, as a pair (hand, deck) of lists of card indices (None for empty positions).
+        """
+        hand = self.sample_hand(rng)
+
+        remaining = list(self.unseen)
+        for i in hand:
+            if i is not None:
+                remaining[i] -= 1
+        deck = [i for i in range(len(remaining)) for _ in range(remaining[i])]
+        rng.shuffle(deck)
+
+        return (hand, deck)
+
+
+    def sample(self, n, rng=random):
+        """
+        Sample n deals, as pairs (hand, deck) of lists of cards (appearances).
+        """
+        res = []
+        for _ in range(n):
+            (hand, deck) = self.sample_deal(rng)
+            res.append(([self.cards[i] if i is not None else None for i in hand], [self.cards[i] for i in deck]))
+        return res
+
+
+    def enumerate_hands(self, max_hands=1000):
+        """
+        All my possible hands, as pairs (hand, probability), or None if there are more than max_hands.
+        """
+        res = []
+
+        def visit(depth, stack, hand, weight):
+            if len(res) > max_hands:
+                return
+            if depth == len(self.slots):
+                res.append(([self.cards[i] if i is not None else None for i in hand], weight / self.total))
+                return
+
+            (candidates, _) = self.branch(depth, stack)
+            for i in candidates:
+                available = self.unseen[i] - self.used[i]
+                hand[self.slots[depth]] = i
+                self.used[i] += 1
+                visit(depth + 1, stack + (i,), hand, weight * available)
+                self.used[i] -= 1
+            hand[self.slots[depth]] = None
+
+        visit(0, (), [None] * self.k, 1)
+        return res if len(res) <= max_hands else None
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Beliefs of all the players of a game, kept by the game itself in simulation mode (see Game(vector_beliefs=True)).
+Requires NumPy, which is imported only when this module is used.
+
+For each player and each position of his hand, the array counts[player_id, card_pos] gives the number of copies
+of each card (indexed as in the cards of the type of deck, see deck.py) which the player considers possible in that position: the copies not
+visible to him, restricted to the cards which are consistent with the clues he received. This is the same as
+the possibilities computed by update_possibilities() in alphahanabi and bean, before any convention is applied.
+"""
+
+import numpy as np
+
+from collections import Counter
+
+from .action import Action
+from .clues import action_clue_code
+from .deck import VARIANTS
+
+
+# cards touched by each clue code, as rows of booleans, for each type of deck
+CLUE_ROWS = {name: np.array([[clue_cards >> i & 1 for i in range(variant.num_cards)] for clue_cards in variant.clue_cards], dtype=bool)
+             for (name, variant) in VARIANTS.items()}
+
+
+class BeliefArray:
+    """
+    Beliefs of all the players, as arrays indexed by [player_id, card_pos, card]; each turn updates all of them
+    with a few array operations (see apply_turn()).
+    """
+
+    def __init__(self, game):
+        self.game = game
+        variant = game.variant
+        self.variant = variant
+        num_players = game.num_players
+        k = game.k
+        num_cards = variant.num_cards
+
+        # number of copies of each card
+        self.copies = np.array(variant.copies, dtype=np.int16)
+
+        # cards consistent with the clues received, for each player and position
+        self.possible = np.ones((num_players, k, num_cards), dtype=bool)
+        for player in game.players:
+            for (card_pos, card) in enumerate(player.hand):
+                if card is None:
+                    self.possible[player.id, card_pos] = False
+
+        self.visible = None
+        self.counts = None
+        self.refresh_visible()
+
+
+    def refresh_visible(self):
+        """
+        Recompute the copies visible to each player: the discard pile and the hands of the other players
+        (e.g. after the cards of the game have been replaced, see Game.deal()).
+        """
+        variant = self.variant
+        self.visible = np.zeros((self.game.num_players, variant.num_cards), dtype=np.int16)
+        in_hand = np.zeros((self.game.num_players, variant.num_cards), dtype=np.int16)
+        for player in self.game.players:
+            for card in player.hand:
+                if card is not None:
+                    in_hand[player.id, variant.card_index(card)] += 1
+        for card in self.game.discard_pile:
+            self.visible[:, variant.card_index(card)] += 1
+        self.visible += in_hand.sum(axis=0) - in_hand
+        self.update_counts()
+
+
+    def clone(self, game):
+        """
+        Copy of the beliefs, for a copy of the game (see Game.clone()).
+        """
+        res = BeliefArray.__new__(BeliefArray)
+        res.game = game
+        res.variant = self.variant
+        res.copies = self.copies
+        res.possible = self.possible.copy()
+        res.visible = self.visible.copy()
+        res.counts = self.counts
+        return res
+
+
+    def update_counts(self):
+        self.counts = np.where(self.possible, (self.copies - self.visible)[:, None, :], 0)
+
+
+    def apply_turn(self, turn):
+        """
+        Update the beliefs of all the players after the given turn (already applied to the game).
+        """
+        action = turn.action
+        player_id = turn.player.id
+
+        if action.type in [Action.PLAY, Action.DISCARD]:
+            # the card leaves the hand (it is now visible to its owner), and the new card is seen by the others
+            card_pos = action.card_pos
+            possible = self.possible[player_id]
+            possible[1:card_pos + 1] = possible[:card_pos].copy()
+            self.visible[player_id, self.variant.card_index(self.game.discard_pile[-1])] += 1
+
+            new_card = turn.player.hand[0]
+            possible[0] = new_card is not None
+            if new_card is not None:
+                i = self.variant.card_index(new_card)
+                self.visible[:, i] += 1
+                self.visible[player_id, i] -= 1
+
+        else:
+            # the touched positions get the cards of the clue, the others the remaining cards
+            row = CLUE_ROWS[self.variant.name][action_clue_code(action, self.variant)]
+            touched = (action.touched >> np.arange(self.game.k)) & 1
+            self.possible[action.target_id] &= np.where(touched[:, None] == 1, row, ~row)
+
+        self.update_counts()
+
+
+    def slot(self, player_id, card_pos):
+        """
+        Possibilities of the given player for his card in the given position, as a Counter of appearances
+        (the format of the possibilities of alphahanabi and bean).
+        """
+        return Counter({self.variant.cards[i]: n for (i, n) in enumerate(self.counts[player_id, card_pos].tolist()) if n > 0})
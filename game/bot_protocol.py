@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Protocol for bots running in separate processes (e.g. in another Python environment, or sandboxed),
+instead of being imported as game.ai.<name>.strategy.
+
+A bot process reads batches of requests from its standard input and writes the replies to its standard output,
+one JSON list per line. A request is a list [bot, method, arguments...], where bot is the number of a strategy
+of the process (a seat of a game), and the methods mirror BaseStrategy:
+- [bot, "initialize", id, num_players, k, deck_type, board, my_hand, hands, discard_pile, deck_size, params];
+- [bot, "update", clues, lives, my_hand, hands, discarded, turn, last_turn, deck_size, board, time_left];
+- [bot, "feed_turn", player_id, code, turn, touched, former_chop];
+- [bot, "get_turn_action"];
+- [bot, "close"]: forget the strategy.
+The reply to a batch has one item for each request: [code, former_chop] for get_turn_action, null for the
+others, or a string if the request failed. Cards are represented by their index in the variant
+(see Variant.card_index() in deck.py), a hidden card by -1 and an empty position by null; the board is
+the list of the heights of the stacks, and hands has one hand per player (null for the player of the strategy).
+Actions are represented by their codes (see action_codes.py), with the fields filled by Action.apply():
+the turn, the positions touched by a clue (mask) and the former chop of the target (see bean).
+The discard pile only grows, so an update only has the cards discarded since the previous one (discarded).
+The time left (in seconds) before the deadline of the next phase is null if it has no limit.
+Strategies do not receive the game, so the ones which need it (e.g. montecarlo) cannot run in a bot process.
+
+Any Strategy class can be served by serve(), e.g. with "python -m game.bot_protocol bean" for a built-in AI.
+On the side of the game, the strategy of each seat is a RemoteStrategy (AI remote, see game/ai/remote),
+which sends its requests to a BotPool of processes running the same command. The requests are queued,
+and a round trip sends all the requests queued for each process in one line: the notifications (initialize,
+update, feed_turn) are sent together with the next decision. With run_games(), the decisions of many games
+played at the same time are requested in one round trip. The processes run until their pool is closed
+(see BotPool.close_all()), which also sends the close requests still queued.
+"""
+
+import itertools
+import json
+import shlex
+import subprocess
+import sys
+import time
+import weakref
+
+from .action import Action
+from .action_codes import action_code, code_action
+from .base_strategy import BaseStrategy
+from .clues import hand_masks, cards_positions
+from .deck import VARIANTS
+
+
+HIDDEN = -1
+
+# seconds given to a bot process to exit when its input is closed
+CLOSE_TIMEOUT = 5.0
+
+
+def encode_card(card, variant):
+    # a hidden card is 0 (see get_appearance())
+    if card is None:
+        return None
+    return HIDDEN if card == 0 else variant.card_index(card)
+
+
+def decode_card(card, variant):
+    if card is None:
+        return None
+    return 0 if card == HIDDEN else variant.cards[card]
+
+
+def encode_cards(cards, variant):
+    return [encode_card(card, variant) for card in cards]
+
+
+def decode_cards(cards, variant):
+    return [decode_card(card, variant) for card in cards]
+
+
+class BotState:
+    """
+    A strategy served by a bot process, with the state of the game which it shares with the game
+    in the process of the game (see BaseStrategy.initialize()).
+    """
+
+    def __init__(self, Strategy, id, num_players, k, deck_type, board, my_hand, hands, discard_pile, deck_size, params):
+        self.strategy = Strategy(verbose=False, params=params)
+        self.variant = VARIANTS[deck_type]
+        self.board = dict(zip(self.variant.colors, board))
+        self.discard_pile = decode_cards(discard_pile, self.variant)
+        self.strategy.initialize(
+            id=id,
+            num_players=num_players,
+            k=k,
+            board=self.board,
+            deck_type=deck_type,
+            my_hand=decode_cards(my_hand, self.variant),
+            hands=self.decode_hands(hands),
+            discard_pile=list(self.discard_pile),
+            deck_size=deck_size,
+            game=None
+        )
+
+
+    def decode_hands(self, hands):
+        return {i: decode_cards(hand, self.variant) for (i, hand) in enumerate(hands) if hand is not None}
+
+
+    def update(self, clues, lives, my_hand, hands, discarded, turn, last_turn, deck_size, board, time_left):
+        # the board is shared with the strategy
+        self.board.update(zip(self.variant.colors, board))
+        self.discard_pile += decode_cards(discarded, self.variant)
+        hands = self.decode_hands(hands)
+        self.strategy.update(
+            clues=clues,
+            lives=lives,
+            my_hand=decode_cards(my_hand, self.variant),
+            hands=hands,
+            discard_pile=list(self.discard_pile),
+            turn=turn,
+            last_turn=last_turn,
+            deck_size=deck_size,
+            game=None,
+            hand_masks={i: hand_masks(hand, variant=self.variant) for (i, hand) in hands.items()},
+            deadline=time.perf_counter() + time_left if time_left is not None else None
+        )
+
+
+    def feed_turn(self, player_id, code, turn, touched, former_chop):
+        action = code_action(code, self.variant)
+        action.turn = turn
+        if action.type == Action.CLUE:
+            action.touched = touched
+            action.cards_pos = cards_positions(touched)
+            action.former_chop = former_chop
+        self.strategy.feed_turn(player_id, action)
+
+
+    def get_turn_action(self):
+        action = self.strategy.get_turn_action()
+        return [action_code(action, self.variant), getattr(action, 'former_chop', None)]
+
+
+def serve(Strategy, input=None, output=None):
+    """
+    Serve the strategies of the given class, reading requests from input (by default, the standard input)
+    and writing replies to output (by default, the standard output), until input is closed.
+    """
+    input = input if input is not None else sys.stdin
+    output = output if output is not None else sys.stdout
+    if output is sys.stdout:
+        # the messages of the strategies must not mix with the replies
+        sys.stdout = sys.stderr
+
+    bots = {}
+    for line in input:
+        replies = []
+        for request in json.loads(line):
+            bot, method, args = request[0], request[1], request[2:]
+            try:
+                if method == "initialize":
+                    bots[bot] = BotState(Strategy, *args)
+                    replies.append(None)
+                elif method == "close":
+                    bots.pop(bot, None)
+                    replies.append(None)
+                elif method in ["update", "feed_turn", "get_turn_action"]:
+                    replies.append(getattr(bots[bot], method)(*args))
+                else:
+                    raise ValueError("Unknown method %s" % method)
+            except Exception as e:
+                replies.append("%s: %s" % (type(e).__name__, e))
+
+        output.write(json.dumps(replies, separators=(',', ':')) + "\n")
+        output.flush()
+
+
+class Reply:
+    """
+    Reply to a request, available after the round trip which sent it.
+    """
+
+    def __init__(self):
+        self.value = None
+
+
+class BotProcess:
+    """
+    A bot process, with the requests to be sent in the next round trip.
+    """
+
+    def __init__(self, args):
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.num_bots = 0
+        self.requests = []
+        self.replies = []   # Reply of each request (None for the notifications)
+
+
+    def send(self, request, reply=None):
+        self.requests.append(request)
+        self.replies.append(reply)
+
+
+    def close_bot(self, bot):
+        self.send([bot, "close"])
+        self.num_bots -= 1
+
+
+    def write(self):
+        self.process.stdin.write(json.dumps(self.requests, separators=(',', ':')) + "\n")
+        self.process.stdin.flush()
+
+
+    def read(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise Exception("Bot process exited (code %s)" % self.process.poll())
+
+        values = json.loads(line)
+        replies = self.replies
+        self.requests = []
+        self.replies = []
+
+        errors = [value for value in values if isinstance(value, str)]
+        for (reply, value) in zip(replies, values):
+            if reply is not None:
+                reply.value = value
+        if errors:
+            raise Exception("Bot error: %s" % errors[0])
+
+
+    def close(self):
+        """
+        Send the queued requests (e.g. the close requests of the strategies) and stop the process,
+        which exits when its input is closed (it is killed if it does not).
+        """
+        if self.process.poll() is None:
+            try:
+                if self.requests:
+                    self.write()
+                self.process.stdin.close()
+                self.process.wait(timeout=CLOSE_TIMEOUT)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()
+        self.requests = []
+        self.replies = []
+
+
+class BotPool:
+    """
+    Processes running the same bot command, shared by all the games of this process (see get()).
+    Each strategy is served by the process with the fewest strategies.
+    """
+
+    # (command, number of processes) -> BotPool
+    instances = {}
+
+
+    @classmethod
+    def get(cls, command, num_processes=1):
+        # the command is a string or a list of arguments
+        key = (command if isinstance(command, str) else tuple(command), num_processes)
+        if key not in cls.instances:
+            cls.instances[key] = cls(command, num_processes)
+        return cls.instances[key]
+
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close all the pools (e.g. at the end of a program).
+        """
+        for pool in list(cls.instances.values()):
+            pool.close()
+
+
+    def __init__(self, command, num_processes=1):
+        args = shlex.split(command) if isinstance(command, str) else list(command)
+        self.processes = [BotProcess(args) for i in range(num_processes)]
+        self.bot_ids = itertools.count()
+
+
+    def new_bot(self):
+        """
+        Process and number of a new strategy.
+        """
+        process = min(self.processes, key=lambda process: process.num_bots)
+        process.num_bots += 1
+        return process, next(self.bot_ids)
+
+
+    def round_trip(self):
+        """
+        Send the queued requests, one line for each process, and wait for the replies.
+        """
+        busy = [process for process in self.processes if process.requests]
+        for process in busy:
+            process.write()
+        for process in busy:
+            process.read()
+
+
+    def close(self):
+        """
+        Stop the processes of the pool; get() starts a new pool for the same command.
+        """
+        for process in self.processes:
+            process.close()
+        for (key, pool) in list(self.instances.items()):
+            if pool is self:
+                del self.instances[key]
+
+
+class RemoteStrategy(BaseStrategy):
+    """
+    Strategy of a seat played by a bot process.
+    Parameters: command (the command of the bot, e.g. "python -m game.bot_protocol bean"),
+    processes (the number of processes of the pool, default 1) and params (the parameters of the strategy).
+    """
+
+    def __init__(self, verbose=False, params={}):
+        super().__init__(verbose=verbose, params=params)
+        self.pool = BotPool.get(params['command'], params.get('processes', 1))
+        self.process, self.bot = self.pool.new_bot()
+        self.params = params.get('params', {})
+
+        # the bot process forgets the strategy when it is no longer used
+        weakref.finalize(self, self.process.close_bot, self.bot)
+
+
+    def encode_hands(self, hands):
+        return [encode_cards(hands[i], self.variant) if i != self.id else None for i in range(self.num_players)]
+
+
+    def encode_board(self):
+        return [self.board[color] for color in self.variant.colors]
+
+
+    def initialize(self, id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game=None):
+        super().initialize(id, num_players, k, board, deck_type, my_hand, hands, discard_pile, deck_size, game)
+        self.num_discarded = len(discard_pile)     # cards of the discard pile already sent
+        self.process.send([self.bot, "initialize", id, num_players, k, deck_type, self.encode_board(),
+                           encode_cards(my_hand, self.variant), self.encode_hands(hands),
+                           encode_cards(discard_pile, self.variant), deck_size, self.params])
+
+
+    def update(self, clues, lives, my_hand, hands, discard_pile, turn, last_turn, deck_size, game,
+                     hand_masks=None, deadline=None):
+        super().update(clues, lives, my_hand, hands, discard_pile, turn, last_turn, deck_size, game, hand_masks, deadline)
+        discarded = encode_cards(discard_pile[self.num_discarded:], self.variant)
+        self.num_discarded = len(discard_pile)
+        self.process.send([self.bot, "update", clues, lives, encode_cards(my_hand, self.variant), self.encode_hands(hands),
+                           discarded, turn, last_turn, deck_size, self.encode_board(),
+                           self.remaining_time() if deadline is not None else None])
+
+
+    def feed_turn(self, player_id, action):
+        clue = action.type == Action.CLUE
+        self.process.send([self.bot, "feed_turn", player_id, action_code(action, self.variant), action.turn,
+                           action.touched if clue else None, action.former_chop if clue else None])
+
+
+    def request_action(self):
+        """
+        Queue the request of the action of this strategy (see action()).
+        """
+        reply = Reply()
+        self.process.send([self.bot, "get_turn_action"], reply)
+        return reply
+
+
+    def action(self, reply):
+        """
+        The action of the given reply to request_action(), after the round trip.
+        """
+        code, former_chop = reply.value
+        action = code_action(code, self.variant)
+        if action.type == Action.CLUE:
+            action.former_chop = former_chop
+        return action
+
+
+    def get_turn_action(self):
+        reply = self.request_action()
+        self.pool.round_trip()
+        return self.action(reply)
+
+
+def run_games(games):
+    """
+    Play the given games (already set up) at the same time, like Game.run_game(): at each step, the decisions
+    of the current players of all the games are requested together, so that each bot process receives them
+    (and the notifications of the previous turns) in one round trip. There are no time limits.
+    """
+    running = list(games)
+    for game in running:
+        game.end_game = False
+
+    while running:
+        requests = []
+        for game in running:
+            player = game.get_current_player()
+            if isinstance(player.strategy, RemoteStrategy):
+                player.update_strategy()
+                requests.append(player.strategy.request_action())
+            else:
+                requests.append(None)
+
+        for pool in set(player.strategy.pool for game in running for player in game.players
+                        if isinstance(player.strategy, RemoteStrategy)):
+            pool.round_trip()
+
+        for (game, reply) in zip(running, requests):
+            player = game.get_current_player()
+            if reply is not None:
+                action = player.strategy.action(reply)
+                action.apply(game)
+            else:
+                action = player.get_turn_action()
+            game.play_turn(action)
+
+        running = [game for game in running if not game.end_game]
+
+    for game in games:
+        game.statistics = game.get_statistics()
+
+
+if __name__ == "__main__":
+    # serve a built-in AI, e.g. python -m game.bot_protocol bean
+    Strategy = __import__('game.ai.%s.strategy' % sys.argv[1], fromlist=['Strategy']).Strategy
+    serve(Strategy)
@@ -20,14 +20,21 @@ class CardAppearance:
     GREEN = 'Green'
     BLUE = 'Blue'
     PURPLE = 'Purple'
+    WHITE = 'White'
+    RAINBOW = 'Rainbow'
  
     
     NUM_COLORS = 5
     NUM_NUMBERS = 5
     
+    # colors of the standard deck (see deck.py for the colors of each type of deck)
     COLORS = [RED, YELLOW, GREEN, BLUE, PURPLE]
     
-    COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(COLORS)}
+    # colors of all the types of deck
+    ALL_COLORS = COLORS + [WHITE, RAINBOW]
+    NUM_ALL_COLORS = len(ALL_COLORS)
+    
+    COLORS_TO_NUMBERS = {color: i for (i, color) in enumerate(ALL_COLORS)}
     
     PRINTABLE_COLORS = {
         RED: 'red',
@@ -35,11 +42,13 @@ class CardAppearance:
         PURPLE: 'magenta',
         YELLOW: 'yellow',
         GREEN: 'green',
+        WHITE: 'white',
+        RAINBOW: 'cyan',
     }
     
     
     def __init__(self, color, number):
-        assert color in self.COLORS
+        assert color in self.ALL_COLORS
         assert 1 <= number <= self.NUM_NUMBERS
         
         self.color = color
@@ -51,7 +60,7 @@ class CardAppearance:
         return colored("%d %s" % (self.number, self.color), self.PRINTABLE_COLORS[self.color])
     
     def __hash__(self):
-        return self.COLORS_TO_NUMBERS[self.color] + self.NUM_COLORS * self.number
+        return self.COLORS_TO_NUMBERS[self.color] + self.NUM_ALL_COLORS * self.number
     
     def __eq__(self, other):
         # same color and number
@@ -66,6 +75,14 @@ class CardAppearance:
         return (self.color, self.number) < (other.color, other.number)
     
     
+    def __copy__(self):
+        # cards are immutable, so copies (e.g. of a game, see Game.clone()) can share them
+        return self
+    
+    def __deepcopy__(self, memo):
+        return self
+    
+    
     def equals(self, other):
         # same color and number (but possibly different id)
         # (this method is inherited by Card, but it exists here
@@ -162,7 +179,7 @@ class Card(CardAppearance):
     """
     
     def __init__(self, id, color, number):
-        assert color in self.COLORS
+        assert color in self.ALL_COLORS
         assert 1 <= number <= self.NUM_NUMBERS
         
         self.id = id
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Evaluation of clues on hands, which does not need a Game (it can be used on any list of cards).
+
+A clue is represented by an integer code: color clues come first (in the order of the colors of the type
+of deck), followed by number clues. The masks of a hand give, for each clue code, the positions of the cards
+touched by the clue (bit i corresponds to the card in position i).
+
+The functions take the type of deck as a Variant (see deck.py), e.g. Game.variant.
+"""
+
+
+def clue_code(clue_type, value, variant):
+    """
+    Code of the given clue.
+    """
+    return variant.clue_codes[clue_type, value]
+
+
+def action_clue_code(action, variant):
+    """
+    Code of the clue given by a ClueAction.
+    """
+    return variant.clue_codes[action.clue_type, action.value]
+
+
+def hand_masks(hand, variant, masks=None):
+    """
+    Compute the masks of a hand (a list of possibly None cards).
+    A list of variant.num_clues integers can be given, to be filled instead of allocating a new one.
+    """
+    if masks is None:
+        masks = [0] * variant.num_clues
+    else:
+        for clue in range(variant.num_clues):
+            masks[clue] = 0
+
+    for (card_pos, card) in enumerate(hand):
+        add_card(masks, card, variant, card_pos)
+
+    return masks
+
+
+def add_card(masks, card, variant, card_pos=0):
+    """
+    Update the masks of a hand after the given card (possibly None) is put in the given (empty) position.
+    """
+    if card is not None:
+        bit = 1 << card_pos
+        for clue in variant.color_clues[card.color]:
+            masks[clue] |= bit
+        masks[variant.number_clues[card.number]] |= bit
+
+
+def remove_card(masks, card_pos):
+    """
+    Update the masks of a hand after the card in the given position is removed:
+    the cards on its left are shifted to the right, and position 0 becomes empty (see add_card()).
+    """
+    low = (1 << card_pos) - 1
+    for clue in range(len(masks)):
+        mask = masks[clue]
+        masks[clue] = mask >> (card_pos + 1) << (card_pos + 1) | (mask & low) << 1
+
+
+def touch(masks, clue):
+    """
+    Mask of the cards touched by the given clue (code), given the masks of the hand.
+    """
+    return masks[clue]
+
+
+def cards_positions(mask):
+    """
+    Positions of the cards in the given mask, from left to right.
+    """
+    return [card_pos for card_pos in range(mask.bit_length()) if mask >> card_pos & 1]
+
+
+def legal_clues(masks):
+    """
+    Codes of the clues which touch at least one card, given the masks of the hand.
+    """
+    return [clue for clue in range(len(masks)) if masks[clue] != 0]
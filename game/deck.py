@@ -1,40 +1,136 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from .card import Card
-from typing import List
+"""
+Types of deck (variants), defined as data in VARIANTS and compiled into lookup tables (see Variant).
 
+The cards of a variant (appearances) are numbered as card_index(card) = color index + num_colors * (number - 1),
+where the colors are in the order of the variant. A clue is represented by an integer code: color clues come first
+(for the colors which can be named, in the order of the variant), followed by number clues (see clues.py).
+"""
 
-def standard_deck() -> List[Card]:
-    deck = []
-    id = 0
-    for color in Card.COLORS:
-        for number in range(1, Card.NUM_NUMBERS + 1):
-            if number == 1:
-                quantity = 3
-            elif 2 <= number <= 4:
-                quantity = 2
-            elif number == 5:
-                quantity = 1
-            else:
-                raise Exception("Unknown card parameters.")
-            
-            for i in range(quantity):
-                deck.append(Card(id, color, number))
-                id += 1
-    
-    assert len(deck) == 50
-        
-    return deck
+from .action import Action
+from .card import Card, CardAppearance
+from typing import List
 
 
-def standard_deck_25() -> List[Card]:
-    return standard_deck()
+DECK50 = 'deck50'
+DECK55 = 'deck55'
 
+# copies of each number in a color
+STANDARD_COPIES = {1: 3, 2: 2, 3: 2, 4: 2, 5: 1}
 
-DECK50 = 'deck50'
+VARIANTS_DATA = {
+    # the standard deck
+    DECK50: {
+        'colors': [Card.RED, Card.YELLOW, Card.GREEN, Card.BLUE, Card.PURPLE],
+        'copies': STANDARD_COPIES,
+    },
 
-DECKS = {
-    DECK50: standard_deck_25
+    # 55 cards: a sixth color (Rainbow) with one copy of each number, which is a color of its own for clues
+    DECK55: {
+        'colors': [Card.RED, Card.BLUE, Card.WHITE, Card.YELLOW, Card.GREEN, Card.RAINBOW],
+        'copies': STANDARD_COPIES,
+        'special_copies': {Card.RAINBOW: {number: 1 for number in range(1, Card.NUM_NUMBERS + 1)}},
+    },
 }
 
+
+class Variant:
+    """
+    A type of deck, compiled from its description:
+    - colors: the colors, in the order of the ids of the cards;
+    - copies: the number of copies of each number in a color;
+    - special_copies: the copies of the numbers of some colors, if they are different;
+    - wild_colors: colors which cannot be named in a clue, but are touched by every color clue.
+    """
+
+    def __init__(self, name, colors, copies, special_copies={}, wild_colors=()):
+        self.name = name
+        self.colors = list(colors)
+        self.num_colors = len(self.colors)
+        self.color_numbers = {color: i for (i, color) in enumerate(self.colors)}
+        self.max_score = self.num_colors * Card.NUM_NUMBERS
+
+        # cards (appearances), and number of copies of each of them
+        self.num_cards = self.num_colors * Card.NUM_NUMBERS
+        self.cards = [CardAppearance(color, number) for number in range(1, Card.NUM_NUMBERS + 1) for color in self.colors]
+        self.copies = [special_copies.get(card.color, copies)[card.number] for card in self.cards]
+
+        # (clue_type, value) of each clue code
+        self.clues = [(Action.COLOR, color) for color in self.colors if color not in wild_colors] + \
+                     [(Action.NUMBER, number) for number in range(1, Card.NUM_NUMBERS + 1)]
+        self.num_clues = len(self.clues)
+        self.clue_codes = {clue: code for (code, clue) in enumerate(self.clues)}
+
+        # codes of the color clues touching each color, and code of the clue of each number
+        color_clues = [code for (code, (clue_type, value)) in enumerate(self.clues) if clue_type == Action.COLOR]
+        self.color_clues = {color: color_clues if color in wild_colors else [self.clue_codes[Action.COLOR, color]]
+                            for color in self.colors}
+        self.number_clues = {number: self.clue_codes[Action.NUMBER, number] for number in range(1, Card.NUM_NUMBERS + 1)}
+
+        # codes of the clues touching each card
+        self.card_clues = [self.color_clues[card.color] + [self.number_clues[card.number]] for card in self.cards]
+
+        # mask of the cards touched by each clue code (a set of cards is a mask, where bit i is cards[i])
+        self.clue_cards = [0] * self.num_clues
+        for (i, clues) in enumerate(self.card_clues):
+            for clue in clues:
+                self.clue_cards[clue] |= 1 << i
+        self.all_cards = (1 << self.num_cards) - 1
+
+        # board (as a tuple of numbers, in the order of colors) -> set of playable cards, filled lazily
+        self.playable = {}
+
+
+    def __copy__(self):
+        # the tables are never modified, so copies (e.g. of a game, see Game.clone()) can share them
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+    def card_index(self, card):
+        """
+        Index of the given card (or appearance) in cards.
+        """
+        return self.color_numbers[card.color] + self.num_colors * (card.number - 1)
+
+
+    def clue_code(self, clue_type, value):
+        return self.clue_codes[clue_type, value]
+
+
+    def playable_cards(self, board):
+        """
+        Set of the cards (appearances) which are playable on the given board (a dict color -> number).
+        """
+        key = tuple(board[color] for color in self.colors)
+        if key not in self.playable:
+            self.playable[key] = frozenset(CardAppearance(color, board[color] + 1) for color in self.colors if board[color] < Card.NUM_NUMBERS)
+        return self.playable[key]
+
+
+    def deck(self) -> List[Card]:
+        """
+        All the cards, with ids in the order of the colors and numbers.
+        """
+        deck = []
+        for color in self.colors:
+            for number in range(1, Card.NUM_NUMBERS + 1):
+                for i in range(self.copies[self.card_index(CardAppearance(color, number))]):
+                    deck.append(Card(len(deck), color, number))
+        return deck
+
+
+VARIANTS = {name: Variant(name, **data) for (name, data) in VARIANTS_DATA.items()}
+
+
+def standard_deck() -> List[Card]:
+    deck = VARIANTS[DECK50].deck()
+    assert len(deck) == 50
+    return deck
+
+
+DECKS = {name: variant.deck for (name, variant) in VARIANTS.items()}
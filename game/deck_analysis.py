@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fast analysis of decks, without playing or solving them (see solver.py): the maximum score allowed by the order
+of the deck, its pace and the fives at the bottom of the deck. It takes a few microseconds per deck, so it can be
+used to stratify or filter large sets of decks, or to find the games in which a strategy lost points.
+
+Decks are lists of cards in the order of Game.deck (the last card is drawn first), e.g. the initial deck of
+a game (Game.initial_deck), or a deck read by read_deck() or parse_deck() (the formats of Game.load_deck()
+and Game.load_deck_description()).
+"""
+
+from collections import namedtuple
+
+from .card import Card
+from .deck import VARIANTS, DECK50
+from .game import Game
+
+
+DeckAnalysis = namedtuple("DeckAnalysis", "max_score pace bottom_fives")
+
+
+def read_deck(filename):
+    """
+    Read a deck from file, one card per line (see Game.dump_deck()).
+    """
+    with open(filename, "r") as file:
+        return [parse_card(line) for line in file if line.strip()]
+
+
+def parse_deck(description):
+    """
+    Read a deck from a string, with comma-separated cards (see Game.get_deck_description()).
+    """
+    return [parse_card(card) for card in description.split(",")]
+
+
+def parse_card(description):
+    number, color, id = description.split()
+    return Card(id=int(id), color=color, number=int(number))
+
+
+def earliest_draws(deck, num_players, deck_type=DECK50):
+    """
+    For each card needed for the maximum score (one for each color and number, lowest first in each color),
+    the earliest draw after which it can be played: after a copy of it and of each lower card of its color
+    has been drawn. Draws are numbered from 0 after the deal; -1 means that the cards are all dealt.
+    """
+    size = len(deck) - num_players * Game.CARDS_PER_PLAYER[num_players]
+    first = {}
+    for (position, card) in enumerate(deck):
+        draw = size - 1 - position if position < size else -1
+        key = (card.color, card.number)
+        if key not in first or draw < first[key]:
+            first[key] = draw
+
+    res = []
+    for color in VARIANTS[deck_type].colors:
+        last = -1
+        for number in range(1, Card.NUM_NUMBERS + 1):
+            last = max(last, first[color, number])
+            res.append(last)
+    return res
+
+
+def analyse_deck(deck, num_players, deck_type=DECK50):
+    """
+    Analysis of the given initial deck:
+    - max_score: maximum score allowed by the order of the deck. Before the deck runs out each play draws
+      a card, and after the last draw there are num_players turns left, so after the d-th draw at most
+      (cards left in the deck) + num_players cards can be played. For instance, a five drawn last can be
+      played only in the last turn of the player who draws it, after all the lower cards of its color.
+    - pace: the smallest margin between the turns left after the earliest draw of a needed card and the plays
+      needed after it; with no constraint from the order of the deck, this is the usual pace at the start of the
+      game (cards in the deck + num_players - max score). The maximum score is lost by -pace if it is negative.
+    - bottom_fives: number of fives drawn in the last num_players draws (drawn in the last round or just before,
+      hence at most one turn to play them), the most common reason for a negative pace.
+    """
+    size = len(deck) - num_players * Game.CARDS_PER_PLAYER[num_players]
+    draws = earliest_draws(deck, num_players, deck_type)
+    draws.sort(reverse=True)
+
+    pace = min(size - 1 - draw + num_players - (j + 1) for (j, draw) in enumerate(draws))
+    bottom_fives = sum(1 for card in deck[:min(num_players, size)] if card.number == Card.NUM_NUMBERS)
+    return DeckAnalysis(
+        max_score=len(draws) - max(0, -pace),
+        pace=pace,
+        bottom_fives=bottom_fives,
+    )
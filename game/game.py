@@ -9,12 +9,15 @@ import copy
 from .card import Card
 from .player import Player
 from .action import Action
-from .deck import DECKS, DECK50
+from .clues import hand_masks, add_card, remove_card, touch, action_clue_code
+from .deck import DECKS, DECK50, VARIANTS
+from . import zobrist
 
 
 Turn = namedtuple("Turn", "player action number")
-Statistics = namedtuple("Statistics", "score lives clues num_turns")
+Statistics = namedtuple("Statistics", "score lives clues num_turns overruns")
 Status = namedtuple("Status", "deck hands score lives clues previous_turn is_last_round last_turn board")
+Undo = namedtuple("Undo", "card hand_masks clues lives last_round last_player last_turn end_game this_turn zobrist")
 
 class Game:
     NUM_PLAYERS_CHOICES = [2, 3, 4, 5]
@@ -25,16 +28,36 @@ class Game:
     
     
     def __init__(self, num_players: int, ai: str = "alphahanabi", ai_params={}, strategy_log: bool = False, 
-                       dump_deck_to=None, load_deck_from=None, deck_description=None, deck_type: str = DECK50):
+                       dump_deck_to=None, load_deck_from=None, deck_description=None, deck_type: str = DECK50,
+                       time_per_move: float = None, time_per_feed: float = None, hard_deadline: bool = False,
+                       vector_beliefs: bool = False, seats=None):
         self.num_players: int = num_players
         self.ai: str = ai
         self.ai_params: dict = ai_params
         
+        # if not None, the AI of each player, instead of ai; None is a player without strategy, whose actions
+        # are chosen outside of the game (e.g. by a human connected to the server, see server.py)
+        self.seats = seats
+        
         self.strategy_log = strategy_log    # log messages from strategy to standard output
         self.dump_deck_to = dump_deck_to    # if not None, dump the initial deck to the given file
         self.load_deck_from = load_deck_from    # if not None, load the initial deck from the given file
         self.deck_description = deck_description    # if not None, use this initial deck
         self.deck_type = deck_type  # type of deck (see deck.py)
+        self.variant = VARIANTS[deck_type]  # tables of the type of deck (colors, cards, clue codes)
+        
+        # time limits (in seconds) for choosing an action and for receiving a turn (None means no limit);
+        # overruns are recorded by the players (see timing.py), and if hard_deadline is True
+        # a late action is replaced by the default action of the strategy; the strategy is not interrupted:
+        # the action is replaced after get_turn_action() returns, so strategies must watch their deadline
+        # themselves (see BaseStrategy.update()); the server enforces a real timeout (see server.py)
+        self.time_per_move = time_per_move
+        self.time_per_feed = time_per_feed
+        self.hard_deadline = hard_deadline
+        
+        # simulation mode: if True, the game keeps the beliefs of all the players (see belief_array.py),
+        # and the strategies read them instead of computing their own possibilities
+        self.vector_beliefs = vector_beliefs
         
         # compute number of cards per player
         self.k = self.CARDS_PER_PLAYER[num_players]
@@ -59,6 +82,9 @@ class Game:
             assert set(self.deck) == set(DECKS[self.deck_type]())
         
         
+        # keep the initial deck (e.g. to compute the best possible score, see solver.py)
+        self.initial_deck = list(self.deck)
+        
         if self.dump_deck_to is not None:
             # dump initial deck to file
             self.dump_deck(self.dump_deck_to)
@@ -68,11 +94,14 @@ class Game:
                 id = i,
                 game = self,
                 hand = [self.draw_card_from_deck() for i in range(self.k)],
-                ai = self.ai,
+                ai = self.ai if self.seats is None else self.seats[i],
                 ai_params = self.ai_params,
                 strategy_log = self.strategy_log
             ) for i in range(self.num_players)]
         
+        # masks of the cards of each player touched by each clue (see clues.py)
+        self.hand_masks = [hand_masks(player.hand, variant=self.variant) for player in self.players]
+        
         # set number of clues and lives
         self.clues = self.INITIAL_CLUES
         self.lives = self.INITIAL_LIVES
@@ -80,26 +109,158 @@ class Game:
         # turn log
         self.turns = []
         self.this_turn = None   # the turn just played
+        self.end_game = False
         
         # construct board (cards in play), indicating the last played number for each color
-        self.board = {color: 0 for color in Card.COLORS}
+        self.board = {color: 0 for color in self.variant.colors}
         
-        # construct discard pile (includes cards on the board)
+        # construct discard pile (includes cards on the board), with the number of copies of each card (see clues.py)
         self.discard_pile = []
+        self.discard_counts = [0] * self.variant.num_cards
         
         # set last round variable
         self.last_round = False
         self.last_player = None
         self.last_turn = None
         
+        # hash of the state, without the turn (see key)
+        self.zobrist = zobrist.state_key(self)
+        
+        self.beliefs = self.new_beliefs()
+        
         # call players' initializations
         for player in self.players:
+            if player.strategy is not None:
+                player.initialize()
+    
+    
+    def clone(self, with_strategies=False):
+        """
+        Construct a copy of the game in its current state, which can be modified independently.
+        Only the mutable state is copied: cards (which are immutable) and the turns already played are shared.
+        Without strategies, the players of the copy have no strategy: actions can be applied with
+        run_action(), but run_game() cannot be used. With strategies, the strategies are deep-copied
+        (together with what they share, e.g. the common knowledge of alphahanabi).
+        """
+        game = copy.copy(self)
+        game.deck = list(self.deck)
+        game.board = dict(self.board)
+        game.discard_pile = list(self.discard_pile)
+        game.discard_counts = list(self.discard_counts)
+        game.turns = list(self.turns)
+        game.hand_masks = [list(masks) for masks in self.hand_masks]
+        game.players = [player.clone(game, with_timings=with_strategies) for player in self.players]
+        
+        if self.last_player is not None:
+            game.last_player = game.players[self.last_player.id]
+        
+        if self.beliefs is not None:
+            game.beliefs = self.beliefs.clone(game)
+        
+        if with_strategies:
+            # the references to the game and to its mutable state are replaced with the copies
+            memo = {id(self): game, id(self.board): game.board, id(self.discard_pile): game.discard_pile}
+            memo.update((id(masks), game_masks) for (masks, game_masks) in zip(self.hand_masks, game.hand_masks))
+            memo.update((id(player), game_player) for (player, game_player) in zip(self.players, game.players))
+            if self.beliefs is not None:
+                memo[id(self.beliefs)] = game.beliefs
+            for (player, game_player) in zip(self.players, game.players):
+                game_player.strategy = copy.deepcopy(player.strategy, memo)
+        
+        return game
+    
+    
+    def fork(self, hands=None, deck=None, ai=None, ai_params=None):
+        """
+        Construct a copy of the game in its current state, which can be run independently.
+        Its players use the given AI (by default, the AI of this game); their strategies are initialized
+        from the current state, with no memory of the previous turns.
+        The hands (a list with one hand per player) and the deck can be replaced, e.g. with a sampled deal.
+        """
+        game = self.clone()
+        if ai is not None:
+            game.ai = ai
+            game.ai_params = ai_params if ai_params is not None else {}
+        game.strategy_log = False
+        game.time_per_move = game.time_per_feed = None
+        game.hard_deadline = False
+        
+        if deck is not None:
+            game.deck = list(deck)
+        
+        game.players = [Player(
+                id = player.id,
+                game = game,
+                hand = list(player.hand if hands is None else hands[player.id]),
+                ai = game.ai,
+                ai_params = game.ai_params,
+                strategy_log = False
+            ) for player in self.players]
+        game.hand_masks = [hand_masks(player.hand, variant=game.variant) for player in game.players]
+        game.zobrist = zobrist.state_key(game)
+        
+        if self.last_player is not None:
+            game.last_player = game.players[self.last_player.id]
+        
+        # the new strategies have no memory of the clues, and neither have the beliefs
+        game.beliefs = game.new_beliefs()
+        
+        for player in game.players:
             player.initialize()
+        
+        return game
+    
+    
+    def deal(self, hands=None, deck=None):
+        """
+        Replace the hands (a list with one hand per player, None to keep a hand) and the deck, e.g. with a sampled
+        deal, keeping the rest of the state: the strategies keep what they know, and are told about the new cards
+        (see BaseStrategy.cards_replaced()).
+        """
+        if deck is not None:
+            self.deck = list(deck)
+        
+        if hands is not None:
+            for (player, hand) in zip(self.players, hands):
+                if hand is not None:
+                    player.hand[:] = hand
+                    self.hand_masks[player.id][:] = hand_masks(hand, variant=self.variant)    # shared with the strategies
+        
+        self.zobrist = zobrist.state_key(self)
+        if self.beliefs is not None:
+            self.beliefs.refresh_visible()
+        
+        for player in self.players:
+            if player.strategy is not None:
+                player.update_strategy()
+                player.strategy.cards_replaced()
+    
+    
+    def new_beliefs(self):
+        """
+        Beliefs of the players in the current state, without clues (None if not in simulation mode).
+        """
+        if not self.vector_beliefs:
+            return None
+        from .belief_array import BeliefArray
+        return BeliefArray(self)
+    
+    
+    @property
+    def key(self):
+        """
+        Zobrist hash (64 bits) of the current state: board, clues, lives, hands, deck size, discarded cards,
+        player to move and turns left in the last round (see zobrist.py).
+        """
+        return self.zobrist ^ zobrist.turn_key(self.num_players, len(self.turns), self.last_turn)
     
     
     def get_current_turn(self):
         return len(self.turns)
     
+    def get_current_player(self):
+        return self.players[self.get_current_turn() % self.num_players]
+    
     def get_current_score(self):
         return sum(self.board.values())
     
@@ -146,7 +307,16 @@ class Game:
     
     def run_turn(self, player):
         action = player.get_turn_action()
+        return self.run_action(player, action)
+    
+    
+    def run_action(self, player, action):
+        """
+        Apply the given action (already populated, see Action.apply) of the given player.
+        Return the turn and whether the game ended.
+        """
         end_game = self.last_round and self.last_player == player
+        clues, lives = self.clues, self.lives
         
         if action.type == Action.PLAY:
             card = player.hand[action.card_pos]
@@ -154,6 +324,8 @@ class Game:
             if card.number == self.board[card.color] + 1:
                 # play is successful
                 self.board[card.color] += 1
+                color = self.variant.color_numbers[card.color]
+                self.zobrist ^= zobrist.BOARD[color][card.number - 1] ^ zobrist.BOARD[color][card.number]
                 
                 if card.number == 5:
                     # increment clues!
@@ -163,11 +335,7 @@ class Game:
                 end_game = self.decrement_lives() or end_game
             
             # remove card from hand
-            self.discard_pile.append(card)
-            player.hand.pop(action.card_pos)
-            player.hand.insert(0, self.draw_card_from_deck(player))
-
-            
+            self.replace_card(player, action.card_pos)
         
         elif action.type == Action.DISCARD:
             card = player.hand[action.card_pos]
@@ -177,10 +345,7 @@ class Game:
             self.increment_clues()
             
             # remove card from hand
-            self.discard_pile.append(card)
-            player.hand.pop(action.card_pos)
-            player.hand.insert(0, self.draw_card_from_deck(player))
-
+            self.replace_card(player, action.card_pos)
         
         elif action.type == Action.CLUE:
             # decrement clues
@@ -189,18 +354,94 @@ class Game:
             # check for correctness
             target = self.players[action.target_id]
             assert player != target
-            if action.clue_type == Action.COLOR:
-                assert any(card is not None and card.color == action.color for card in target.hand)
-            else:
-                assert any(card is not None and card.number == action.number for card in target.hand)
+            assert touch(self.hand_masks[target.id], action_clue_code(action, self.variant)) != 0
                 
         
         else:
             raise Exception("Unknown action type.")
         
+        self.zobrist ^= zobrist.CLUES[clues] ^ zobrist.CLUES[self.clues] ^ zobrist.LIVES[lives] ^ zobrist.LIVES[self.lives]
         return Turn(player, action, self.get_current_turn()), end_game
     
     
+    def replace_card(self, player, card_pos):
+        """
+        Move the card in the given position of the hand of the given player to the discard pile,
+        and draw a new card.
+        """
+        card = player.hand[card_pos]
+        i = self.variant.card_index(card)
+        self.zobrist ^= zobrist.hand_key(player.id, player.hand, self.variant, card_pos) ^ zobrist.DECK[len(self.deck)]
+        self.zobrist ^= zobrist.DISCARDED[i][self.discard_counts[i]] ^ zobrist.DISCARDED[i][self.discard_counts[i] + 1]
+        self.discard_pile.append(card)
+        self.discard_counts[i] += 1
+        
+        player.hand.pop(card_pos)
+        player.hand.insert(0, self.draw_card_from_deck(player))
+        remove_card(self.hand_masks[player.id], card_pos)
+        add_card(self.hand_masks[player.id], player.hand[0], variant=self.variant)
+        self.zobrist ^= zobrist.hand_key(player.id, player.hand, self.variant, card_pos) ^ zobrist.DECK[len(self.deck)]
+    
+    
+    def apply(self, action):
+        """
+        Apply the given action (already populated, see Action.apply) of the current player and store the turn,
+        without informing the players (nor the beliefs, in simulation mode); end_game tells whether the game ended.
+        Return a token which can be passed to undo() to restore exactly the previous state.
+        """
+        player = self.get_current_player()
+        card = player.hand[action.card_pos] if action.type != Action.CLUE else None
+        token = Undo(
+            card = card,
+            hand_masks = list(self.hand_masks[player.id]) if card is not None else None,
+            clues = self.clues,
+            lives = self.lives,
+            last_round = self.last_round,
+            last_player = self.last_player,
+            last_turn = self.last_turn,
+            end_game = self.end_game,
+            this_turn = self.this_turn,
+            zobrist = self.zobrist,
+        )
+        
+        turn, self.end_game = self.run_action(player, action)
+        self.this_turn = turn
+        self.turns.append(turn)
+        return token
+    
+    
+    def undo(self, token):
+        """
+        Undo the last turn, given the token returned by apply() for it.
+        """
+        turn = self.turns.pop()
+        player = turn.player
+        action = turn.action
+        
+        if token.card is not None:
+            # put the drawn card back on the deck, and the card back in the hand
+            drawn = player.hand.pop(0)
+            if drawn is not None:
+                self.deck.append(drawn)
+            player.hand.insert(action.card_pos, token.card)
+            self.discard_pile.pop()
+            self.discard_counts[self.variant.card_index(token.card)] -= 1
+            self.hand_masks[player.id][:] = token.hand_masks    # the masks are shared with the strategies
+            
+            if action.type == Action.PLAY and self.lives == token.lives:
+                # the play was successful
+                self.board[token.card.color] -= 1
+        
+        self.clues = token.clues
+        self.lives = token.lives
+        self.last_round = token.last_round
+        self.last_player = token.last_player
+        self.last_turn = token.last_turn
+        self.end_game = token.end_game
+        self.this_turn = token.this_turn
+        self.zobrist = token.zobrist
+    
+    
     def log_turn(self, turn, player):
         action = turn.action
         print("Turn %d (player %d):" % (turn.number, player.id), end=' ')
@@ -226,7 +467,7 @@ class Game:
         
         print("Hands:")
         print("Board:", end=' ')
-        for color in Card.COLORS:
+        for color in self.variant.colors:
             print(colored("%d" % self.board[color], Card.PRINTABLE_COLORS[color]), end=' ')
         print()
         print("Clues: %d    Lives: %d    Deck: %d    Score: %d" % (self.clues, self.lives, len(self.deck), self.get_current_score()))
@@ -258,11 +499,11 @@ class Game:
                 print("%d %s %d" % (card.number, card.color, card.id), file=file)
     
     
-    def get_deck_description(self):
+    def get_deck_description(self, deck=None):
         """
-        Produce string description for the deck.
+        Produce string description for the deck (by default, the current one).
         """
-        return ",".join("%d %s %d" % (card.number, card.color, card.id) for card in self.deck)
+        return ",".join("%d %s %d" % (card.number, card.color, card.id) for card in (self.deck if deck is None else deck))
     
     
     def load_deck(self, filename):
@@ -287,13 +528,38 @@ class Game:
             self.deck.append(Card(id=int(id), color=color, number=int(number)))
     
     
+    def end_turn(self, turn):
+        """
+        Inform all players about the given turn (except those without strategy, see clone()), and store it.
+        """
+        if self.beliefs is not None:
+            self.beliefs.apply_turn(turn)
+        
+        for player in self.players:
+            if player.strategy is not None:
+                player.feed_turn(turn)
+        
+        self.turns.append(turn)
+    
+    
+    def play_turn(self, action):
+        """
+        Apply the given action (already populated, see Action.apply) of the current player, and inform
+        the players about it, as run_game() does (e.g. for actions chosen outside of the game).
+        """
+        player = self.get_current_player()
+        turn, self.end_game = self.run_action(player, action)
+        self.this_turn = turn
+        self.end_turn(turn)
+    
+    
     def run_game(self):
         """
-        Run the game, yielding (current_player, turn) after each turn.
+        Run the game from the current turn, yielding (current_player, turn) after each turn.
         At the end, save statistics about the game.
         """
         self.end_game = False
-        current_player = self.players[0]
+        current_player = self.get_current_player()
         
         while not self.end_game:
             # do turn
@@ -305,21 +571,22 @@ class Game:
             # yield current player and turn
             yield current_player, turn
             
-            # inform all players
-            for player in self.players:
-                player.feed_turn(turn)
-            
-            # store turn
-            self.turns.append(turn)
+            # inform all players, and store turn
+            self.end_turn(turn)
             
             # change current player
             current_player = current_player.next_player()
         
-        self.statistics = Statistics(
+        self.statistics = self.get_statistics()
+    
+    
+    def get_statistics(self):
+        return Statistics(
             score = self.get_current_score(),
             lives = self.lives,
             clues = self.clues,
-            num_turns = len(self.turns)
+            num_turns = len(self.turns),
+            overruns = sum(timing.overruns for player in self.players for timing in player.timings.values())
         )
         
         
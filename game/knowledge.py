@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data structures about knowledge, which can be used by any AI.
+"""
+
+from array import array
+
+
+
+class Flag:
+    """
+    Boolean attribute of a KnowledgeView, stored in one bit.
+    """
+
+    def __init__(self, bit):
+        self.mask = 1 << bit
+
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return view.fields[view.card_pos] & self.mask != 0
+
+
+    def __set__(self, view, value):
+        if value:
+            view.fields[view.card_pos] |= self.mask
+        else:
+            view.fields[view.card_pos] &= ~self.mask
+
+
+
+class Field:
+    """
+    Attribute of a KnowledgeView which is either unknown (None) or one of the given values.
+    It is stored in the bits starting from the given one (0 means unknown).
+    """
+
+    def __init__(self, bit, values):
+        self.bit = bit
+        self.values = list(values)
+        self.codes = {value: code for (code, value) in enumerate(self.values, 1)}
+        self.mask = ((1 << len(self.values).bit_length()) - 1) << bit
+
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        code = (view.fields[view.card_pos] & self.mask) >> self.bit
+        return self.values[code - 1] if code > 0 else None
+
+
+    def __set__(self, view, value):
+        code = self.codes[value] if value else 0
+        view.fields[view.card_pos] = view.fields[view.card_pos] & ~self.mask | code << self.bit
+
+
+
+class SetField:
+    """
+    Attribute of a KnowledgeView which is a subset of the given values, stored as a bitmask
+    starting from the given bit. It is read as a list, and it can be assigned any iterable.
+    """
+
+    def __init__(self, bit, values):
+        self.bit = bit
+        self.values = list(values)
+        self.mask = ((1 << len(self.values)) - 1) << bit
+
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        x = view.fields[view.card_pos] >> self.bit
+        return [value for (i, value) in enumerate(self.values) if x & (1 << i)]
+
+
+    def __set__(self, view, values):
+        x = 0
+        for value in values:
+            x |= 1 << self.values.index(value)
+        view.fields[view.card_pos] = view.fields[view.card_pos] & ~self.mask | x << self.bit
+
+
+
+class KnowledgeView:
+    """
+    View of the knowledge about a card, stored as a bitfield in a KnowledgeArray.
+    Subclasses define the attributes (see Flag, Field and SetField) and the type code
+    of the array (large enough to hold all the bits).
+    """
+    __slots__ = ('fields', 'card_pos')
+
+    TYPECODE = 'B'
+
+    def __init__(self, fields, card_pos):
+        self.fields = fields
+        self.card_pos = card_pos
+
+
+
+class KnowledgeArray:
+    """
+    Knowledge about the cards of a hand, stored as one bitfield per card in a compact array.
+    Indexing returns a view (see KnowledgeView) on the bitfield of the card in the given position.
+    Views are bound to positions, not to cards: after shift(), the view of a position refers
+    to the card which is now there.
+    """
+
+    def __init__(self, view_class, k):
+        self.fields = array(view_class.TYPECODE, [0] * k)
+        self.views = [view_class(self.fields, card_pos) for card_pos in range(k)]
+
+
+    def __len__(self):
+        return len(self.views)
+
+
+    def __getitem__(self, card_pos):
+        return self.views[card_pos]
+
+
+    def __iter__(self):
+        return iter(self.views)
+
+
+    def mask(self, bits):
+        """
+        Mask of the positions (bit i is position i) whose bitfield has some of the given bits.
+        """
+        res = 0
+        for (card_pos, x) in enumerate(self.fields):
+            if x & bits:
+                res |= 1 << card_pos
+        return res
+
+
+    def shift(self, card_pos):
+        """
+        The card in the given position leaves the hand: the cards on its left are shifted
+        to the right, and the leftmost position gets a new card (with no knowledge).
+        """
+        self.fields[1:card_pos + 1] = self.fields[:card_pos]
+        self.fields[0] = 0
+
+
+
+class DuplicatesIndex:
+    """
+    Index of the cards which are known exactly by their owners, as seen by a strategy.
+    It allows to check in constant time whether a card is a duplicate (see is_duplicate()).
+
+    The strategy must have the attributes id, num_players, k, hands, knowledge and possibilities,
+    and the knowledge objects must have a knows_exactly() method.
+    The index must be refreshed (see refresh()) for a player whenever his knowledge changes,
+    or a card leaves his hand.
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+
+        # for each card of the other players known exactly, the positions (player_id, card_pos) where it is
+        self.positions = {}
+
+        # indexed cards of each player, in the form (card, card_pos)
+        self.entries = {player_id: [] for player_id in range(strategy.num_players) if player_id != strategy.id}
+
+        # positions of my cards which I know exactly
+        self.my_positions = []
+
+        for player_id in range(strategy.num_players):
+            self.refresh(player_id)
+
+
+    def refresh(self, player_id):
+        """
+        Update the index with the current knowledge and hand of the given player.
+        """
+        knowledge = self.strategy.knowledge[player_id]
+
+        if player_id == self.strategy.id:
+            self.my_positions = [card_pos for card_pos in range(self.strategy.k) if knowledge[card_pos].knows_exactly()]
+            return
+
+        # remove old entries
+        for (card, card_pos) in self.entries[player_id]:
+            positions = self.positions[card]
+            positions.discard((player_id, card_pos))
+            if len(positions) == 0:
+                del self.positions[card]
+
+        # add new entries
+        hand = self.strategy.hands[player_id]
+        self.entries[player_id] = [(card, card_pos) for (card_pos, card) in enumerate(hand) if card is not None and knowledge[card_pos].knows_exactly()]
+        for (card, card_pos) in self.entries[player_id]:
+            self.positions.setdefault(card, set()).add((player_id, card_pos))
+
+
+    def is_duplicate(self, card):
+        """
+        Says if the given card (appearance) is owned by some player who knows everything about it.
+        For my cards, the current possibilities are used.
+        """
+        if card in self.positions:
+            return True
+
+        possibilities = self.strategy.possibilities
+        return any(card in possibilities[card_pos] for card_pos in self.my_positions)
+
+
+
+class Empathy:
+    """
+    For each player and each position, the cards that the player considers possible for his own card,
+    given the clues he received and the cards he can see (as far as they are known to the strategy).
+    Sets of cards are stored as masks (see clues.py).
+
+    The strategy must have the attributes id, num_players, k, variant (the tables of the type of deck, see deck.py),
+    full_deck, hands and discard_pile.
+    Clues and cards leaving a hand must be passed to clue() and shift(), and refresh() must be called
+    whenever new cards become visible.
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        self.variant = strategy.variant
+        self.all_cards = (1 << self.variant.num_cards) - 1
+
+        # number of copies of each card
+        self.copies = [0] * self.variant.num_cards
+        for card in strategy.full_deck:
+            self.copies[self.variant.card_index(card)] += 1
+
+        # kept up to date by refresh(): visible counts (discard pile and hands, as seen by the strategy), cards of the
+        # discard pile and of each hand (indices), counts of each hand, and for each player the cards whose copies
+        # are all visible to him (mask)
+        self.visible = [0] * self.variant.num_cards
+        self.discarded = []
+        self.hands = {}
+        self.hand_counts = [[0] * self.variant.num_cards for player_id in range(strategy.num_players)]
+        self.exhausted = [0] * strategy.num_players
+
+        self.masks = [array('L', [self.all_cards] * strategy.k) for player_id in range(strategy.num_players)]
+        self.refresh()
+
+
+    def __getitem__(self, player_id):
+        return self.masks[player_id]
+
+
+    def possible_cards(self, player_id, card_pos):
+        """
+        List of the cards which the given player considers possible in the given position.
+        """
+        mask = self.masks[player_id][card_pos]
+        return [card for (i, card) in enumerate(self.variant.cards) if mask >> i & 1]
+
+
+    def clue(self, target_id, touched, clue):
+        """
+        The given player receives a clue (code) touching the given mask of positions.
+        """
+        masks = self.masks[target_id]
+        positive = self.variant.clue_cards[clue]
+        negative = self.all_cards & ~positive
+        for card_pos in range(len(masks)):
+            masks[card_pos] &= positive if touched >> card_pos & 1 else negative
+
+
+    def shift(self, player_id, card_pos, new_card_exists=True):
+        """
+        The card in the given position leaves the hand of the given player (see KnowledgeArray.shift()).
+        """
+        masks = self.masks[player_id]
+        masks[1:card_pos + 1] = masks[:card_pos]
+        masks[0] = self.all_cards & ~self.exhausted[player_id] if new_card_exists else 0
+
+
+    def refresh(self):
+        """
+        Remove, for every player, the cards whose copies are all visible to him.
+        Only the cards added to the discard pile and the hands which changed since the last call are counted.
+        """
+        strategy = self.strategy
+        card_index = self.variant.card_index
+        visible = self.visible
+        changed = set()
+
+        # cards added to the discard pile (or removed, e.g. when a turn is undone)
+        discard_pile = strategy.discard_pile
+        discarded = self.discarded
+        while len(discarded) > len(discard_pile):
+            i = discarded.pop()
+            visible[i] -= 1
+            changed.add(i)
+        for card in discard_pile[len(discarded):]:
+            i = card_index(card)
+            discarded.append(i)
+            visible[i] += 1
+            changed.add(i)
+
+        # hands whose cards changed
+        for (player_id, hand) in strategy.hands.items():
+            cards = [card_index(card) for card in hand if card is not None]
+            old = self.hands.get(player_id, [])
+            if cards == old:
+                continue
+            counts = self.hand_counts[player_id]
+            for i in old:
+                counts[i] -= 1
+                visible[i] -= 1
+                changed.add(i)
+            for i in cards:
+                counts[i] += 1
+                visible[i] += 1
+                changed.add(i)
+            self.hands[player_id] = cards
+
+        if not changed:
+            return
+
+        for player_id in range(strategy.num_players):
+            counts = self.hand_counts[player_id]
+            exhausted = self.exhausted[player_id]
+            for i in changed:
+                if visible[i] - counts[i] >= self.copies[i]:
+                    exhausted |= 1 << i
+                else:
+                    exhausted &= ~(1 << i)
+
+            new = exhausted & ~self.exhausted[player_id]
+            self.exhausted[player_id] = exhausted
+            if new:
+                masks = self.masks[player_id]
+                for card_pos in range(len(masks)):
+                    masks[card_pos] &= ~new
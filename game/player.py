@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
+import copy
 
 from .card import Card, get_appearance
 from .action import Action
+from .timing import Timing, PHASES, INITIALIZE, DECISION, FEED
 from typing import Dict, List
 
 import importlib
@@ -30,10 +33,31 @@ class Player:
         self.ai: str = ai
         self.ai_params: Dict = ai_params
         
-        # create strategy object
-        Strategy = __import__('ai.%s.strategy' % self.ai, globals(), locals(), fromlist=['Strategy'], level=1).Strategy
+        # create strategy object (none if the actions are chosen outside of the game, see Game.seats)
+        if self.ai is not None:
+            Strategy = __import__('ai.%s.strategy' % self.ai, globals(), locals(), fromlist=['Strategy'], level=1).Strategy
+            self.strategy = Strategy(verbose=strategy_log, params=ai_params)
+        else:
+            self.strategy = None
         
-        self.strategy = Strategy(verbose=strategy_log, params=ai_params)
+        # time spent by the strategy in each phase
+        self.timings = {phase: Timing() for phase in PHASES}
+    
+    
+    def clone(self, game: 'Game', with_timings: bool = False) -> 'Player':
+        """
+        Copy of this player for a copy of the game (see Game.clone()), with a copy of the hand and no strategy.
+        A player without strategy records no time, so the timings are shared unless with_timings is True.
+        """
+        player = Player.__new__(Player)
+        player.id = self.id
+        player.game = game
+        player.hand = list(self.hand)
+        player.ai = self.ai
+        player.ai_params = self.ai_params
+        player.strategy = None
+        player.timings = {phase: copy.copy(timing) for (phase, timing) in self.timings.items()} if with_timings else self.timings
+        return player
     
     
     def __eq__(self, other):
@@ -49,7 +73,9 @@ class Player:
     
     def initialize(self):
         # called once after all players are created, before the game starts
+        start = time.perf_counter()
         self.initialize_strategy()
+        self.timings[INITIALIZE].record(time.perf_counter() - start)
     
     
     def initialize_strategy(self):
@@ -70,38 +96,57 @@ class Player:
             )
         self.update_strategy()
     
-    def update_strategy(self):
+    def update_strategy(self, deadline=None):
         """
         To be called immediately after every turn.
+        The deadline (see time.perf_counter()) is the one of the phase which follows.
         """
+        other_players = self.other_players()
         self.strategy.update(
                 clues = self.game.clues,
                 lives = self.game.lives,
                 my_hand = get_appearance(self.hand, hide=True),
-                hands = {i: get_appearance(player.hand) for (i, player) in self.other_players().items()},
+                hands = {i: get_appearance(player.hand) for (i, player) in other_players.items()},
                 discard_pile = get_appearance(self.game.discard_pile),
                 turn = self.game.get_current_turn(),
                 last_turn = self.game.last_turn,
                 deck_size = len(self.game.deck),
-                game = self.game
+                game = self.game,
+                hand_masks = {i: self.game.hand_masks[i] for i in other_players},
+                deadline = deadline
             )
     
     
+    def start_phase(self, limit):
+        # start measuring the time of a phase, and compute its deadline
+        start = time.perf_counter()
+        return start, (start + limit if limit is not None else None)
+    
+    
     def get_turn_action(self):
+        start, deadline = self.start_phase(self.game.time_per_move)
+        
         # update strategy (in case this is the first turn)
-        self.update_strategy()
+        self.update_strategy(deadline)
         
         # choose action for this turn
         action = self.strategy.get_turn_action()
+        if self.timings[DECISION].record(time.perf_counter() - start, self.game.time_per_move) and self.game.hard_deadline:
+            # too late (the decision is not interrupted): use the default action of the strategy instead
+            action = self.strategy.default_action()
+        
         action.apply(self.game)
         return action
     
     
     def feed_turn(self, turn):
+        start, deadline = self.start_phase(self.game.time_per_feed)
+        
         # update strategy
-        self.update_strategy()
+        self.update_strategy(deadline)
         
         # pass information about what happened during the turn
         self.strategy.feed_turn(turn.player.id, turn.action)
+        self.timings[FEED].record(time.perf_counter() - start, self.game.time_per_feed)
 
 
@@ -0,0 +1,627 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Server hosting many concurrent games (tables) in one process, with asyncio.
+
+Clients connect to a TCP socket on localhost and exchange JSON messages, one per line (the same messages
+can be carried by the frames of a websocket). Each seat of a table is played either by a human (a connected
+client) or by a built-in AI (see AIS); the seats for humans which are still free when the table is started
+are filled with the AI of the table.
+
+The server process only keeps the state of the games, with players without strategy (see Game.seats),
+and applies the actions, which takes a few microseconds: thousands of slow-paced games can be hosted at once.
+The strategies of the AI seats run in a pool of worker processes (see BotPool): each worker keeps a copy
+of the games assigned to it, with the strategies of their AI seats, and receives all their turns.
+
+Messages from the client:
+- {"type": "create", "num_players": 5, "deck_type": "deck50", "seats": ["human", "bean", ...],
+  "ai": "alphahanabi", "timeout": 60}: create a table (every field is optional; by default, all the seats are
+  for humans); the client receives the turns and the end of the game, and a table without seats for humans
+  starts immediately;
+- {"type": "join", "table": 3, "seat": 0}: take a seat for a human (by default, the first free one);
+  the table starts when all the seats for humans are taken;
+- {"type": "start", "table": 3}: start the table, filling the free seats with its AI;
+- {"type": "action", "table": 3, "action": ACTION}: play in the given table, where ACTION is
+  {"type": "Play", "card_pos": 2}, {"type": "Discard", "card_pos": 2},
+  {"type": "Clue", "target_id": 1, "clue_type": "C", "value": "Red"} (or "N" and a number),
+  or the code of the action (see action_codes.py).
+
+Messages from the server:
+- {"type": "created", "table": 3} and {"type": "joined", "table": 3, "seat": 0};
+- {"type": "state", "table": 3, "seat": 0, ...}: the game as seen by the seat, at the start and after each turn;
+  if it is the turn of the seat, it includes the codes of the legal actions and the time left (in seconds);
+- {"type": "turn", "table": 3, "player": 1, "action": ACTION, ...}: a turn, with the card played or
+  discarded, or the positions of the cards touched by a clue;
+- {"type": "end", "table": 3, "score": 25, ...}: the end of a game;
+- {"type": "error", "message": "..."}.
+
+If a human does not play before the timeout of the table, the rightmost card of their hand is discarded
+(as in BaseStrategy.default_action()); the AIs play with the same time limit (see Game.hard_deadline), and
+the same card is discarded if their answer does not come in time (e.g. when their worker is busy).
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+
+from .action import Action, PlayAction, DiscardAction, ClueAction
+from .action_codes import action_code, code_action, legal_actions
+from .deck import VARIANTS, DECK50
+from .game import Game
+
+
+HOST = '127.0.0.1'
+PORT = 7321
+
+HUMAN = 'human'
+AIS = ['alphahanabi', 'bean', 'dummy']
+
+# requests to the workers, and their answers
+NEW = 'new'
+TURN = 'turn'
+ACT = 'act'
+CLOSE = 'close'
+ACTION = 'action'
+FAILED = 'failed'
+
+
+def bot_worker(connection):
+    """
+    Main loop of a worker process of BotPool: keep a copy of each game assigned to the worker, with the
+    strategies of its AI seats, and answer the requests of the server, in order, until None is received.
+    """
+    # the server stops the workers when it is interrupted
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    games = {}
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        command, table_id = request[:2]
+        try:
+            if command == NEW:
+                num_players, deck_type, deck_description, seats, time_per_move = request[2:]
+                game = Game(num_players, seats=seats, deck_description=deck_description, deck_type=deck_type,
+                            time_per_move=time_per_move, hard_deadline=time_per_move is not None)
+                game.setup()
+                games[table_id] = game
+
+            elif command == TURN:
+                game = games[table_id]
+                code, former_chop = request[2:]
+                action = code_action(code, game.variant)
+                action.apply(game)
+                if action.type == Action.CLUE:
+                    action.former_chop = former_chop
+                game.play_turn(action)
+
+            elif command == ACT:
+                # the action is played when the server sends it back as a turn (it may have timed out)
+                game = games[table_id]
+                action = game.get_current_player().get_turn_action()
+                connection.send((ACTION, table_id, (request[2], action_code(action, game.variant),
+                                                    getattr(action, 'former_chop', None))))
+
+            elif command == CLOSE:
+                games.pop(table_id, None)
+
+        except Exception as e:
+            # the copy of the game cannot be trusted anymore
+            games.pop(table_id, None)
+            connection.send((FAILED, table_id, "%s: %s" % (type(e).__name__, e)))
+
+
+class BotPool:
+    """
+    Worker processes running the strategies of the AI seats (see bot_worker()).
+    Each game is assigned to the worker with the fewest games, and all its requests go to that worker.
+    Requests are sent by a thread for each worker, so that the event loop never waits for a busy worker.
+    """
+
+    def __init__(self, num_workers, loop):
+        self.loop = loop
+        self.connections = []
+        self.processes = []
+        for i in range(num_workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=bot_worker, args=(worker_connection,), daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        # the threads are started after the processes (which are forked)
+        self.queues = []
+        for connection in self.connections:
+            requests = queue.SimpleQueue()
+            threading.Thread(target=self.send_requests, args=(connection, requests), daemon=True).start()
+            self.queues.append(requests)
+            loop.add_reader(connection.fileno(), self.receive, connection)
+
+        self.workers = {}   # table id -> index of its worker
+        self.load = [0] * num_workers
+        self.actions = {}   # table id -> (turn, future of the requested action)
+
+
+    @staticmethod
+    def send_requests(connection, requests):
+        while True:
+            request = requests.get()
+            connection.send(request)
+            if request is None:
+                break
+
+
+    def receive(self, connection):
+        try:
+            while connection.poll():
+                command, table_id, value = connection.recv()
+                if command == ACTION:
+                    turn, value = value[0], value[1:]
+                    if self.actions.get(table_id, (None,))[0] != turn:
+                        # answer to a request which timed out
+                        continue
+                (turn, future) = self.actions.pop(table_id, (None, None))
+                if future is None or future.done():
+                    continue
+                if command == ACTION:
+                    future.set_result(value)
+                else:
+                    future.set_exception(Exception("AI failed: %s" % value))
+
+        except EOFError:
+            # the worker is dead: so are its games
+            self.loop.remove_reader(connection.fileno())
+            worker = self.connections.index(connection)
+            for (table_id, index) in self.workers.items():
+                if index == worker and table_id in self.actions:
+                    (turn, future) = self.actions.pop(table_id)
+                    if not future.done():
+                        future.set_exception(Exception("AI worker died"))
+
+
+    def send(self, table_id, request):
+        self.queues[self.workers[table_id]].put(request)
+
+
+    def new_game(self, table_id, game, seats, time_per_move):
+        """
+        Assign a game (just set up) to a worker, which plays the given AI seats (None for the other seats).
+        """
+        worker = min(range(len(self.load)), key=lambda i: self.load[i])
+        self.workers[table_id] = worker
+        self.load[worker] += 1
+        self.send(table_id, (NEW, table_id, game.num_players, game.deck_type,
+                             game.get_deck_description(game.initial_deck), seats, time_per_move))
+
+
+    def send_turn(self, table_id, code, former_chop=None):
+        """
+        Inform the worker about a turn (including the turns of its own AI seats).
+        The former chop of a clue is known only if an AI gave it (see ClueAction.former_chop).
+        """
+        self.send(table_id, (TURN, table_id, code, former_chop))
+
+
+    def get_action(self, table_id, turn):
+        """
+        Future of (code, former chop) of the action of the current player (an AI seat) in the given turn.
+        The worker plays it in its copy of the game only when it receives the turn (see send_turn()).
+        """
+        future = self.loop.create_future()
+        self.actions[table_id] = (turn, future)
+        self.send(table_id, (ACT, table_id, turn))
+        return future
+
+
+    def close_game(self, table_id):
+        self.send(table_id, (CLOSE, table_id))
+        self.load[self.workers.pop(table_id)] -= 1
+        (turn, future) = self.actions.pop(table_id, (None, None))
+        if future is not None:
+            future.cancel()
+
+
+    def close(self):
+        for (connection, requests) in zip(self.connections, self.queues):
+            requests.put(None)
+            self.loop.remove_reader(connection.fileno())
+        for process in self.processes:
+            process.join()
+
+
+class Client:
+    """
+    A connection to the server.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.seats = set()      # (table id, seat)
+        self.tables = set()     # ids of the tables created by the client
+
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message).encode() + b"\n")
+
+
+class Table:
+    """
+    A game hosted by the server, with the kind of each seat (HUMAN, or the name of an AI).
+    """
+
+    def __init__(self, id, num_players, deck_type, seats, ai, timeout, owner):
+        self.id = id
+        self.num_players = num_players
+        self.deck_type = deck_type
+        self.seats = seats
+        self.ai = ai    # AI of the free seats
+        self.timeout = timeout
+
+        self.owner = owner
+        self.clients = [None] * num_players     # client playing each seat for humans
+        self.game = None
+
+        # timer and deadline (see loop.time()) of the current turn of a human
+        self.timer = None
+        self.deadline = None
+
+
+    def has_bots(self):
+        return any(seat != HUMAN for seat in self.seats)
+
+
+    def connected_clients(self):
+        return set(client for client in self.clients + [self.owner] if client is not None)
+
+
+def encode_card(card):
+    return [card.color, card.number] if card is not None else None
+
+
+def encode_action(action):
+    if action.type == Action.CLUE:
+        return {"type": action.type, "target_id": action.target_id, "clue_type": action.clue_type, "value": action.value}
+    else:
+        return {"type": action.type, "card_pos": action.card_pos}
+
+
+def decode_action(data, variant):
+    """
+    Action from its JSON description, or from its code.
+    """
+    if isinstance(data, int):
+        return code_action(data, variant)
+
+    if data["type"] == Action.PLAY:
+        return PlayAction(int(data["card_pos"]))
+    elif data["type"] == Action.DISCARD:
+        return DiscardAction(int(data["card_pos"]))
+    elif data["type"] == Action.CLUE:
+        clue_type = data["clue_type"]
+        if clue_type not in Action.CLUE_TYPES:
+            raise ValueError("Unknown clue type")
+        value = data["value"] if clue_type == Action.COLOR else int(data["value"])
+        return ClueAction(int(data["target_id"]), clue_type=clue_type, value=value)
+    else:
+        raise ValueError("Unknown action type")
+
+
+class Server:
+    """
+    Asyncio server hosting the tables (see the module docstring for the protocol).
+    """
+
+    def __init__(self, num_workers=None, ai="alphahanabi", timeout=60.0):
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        self.ai = ai
+        self.timeout = timeout
+
+        self.tables = {}
+        self.table_ids = itertools.count(1)
+        self.bots = None
+
+
+    async def serve(self, host=HOST, port=PORT):
+        self.loop = asyncio.get_running_loop()
+        self.bots = BotPool(self.num_workers, self.loop)
+        try:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.bots.close()
+
+
+    async def handle_client(self, reader, writer):
+        client = Client(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self.handle_message(client, json.loads(line))
+                except (ValueError, KeyError, TypeError, AssertionError) as e:
+                    client.send({"type": "error", "message": str(e) or type(e).__name__})
+
+        except ConnectionError:
+            pass
+
+        finally:
+            self.disconnect(client)
+            writer.close()
+
+
+    def handle_message(self, client, message):
+        kind = message["type"]
+        if kind == "create":
+            self.create_table(client, message)
+        elif kind == "join":
+            self.join_table(client, self.get_table(message), message.get("seat"))
+        elif kind == "start":
+            self.start_table(client, self.get_table(message))
+        elif kind == "action":
+            self.human_action(client, self.get_table(message), message["action"])
+        else:
+            raise ValueError("Unknown message type")
+
+
+    def get_table(self, message):
+        table = self.tables.get(message["table"])
+        if table is None:
+            raise ValueError("No such table")
+        return table
+
+
+    def create_table(self, client, message):
+        num_players = int(message.get("num_players", 5))
+        if num_players not in Game.NUM_PLAYERS_CHOICES:
+            raise ValueError("Invalid number of players")
+
+        deck_type = message.get("deck_type", DECK50)
+        if deck_type not in VARIANTS:
+            raise ValueError("Unknown deck type")
+
+        ai = message.get("ai", self.ai)
+        seats = list(message.get("seats", [HUMAN] * num_players))
+        if len(seats) != num_players or any(seat not in AIS + [HUMAN] for seat in seats + [ai]):
+            raise ValueError("Invalid seats")
+
+        timeout = float(message.get("timeout", self.timeout))
+        if timeout <= 0:
+            raise ValueError("Invalid timeout")
+
+        table = Table(next(self.table_ids), num_players, deck_type, seats, ai, timeout, client)
+        self.tables[table.id] = table
+        client.tables.add(table.id)
+        client.send({"type": "created", "table": table.id})
+
+        if HUMAN not in seats:
+            self.start_game(table)
+
+
+    def join_table(self, client, table, seat=None):
+        if table.game is not None:
+            raise ValueError("The game has already started")
+
+        free = [i for (i, kind) in enumerate(table.seats) if kind == HUMAN and table.clients[i] is None]
+        if seat is None and free:
+            seat = free[0]
+        if seat not in free:
+            raise ValueError("No free seat")
+
+        table.clients[seat] = client
+        client.seats.add((table.id, seat))
+        client.send({"type": "joined", "table": table.id, "seat": seat})
+
+        if len(free) == 1:
+            self.start_game(table)
+
+
+    def start_table(self, client, table):
+        if table.game is not None:
+            raise ValueError("The game has already started")
+        if client is not table.owner and client not in table.clients:
+            raise ValueError("Not at this table")
+
+        for (i, kind) in enumerate(table.seats):
+            if kind == HUMAN and table.clients[i] is None:
+                table.seats[i] = table.ai
+        self.start_game(table)
+
+
+    def start_game(self, table):
+        table.game = Game(table.num_players, seats=[None] * table.num_players, deck_type=table.deck_type)
+        table.game.setup()
+
+        if table.has_bots():
+            seats = [kind if kind != HUMAN else None for kind in table.seats]
+            self.bots.new_game(table.id, table.game, seats, table.timeout)
+
+        self.next_turn(table)
+
+
+    def next_turn(self, table):
+        player = table.game.get_current_player()
+        if table.seats[player.id] == HUMAN:
+            table.deadline = self.loop.time() + table.timeout
+            table.timer = self.loop.call_later(table.timeout, self.timeout_turn, table)
+        else:
+            table.deadline = None
+            self.loop.create_task(self.bot_turn(table))
+
+        self.send_states(table)
+
+
+    async def bot_turn(self, table):
+        try:
+            code, former_chop = await asyncio.wait_for(
+                self.bots.get_action(table.id, table.game.get_current_turn()), table.timeout)
+        except asyncio.TimeoutError:
+            code = None
+        except Exception as e:
+            self.abort(table, str(e))
+            return
+
+        if self.tables.get(table.id) is table:
+            if code is None:
+                self.timeout_turn(table)
+            else:
+                action = code_action(code, table.game.variant)
+                action.apply(table.game)
+                if action.type == Action.CLUE:
+                    action.former_chop = former_chop
+                self.play(table, action)
+
+
+    def human_action(self, client, table, data):
+        game = table.game
+        if game is None:
+            raise ValueError("The game has not started")
+
+        player = game.get_current_player()
+        if table.seats[player.id] != HUMAN or table.clients[player.id] is not client:
+            raise ValueError("Not your turn")
+
+        action = decode_action(data, game.variant)
+        try:
+            code = action_code(action, game.variant)
+        except KeyError:
+            raise ValueError("Unknown clue")
+        if code not in legal_actions(game, player.id):
+            raise ValueError("Illegal action")
+
+        action.apply(game)
+        self.play(table, action)
+
+
+    def timeout_turn(self, table):
+        # discard the rightmost card (see BaseStrategy.default_action())
+        table.timer = None
+        player = table.game.get_current_player()
+        card_pos = max(card_pos for (card_pos, card) in enumerate(player.hand) if card is not None)
+        action = DiscardAction(card_pos)
+        action.apply(table.game)
+        self.play(table, action)
+
+
+    def play(self, table, action):
+        """
+        Play the given action (already populated) of the current player of the table.
+        """
+        game = table.game
+        if table.timer is not None:
+            table.timer.cancel()
+            table.timer = None
+
+        player = game.get_current_player()
+        game.play_turn(action)
+        if table.has_bots():
+            self.bots.send_turn(table.id, action_code(action, game.variant), getattr(action, 'former_chop', None))
+
+        message = {"type": "turn", "table": table.id, "turn": game.this_turn.number, "player": player.id,
+                   "action": encode_action(action)}
+        if action.type == Action.CLUE:
+            message["cards_pos"] = action.cards_pos
+        else:
+            message["card"] = encode_card(game.discard_pile[-1])
+        for client in table.connected_clients():
+            client.send(message)
+
+        if game.end_game:
+            self.end_game(table)
+        else:
+            self.next_turn(table)
+
+
+    def send_states(self, table):
+        for (seat, client) in enumerate(table.clients):
+            if client is not None:
+                client.send(self.state(table, seat))
+
+
+    def state(self, table, seat):
+        """
+        The game as seen by the given seat.
+        """
+        game = table.game
+        player = game.players[seat]
+        message = {
+            "type": "state",
+            "table": table.id,
+            "seat": seat,
+            "turn": game.get_current_turn(),
+            "current_player": game.get_current_player().id,
+            "clues": game.clues,
+            "lives": game.lives,
+            "deck_size": len(game.deck),
+            "score": game.get_current_score(),
+            "board": game.board,
+            "last_turn": game.last_turn,
+            "my_hand": [card is not None for card in player.hand],
+            "hands": [[encode_card(card) for card in other.hand] if other is not player else None for other in game.players],
+            "discard_pile": [encode_card(card) for card in game.discard_pile],
+        }
+        if game.get_current_player() is player:
+            message["legal_actions"] = legal_actions(game, seat)
+            message["time_left"] = table.deadline - self.loop.time()
+        return message
+
+
+    def end_game(self, table):
+        statistics = table.game.get_statistics()
+        message = {"type": "end", "table": table.id, "score": statistics.score, "lives": statistics.lives,
+                   "clues": statistics.clues, "num_turns": statistics.num_turns}
+        for client in table.connected_clients():
+            client.send(message)
+        self.remove_table(table)
+
+
+    def abort(self, table, reason):
+        for client in table.connected_clients():
+            client.send({"type": "error", "table": table.id, "message": reason})
+        self.remove_table(table)
+
+
+    def remove_table(self, table):
+        if self.tables.get(table.id) is not table:
+            return
+        del self.tables[table.id]
+
+        if table.timer is not None:
+            table.timer.cancel()
+        if table.game is not None and table.has_bots():
+            self.bots.close_game(table.id)
+
+        for (seat, client) in enumerate(table.clients):
+            if client is not None:
+                client.seats.discard((table.id, seat))
+        if table.owner is not None:
+            table.owner.tables.discard(table.id)
+
+
+    def disconnect(self, client):
+        # the seats of the client become free (or are played by timeouts, if the game has started)
+        for (table_id, seat) in client.seats:
+            self.tables[table_id].clients[seat] = None
+        for table_id in client.tables:
+            self.tables[table_id].owner = None
+
+        # tables which did not start and have nobody left are removed
+        for table_id in set(table_id for (table_id, seat) in client.seats) | client.tables:
+            table = self.tables[table_id]
+            if table.game is None and table.owner is None and not any(table.clients):
+                self.remove_table(table)
+
+        client.seats.clear()
+        client.tables.clear()
@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Maximum score achievable on a deck when every player sees every card, including the order of the deck
+(an upper bound for any real strategy on that deck).
+
+Under full information clues carry no information: giving a clue is just a way to pass the turn
+without drawing, so all the clues are the same move. The search is a depth-first branch and bound:
+- an admissible upper bound of the score (see Solver.upper_bound()) prunes the branches which cannot
+  improve the best score found so far, and the search stops as soon as a line reaches the bound;
+- a transposition table stores the value (or an upper bound of it) of the states already searched, keyed by
+  a Zobrist hash in which hands are multisets (the order of the cards in a hand does not matter here);
+- dominated moves are not searched: cards with the same appearance in the same hand are the same move,
+  if some card in the hand is useless only that one is discarded, and a card is never played without
+  being playable (discarding it is better: same draw, no life lost). As in the game, discards are
+  allowed with all the clues (no clue is gained).
+
+The number of searched states can be limited; the result is then a lower bound (the best line found)
+and an upper bound, which are equal when the search is complete.
+"""
+
+import json
+import multiprocessing
+import os
+import random
+from collections import namedtuple
+
+from .card import Card
+from .deck import VARIANTS, DECK50
+from .zobrist import MAX_COLORS, MAX_CARDS
+
+
+NUM_NUMBERS = Card.NUM_NUMBERS
+MAX_CLUES = 8
+MAX_PLAYERS = 5
+
+Solution = namedtuple("Solution", "score upper_bound nodes")
+
+# Zobrist numbers (see zobrist.py): hands are hashed as multisets, by the number of copies of each card
+generator = random.Random(0x501E)
+
+
+def random_keys(n):
+    return [generator.getrandbits(64) for i in range(n)]
+
+
+HELD = [[[0] + random_keys(3) for i in range(MAX_CARDS)] for player_id in range(MAX_PLAYERS)]
+BOARD = [random_keys(NUM_NUMBERS + 1) for color in range(MAX_COLORS)]
+CLUES = random_keys(MAX_CLUES + 1)
+LIVES = random_keys(4)
+DECK = random_keys(64)
+TO_MOVE = random_keys(MAX_PLAYERS)
+TURNS_LEFT = [0] + random_keys(MAX_PLAYERS + 2)
+
+
+class SearchLimit(Exception):
+    pass
+
+
+
+class Solver:
+    """
+    Branch and bound search of the maximum score, from a state given by the hands (lists of cards
+    or card indices, see deck.py), the deck (in the order of Game.deck: the last card is drawn first)
+    and the usual counters.
+    """
+
+    def __init__(self, hands, deck, board=None, discarded=(), clues=MAX_CLUES, lives=3, turn=0, last_turn=None,
+                 deck_type=DECK50, max_nodes=None):
+        variant = VARIANTS[deck_type]
+        self.num_colors = variant.num_colors
+
+        def index(card):
+            return card if isinstance(card, int) else variant.card_index(card)
+
+        self.num_players = len(hands)
+        self.hands = [[index(card) for card in hand if card is not None] for hand in hands]
+        self.deck = [index(card) for card in deck]
+        self.board = list(board) if board is not None else [0] * self.num_colors
+        self.clues = clues
+        self.lives = lives
+        self.turn = turn
+        self.last_turn = last_turn
+        self.max_nodes = max_nodes
+
+        # copies of each card, and copies lost (discarded, or played without success)
+        self.copies = list(variant.copies)
+        self.lost = [0] * variant.num_cards
+        for card in discarded:
+            self.lost[index(card)] += 1
+
+        # copies of each card in the hands, and positions of its copies in the deck
+        self.in_hands = [0] * variant.num_cards
+        for hand in self.hands:
+            for card in hand:
+                self.in_hands[card] += 1
+        self.positions = [[] for i in range(variant.num_cards)]
+        for (position, card) in enumerate(self.deck):
+            self.positions[card].append(position)
+
+        self.key = CLUES[self.clues] ^ LIVES[self.lives] ^ DECK[len(self.deck)]
+        for (color, height) in enumerate(self.board):
+            self.key ^= BOARD[color][height]
+        for (player_id, hand) in enumerate(self.hands):
+            held = [0] * variant.num_cards
+            for card in hand:
+                held[card] += 1
+                self.key ^= HELD[player_id][card][held[card] - 1] ^ HELD[player_id][card][held[card]]
+
+        self.table = {}     # key -> (value, exact)
+        self.nodes = 0
+        self.best = self.score()
+        self.line = []      # moves of the best line found
+        self.path = []      # moves from the initial state to the current one
+
+
+    @classmethod
+    def from_game(cls, game, max_nodes=None):
+        """
+        Solver for the current state of the given game.
+        Cards on the board are also in the discard pile of the game, and are not counted as lost.
+        """
+        variant = game.variant
+        discarded = [variant.card_index(card) for card in game.discard_pile]
+        for card in list(discarded):
+            if game.board[variant.colors[card % variant.num_colors]] >= card // variant.num_colors + 1:
+                discarded.remove(card)
+        return cls(
+            hands=[player.hand for player in game.players],
+            deck=game.deck,
+            board=[game.board[color] for color in variant.colors],
+            discarded=discarded,
+            clues=game.clues,
+            lives=game.lives,
+            turn=game.get_current_turn(),
+            last_turn=game.last_turn,
+            deck_type=game.deck_type,
+            max_nodes=max_nodes,
+        )
+
+
+    def score(self):
+        return sum(self.board)
+
+
+    def state_key(self):
+        """
+        Key of the current state, including the player to move and the turns left in the last round.
+        """
+        return self.key ^ TO_MOVE[self.turn % self.num_players] ^ TURNS_LEFT[0 if self.last_turn is None else self.last_turn - self.turn + 2]
+
+
+    def max_heights(self):
+        """
+        Highest card of each color which can still be played (the lower cards are not all lost).
+        """
+        n = self.num_colors
+        res = []
+        for color in range(n):
+            height = self.board[color]
+            while height < NUM_NUMBERS and self.lost[color + n * height] < self.copies[color + n * height]:
+                height += 1
+            res.append(height)
+        return res
+
+
+    def upper_bound(self):
+        """
+        Admissible upper bound of the final score.
+        No stack can pass a card whose copies are all lost. Moreover, a card can be played only after
+        a copy of it is drawn (and after the lower cards of its color), and after the d-th draw from now
+        at most len(deck) - 1 - d + num_players cards can be played: before the deck runs out every play
+        draws a card, and after that there are num_players turns left. This is checked for the draw after
+        which each of the missing cards can be played at the earliest.
+        """
+        heights = self.max_heights()
+        size = len(self.deck)
+        n = self.num_colors
+
+        # for each missing card, the earliest draw (-1: now) after which it can be played
+        earliest = []
+        for color in range(n):
+            last = -1
+            for card in range(color + n * self.board[color], color + n * heights[color], n):
+                if self.in_hands[card] == 0:
+                    positions = self.positions[card]
+                    i = len(positions) - 1
+                    while positions[i] >= size:
+                        i -= 1
+                    last = max(last, size - 1 - positions[i])
+                earliest.append(last)
+        earliest.sort(reverse=True)
+
+        excess = 0
+        for (j, draw) in enumerate(earliest):
+            if self.last_turn is None:
+                turns = size - 1 - draw + self.num_players
+            else:
+                turns = self.last_turn - self.turn + 1
+            excess = max(excess, j + 1 - turns)
+        return self.score() + len(earliest) - excess
+
+
+    def useless(self, card, heights):
+        # the card is already on the board, or above a lost card
+        (number, color) = divmod(card, self.num_colors)
+        number += 1
+        return number <= self.board[color] or number > heights[color]
+
+
+    def moves(self):
+        """
+        Moves of the player to move, best first: ('play', card), ('clue',), ('discard', card).
+        """
+        player_id = self.turn % self.num_players
+        hand = self.hands[player_id]
+        n = self.num_colors
+        distinct = sorted(set(hand), key=lambda card: card // n)
+        heights = self.max_heights()
+
+        plays = [card for card in distinct if self.board[card % n] == card // n]
+        res = [('play', card) for card in plays]
+
+        if self.clues > 0 and any(self.hands[other] for other in range(self.num_players) if other != player_id):
+            res.append(('clue',))
+
+        useless = [card for card in distinct if self.useless(card, heights)]
+        for card in useless[:1] or sorted(distinct, key=self.discard_cost):
+            res.append(('discard', card))
+        return res
+
+
+    def discard_cost(self, card):
+        """
+        Order of the discards: first the cards with other copies in the hands, then the cards with
+        other copies left, then the highest cards.
+        """
+        others = self.copies[card] - self.lost[card] - 1
+        return (self.in_hands[card] < 2, others == 0, -card)
+
+
+    def do(self, move):
+        """
+        Apply the given move of the player to move, and return what is needed to undo it.
+        """
+        player_id = self.turn % self.num_players
+        undo = (self.clues, self.lives, self.last_turn, self.key)
+        over = self.last_turn is not None and self.turn >= self.last_turn
+
+        success = False
+        drawn = None
+        if move[0] == 'clue':
+            self.clues -= 1
+        else:
+            card = move[1]
+            hand = self.hands[player_id]
+            held = hand.count(card)
+            hand.remove(card)
+            self.in_hands[card] -= 1
+            self.key ^= HELD[player_id][card][held] ^ HELD[player_id][card][held - 1]
+
+            if move[0] == 'play':
+                (number, color) = divmod(card, self.num_colors)
+                success = self.board[color] == number
+                if success:
+                    self.board[color] += 1
+                    self.key ^= BOARD[color][self.board[color] - 1] ^ BOARD[color][self.board[color]]
+                    if self.board[color] == NUM_NUMBERS and self.clues < MAX_CLUES:
+                        self.clues += 1
+                else:
+                    self.lost[card] += 1
+                    self.lives -= 1
+                    over = over or self.lives == 0
+            else:
+                self.lost[card] += 1
+                if self.clues < MAX_CLUES:
+                    self.clues += 1
+
+            # draw
+            if self.deck:
+                self.key ^= DECK[len(self.deck)] ^ DECK[len(self.deck) - 1]
+                drawn = self.deck.pop()
+                held = hand.count(drawn)
+                hand.append(drawn)
+                self.in_hands[drawn] += 1
+                self.key ^= HELD[player_id][drawn][held] ^ HELD[player_id][drawn][held + 1]
+                if not self.deck:
+                    self.last_turn = self.turn + self.num_players
+
+        self.key ^= CLUES[undo[0]] ^ CLUES[self.clues] ^ LIVES[undo[1]] ^ LIVES[self.lives]
+        self.turn += 1
+        return (over, move, drawn, success) + undo
+
+
+    def undo(self, token):
+        """
+        Undo the last move, given the token returned by do().
+        """
+        (over, move, drawn, success, self.clues, self.lives, self.last_turn, self.key) = token
+        self.turn -= 1
+        if move[0] != 'clue':
+            card = move[1]
+            hand = self.hands[self.turn % self.num_players]
+            if drawn is not None:
+                hand.remove(drawn)
+                self.in_hands[drawn] -= 1
+                self.deck.append(drawn)
+            hand.append(card)
+            self.in_hands[card] += 1
+
+            if success:
+                self.board[card % self.num_colors] -= 1
+            else:
+                self.lost[card] -= 1
+
+
+    def search(self, alpha):
+        """
+        Maximum final score from the current state if it is greater than alpha; otherwise, an upper bound
+        of it which is at most alpha.
+        """
+        bound = self.upper_bound()
+        if bound <= alpha:
+            return bound
+
+        key = self.state_key()
+        entry = self.table.get(key)
+        if entry is not None:
+            (value, exact) = entry
+            if exact or value <= alpha:
+                return value
+            bound = min(bound, value)
+
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchLimit()
+
+        best = -1
+        for move in self.moves():
+            token = self.do(move)
+            self.path.append(move)
+            if token[0]:
+                value = self.score()
+                if value > self.best or not self.line:
+                    self.best = value
+                    self.line = list(self.path)
+            else:
+                value = self.search(max(alpha, best))
+            self.path.pop()
+            self.undo(token)
+
+            if value > best:
+                best = value
+                if best >= bound:
+                    break
+
+        if best < 0:
+            # no move (cannot happen in a real game)
+            best = self.score()
+        self.table[key] = (best, best > alpha or best >= bound)
+        return best
+
+
+    def greedy(self):
+        """
+        Play the first move of moves() until the end, to find a first line (and a lower bound).
+        """
+        tokens = []
+        over = False
+        while not over:
+            move = self.moves()[0]
+            tokens.append(self.do(move))
+            self.path.append(move)
+            over = tokens[-1][0]
+
+        if self.score() > self.best or not self.line:
+            self.best = self.score()
+            self.line = list(self.path)
+        for token in reversed(tokens):
+            self.path.pop()
+            self.undo(token)
+
+
+    def solve(self):
+        """
+        Search the maximum score, and return a Solution (score and upper bound, which are equal
+        if the search was complete).
+        The search first looks for a line reaching the upper bound; if there is none, the result
+        of the search is a smaller upper bound, which is the next target.
+        """
+        self.greedy()
+        bound = self.upper_bound()
+        if self.best >= bound:
+            return Solution(score=self.best, upper_bound=bound, nodes=self.nodes)
+        try:
+            while True:
+                value = self.search(bound - 1)
+                if value >= bound:
+                    return Solution(score=value, upper_bound=value, nodes=self.nodes)
+                bound = value
+        except SearchLimit:
+            return Solution(score=self.best, upper_bound=bound, nodes=self.nodes)
+
+
+def deal(deck, num_players, k):
+    """
+    Hands and remaining deck after dealing the given initial deck (in the order of Game.deck), as in Game.setup().
+    """
+    deck = list(deck)
+    hands = [[deck.pop() for i in range(k)] for player_id in range(num_players)]
+    return hands, deck
+
+
+def solve_deck(deck, num_players, deck_type=DECK50, max_nodes=None):
+    """
+    Solution for the given initial deck (a list of cards, in the order of Game.deck).
+    """
+    from .game import Game
+    (hands, deck) = deal(deck, num_players, Game.CARDS_PER_PLAYER[num_players])
+    return Solver(hands, deck, deck_type=deck_type, max_nodes=max_nodes).solve()
+
+
+def deck_key(deck, num_players):
+    """
+    Key of the given initial deck in a cache of solutions (same format as Game.get_deck_description()).
+    """
+    return "%d:%s" % (num_players, ",".join("%d %s %d" % (card.number, card.color, card.id) for card in deck))
+
+
+def solve_task(task):
+    (deck, num_players, deck_type, max_nodes) = task
+    return solve_deck(deck, num_players, deck_type=deck_type, max_nodes=max_nodes)
+
+
+def solve_decks(decks, num_players, deck_type=DECK50, max_nodes=None, processes=None, cache_file=None):
+    """
+    Solutions for the given initial decks, computed in parallel. If a cache file is given, the solutions
+    already computed are read from it (complete solutions only, or incomplete ones with at least as many
+    nodes), and the new ones are added.
+    """
+    cache = {}
+    if cache_file is not None and os.path.exists(cache_file):
+        with open(cache_file) as file:
+            cache = {key: Solution(*value) for (key, value) in json.load(file).items()}
+
+    def cached(key):
+        solution = cache.get(key)
+        if solution is None:
+            return None
+        if solution.score == solution.upper_bound or max_nodes is not None and solution.nodes >= max_nodes:
+            return solution
+        return None
+
+    keys = [deck_key(deck, num_players) for deck in decks]
+    missing = [i for (i, key) in enumerate(keys) if cached(key) is None]
+    tasks = [(decks[i], num_players, deck_type, max_nodes) for i in missing]
+
+    if len(tasks) > 1 and processes != 1:
+        with multiprocessing.Pool(processes) as pool:
+            solutions = pool.map(solve_task, tasks)
+    else:
+        solutions = [solve_task(task) for task in tasks]
+
+    for (i, solution) in zip(missing, solutions):
+        cache[keys[i]] = solution
+
+    if cache_file is not None and missing:
+        with open(cache_file, "w") as file:
+            json.dump({key: list(solution) for (key, solution) in cache.items()}, file)
+
+    return [cache[key] for key in keys]
@@ -0,0 +1,490 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compact state of a game, which can be copied and stepped quickly (e.g. by search algorithms).
+The rules are the same as in Game.run_action(). Cards are represented by their indices in the cards of
+the type of deck (see Variant in deck.py), and -1 is an empty position.
+
+Actions are tuples: (Action.PLAY, card_pos), (Action.DISCARD, card_pos) or (Action.CLUE, target_id, clue),
+where clue is a clue code (see deck.py).
+
+The state also holds the public knowledge of each player about his own cards, as masks of possible cards
+(see clues.py), interpreted with a simple convention: the focus of a clue (see focus_position()) is playable,
+or critical if it is the chop (save clue).
+"""
+
+import random
+
+from .action import Action, PlayAction, DiscardAction, ClueAction
+from .belief import DealSampler
+from .card import Card
+from .clues import action_clue_code
+from .knowledge import Empathy
+
+
+NUM_NUMBERS = Card.NUM_NUMBERS
+MAX_CLUES = 8
+
+
+def board_masks(board, variant):
+    """
+    Masks of the played cards and of the playable cards, given the board (a list of numbers, in the order
+    of the colors of the variant).
+    """
+    played = 0
+    playable = 0
+    for (color, number) in enumerate(board):
+        played |= sum(1 << (color + variant.num_colors * (n - 1)) for n in range(1, number + 1))
+        if number < NUM_NUMBERS:
+            playable |= 1 << (color + variant.num_colors * number)
+    return (played, playable)
+
+
+def critical_mask(played, discarded, variant):
+    """
+    Mask of the cards which are not played and whose last copy is left.
+    """
+    res = 0
+    for i in range(variant.num_cards):
+        if not played >> i & 1 and variant.copies[i] - discarded[i] == 1:
+            res |= 1 << i
+    return res
+
+
+def chop_position(knowledge, clued):
+    """
+    Position of the rightmost card not touched by clues (None if there is no such card).
+    """
+    for card_pos in range(len(knowledge) - 1, -1, -1):
+        if knowledge[card_pos] != 0 and not clued >> card_pos & 1:
+            return card_pos
+    return None
+
+
+def focus_position(knowledge, clued, touched):
+    """
+    Focus of a clue touching the given mask of positions: the chop if it is touched (save clue),
+    otherwise the leftmost card newly touched. Return the position and whether it is a save clue.
+    """
+    chop = chop_position(knowledge, clued)
+    if chop is not None and touched >> chop & 1:
+        return (chop, True)
+    new = touched & ~clued or touched
+    return ((new & -new).bit_length() - 1, False)
+
+
+def receive_clue(knowledge, clued, touched, clue, playable, critical, variant):
+    """
+    Update the knowledge (list of masks) of a player who receives a clue touching the given mask of positions,
+    given the mask of his positions already touched by clues and the masks of the playable and critical cards.
+    Return the new mask of clued positions.
+    """
+    (focus, save) = focus_position(knowledge, clued, touched)
+
+    positive = variant.clue_cards[clue]
+    negative = variant.all_cards & ~positive
+    for card_pos in range(len(knowledge)):
+        knowledge[card_pos] &= positive if touched >> card_pos & 1 else negative
+
+    # the focus is playable (or critical, for a save clue), unless this is inconsistent with the clue
+    meaning = playable | critical if save else playable
+    if knowledge[focus] & meaning:
+        knowledge[focus] &= meaning
+
+    return clued | touched
+
+
+def shift_knowledge(knowledge, clued, card_pos, new_card_exists, variant):
+    """
+    Update the knowledge of a player whose card in the given position leaves the hand.
+    Return the new mask of clued positions.
+    """
+    knowledge[1:card_pos + 1] = knowledge[:card_pos]
+    knowledge[0] = variant.all_cards if new_card_exists else 0
+    low = clued & ((1 << card_pos) - 1)
+    return clued >> (card_pos + 1) << (card_pos + 1) | low << 1
+
+
+def to_action(action, variant):
+    """
+    Construct the Action object corresponding to an action of a State.
+    """
+    if action[0] == Action.PLAY:
+        return PlayAction(action[1])
+    elif action[0] == Action.DISCARD:
+        return DiscardAction(action[1])
+    else:
+        (clue_type, value) = variant.clues[action[2]]
+        return ClueAction(action[1], clue_type=clue_type, value=value)
+
+
+def from_action(action, variant):
+    """
+    Construct the action of a State corresponding to an Action object.
+    """
+    if action.type == Action.CLUE:
+        return (Action.CLUE, action.target_id, action_clue_code(action, variant))
+    else:
+        return (action.type, action.card_pos)
+
+
+
+class State:
+    """
+    State of a game (see the module docstring).
+    """
+    __slots__ = ('variant', 'num_players', 'k', 'hands', 'deck', 'board', 'playable', 'played', 'discarded',
+                 'clues', 'lives', 'turn', 'last_turn', 'over', 'knowledge', 'clued')
+
+    def copy(self):
+        """
+        Copy of the state (lists are copied, cards are integers).
+        """
+        res = State.__new__(State)
+        res.variant = self.variant
+        res.num_players = self.num_players
+        res.k = self.k
+        res.hands = [list(hand) for hand in self.hands]
+        res.deck = list(self.deck)
+        res.board = list(self.board)
+        res.playable = self.playable
+        res.played = self.played
+        res.discarded = list(self.discarded)
+        res.clues = self.clues
+        res.lives = self.lives
+        res.turn = self.turn
+        res.last_turn = self.last_turn
+        res.over = self.over
+        res.knowledge = [list(knowledge) for knowledge in self.knowledge]
+        res.clued = list(self.clued)
+        return res
+
+
+    @classmethod
+    def from_game(cls, game, knowledge=None, clued=None):
+        """
+        Construct the state of the given game (with full information).
+        The public knowledge of the players can be given; by default, nobody knows anything.
+        """
+        variant = game.variant
+        res = State.__new__(State)
+        res.variant = variant
+        res.num_players = game.num_players
+        res.k = game.k
+        res.hands = [[variant.card_index(card) if card is not None else -1 for card in player.hand] for player in game.players]
+        res.deck = [variant.card_index(card) for card in game.deck]
+        res.board = [game.board[color] for color in variant.colors]
+        (res.played, res.playable) = board_masks(res.board, variant)
+        res.discarded = [0] * variant.num_cards
+        for card in game.discard_pile:
+            res.discarded[variant.card_index(card)] += 1
+        for i in range(variant.num_cards):
+            if res.played >> i & 1:
+                res.discarded[i] -= 1   # the discard pile of Game includes the cards on the board
+        res.clues = game.clues
+        res.lives = game.lives
+        res.turn = game.get_current_turn()
+        res.last_turn = game.last_turn
+        res.over = False
+        res.knowledge = knowledge if knowledge is not None else [[variant.all_cards if card >= 0 else 0 for card in hand] for hand in res.hands]
+        res.clued = clued if clued is not None else [0] * game.num_players
+        return res
+
+
+    def score(self):
+        return sum(self.board)
+
+
+    def current_player(self):
+        return self.turn % self.num_players
+
+
+    def knows_playable(self, player_id, card_pos):
+        """
+        Does the given player know that his card in the given position is playable?
+        """
+        mask = self.knowledge[player_id][card_pos]
+        return mask != 0 and mask & ~self.playable == 0
+
+
+    def knows_useless(self, player_id, card_pos):
+        """
+        Does the given player know that his card in the given position was already played?
+        """
+        mask = self.knowledge[player_id][card_pos]
+        return mask != 0 and mask & ~self.played == 0
+
+
+    def clue_mask(self, target_id, clue):
+        """
+        Mask of the positions of the given player touched by the given clue.
+        """
+        cards = self.variant.clue_cards[clue]
+        mask = 0
+        for (card_pos, card) in enumerate(self.hands[target_id]):
+            if card >= 0 and cards >> card & 1:
+                mask |= 1 << card_pos
+        return mask
+
+
+    def legal_clues(self, target_id):
+        """
+        Codes of the clues which can be given to the given player.
+        """
+        res = set()
+        for card in self.hands[target_id]:
+            if card >= 0:
+                res.update(self.variant.card_clues[card])
+        return sorted(res)
+
+
+    def useful_clue(self, target_id, clue, critical):
+        """
+        Does the given clue follow the convention, i.e. is its focus a playable card, or a critical card
+        on the chop (save clue)?
+        """
+        touched = self.clue_mask(target_id, clue)
+        (focus, save) = focus_position(self.knowledge[target_id], self.clued[target_id], touched)
+        card = self.hands[target_id][focus]
+        return (self.playable | critical if save else self.playable) >> card & 1
+
+
+    def legal_actions(self, player_id, informed=False, conventional=False):
+        """
+        Legal actions of the given player. If informed is True, only the cards which the player knows
+        to be playable can be played. If conventional is True, only the clues which follow the convention
+        are given (see useful_clue()). As in Game, discarding is legal even with all the clues.
+        """
+        hand = self.hands[player_id]
+        actions = []
+        for card_pos in range(self.k):
+            if hand[card_pos] >= 0:
+                if not informed or self.knows_playable(player_id, card_pos):
+                    actions.append((Action.PLAY, card_pos))
+                actions.append((Action.DISCARD, card_pos))
+
+        if self.clues > 0:
+            critical = critical_mask(self.played, self.discarded, self.variant) if conventional else 0
+            for target_id in range(self.num_players):
+                if target_id != player_id:
+                    for clue in self.legal_clues(target_id):
+                        if not conventional or self.useful_clue(target_id, clue, critical):
+                            actions.append((Action.CLUE, target_id, clue))
+        return actions
+
+
+    def remove_card(self, player_id, card_pos):
+        # the card leaves the hand, and a new card is drawn
+        hand = self.hands[player_id]
+        card = hand.pop(card_pos)
+        if self.deck:
+            hand.insert(0, self.deck.pop())
+            if not self.deck:
+                self.last_turn = self.turn + self.num_players
+        else:
+            hand.insert(0, -1)
+        self.clued[player_id] = shift_knowledge(self.knowledge[player_id], self.clued[player_id], card_pos, hand[0] >= 0, self.variant)
+        return card
+
+
+    def step(self, action):
+        """
+        Apply the action of the current player.
+        """
+        player_id = self.turn % self.num_players
+        end_game = self.last_turn is not None and self.turn >= self.last_turn
+
+        if action[0] == Action.PLAY:
+            card = self.remove_card(player_id, action[1])
+            num_colors = self.variant.num_colors
+            (color, number) = (card % num_colors, card // num_colors + 1)
+            if self.board[color] + 1 == number:
+                # play is successful
+                self.board[color] = number
+                self.played |= 1 << card
+                self.playable &= ~(1 << card)
+                if number < NUM_NUMBERS:
+                    self.playable |= 1 << (card + num_colors)
+                elif self.clues < MAX_CLUES:
+                    self.clues += 1
+            else:
+                self.discarded[card] += 1
+                self.lives -= 1
+                end_game = end_game or self.lives == 0
+
+        elif action[0] == Action.DISCARD:
+            card = self.remove_card(player_id, action[1])
+            self.discarded[card] += 1
+            if self.clues < MAX_CLUES:
+                self.clues += 1
+
+        else:
+            (_, target_id, clue) = action
+            assert self.clues > 0
+            self.clues -= 1
+            touched = self.clue_mask(target_id, clue)
+            assert touched != 0
+            self.clued[target_id] = receive_clue(self.knowledge[target_id], self.clued[target_id], touched, clue,
+                                                 self.playable, critical_mask(self.played, self.discarded, self.variant), self.variant)
+
+        self.turn += 1
+        self.over = end_game
+
+
+    def policy_action(self, player_id):
+        """
+        Cheap heuristic action, using the real cards of the other players and the knowledge of the player
+        about his own cards (used for rollouts).
+        """
+        hand = self.hands[player_id]
+        unplayable = ~self.playable
+
+        # play a card known to be playable
+        for (card_pos, mask) in enumerate(self.knowledge[player_id]):
+            if mask != 0 and mask & unplayable == 0:
+                return (Action.PLAY, card_pos)
+
+        if self.clues > 0:
+            # save the critical chop of the next player, with a number clue
+            target_id = (player_id + 1) % self.num_players
+            chop = chop_position(self.knowledge[target_id], self.clued[target_id])
+            if chop is not None:
+                card = self.hands[target_id][chop]
+                if critical_mask(self.played, self.discarded, self.variant) >> card & 1 and not self.playable >> card & 1:
+                    return (Action.CLUE, target_id, self.variant.number_clues[card // self.variant.num_colors + 1])
+
+            # give a clue whose focus is a playable card not known to be playable
+            for i in range(1, self.num_players):
+                target_id = (player_id + i) % self.num_players
+                target_hand = self.hands[target_id]
+                knowledge = self.knowledge[target_id]
+                clued = self.clued[target_id]
+                for card_pos in range(self.k):
+                    card = target_hand[card_pos]
+                    if card >= 0 and self.playable >> card & 1 and knowledge[card_pos] & unplayable:
+                        for clue in self.variant.card_clues[card]:
+                            touched = self.clue_mask(target_id, clue)
+                            if focus_position(knowledge, clued, touched) == (card_pos, False):
+                                return (Action.CLUE, target_id, clue)
+
+        if self.clues < MAX_CLUES:
+            # discard a card known to be useless, or the rightmost card not touched by clues
+            chop = None
+            for card_pos in range(self.k):
+                if hand[card_pos] >= 0:
+                    if self.knows_useless(player_id, card_pos):
+                        return (Action.DISCARD, card_pos)
+                    if not self.clued[player_id] >> card_pos & 1:
+                        chop = card_pos
+            if chop is not None:
+                return (Action.DISCARD, chop)
+            return (Action.DISCARD, max(card_pos for card_pos in range(self.k) if hand[card_pos] >= 0))
+
+        # give any clue to the next player
+        target_id = (player_id + 1) % self.num_players
+        return (Action.CLUE, target_id, self.legal_clues(target_id)[0])
+
+
+    def rollout(self):
+        """
+        Play the game until the end with the heuristic policy, and return the score.
+        """
+        while not self.over:
+            self.step(self.policy_action(self.turn % self.num_players))
+        return self.score()
+
+
+
+class Tracker:
+    """
+    Public knowledge of the players in the form of State (knowledge and clued positions, played, playable and
+    discarded cards), kept by a strategy from the turns of the real game, and what each player can infer
+    from the visible cards (see knowledge.Empathy).
+
+    The strategy must have the attributes needed by Empathy (including full_deck), and my_hand, board, discard_pile
+    and game; feed_turn() must be called after each turn, once the strategy is updated.
+    """
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        variant = self.variant = strategy.variant
+
+        self.knowledge = [[variant.all_cards] * strategy.k for player_id in range(strategy.num_players)]
+        self.clued = [0] * strategy.num_players
+        self.empathy = Empathy(strategy)
+
+        # played and playable cards (masks) and discarded cards (counts, without the played ones), as in State;
+        # they give the meaning of the clues
+        (self.played, self.playable) = board_masks([strategy.board[color] for color in variant.colors], variant)
+        self.discarded = [0] * variant.num_cards
+        for card in strategy.discard_pile:
+            self.discarded[variant.card_index(card)] += 1
+        for i in range(variant.num_cards):
+            if self.played >> i & 1:
+                self.discarded[i] -= 1
+
+
+    def feed_turn(self, player_id, action):
+        """
+        Update the knowledge after the given turn.
+        """
+        strategy = self.strategy
+        variant = self.variant
+        if action.type in [Action.PLAY, Action.DISCARD]:
+            hand = strategy.my_hand if player_id == strategy.id else strategy.hands[player_id]
+            self.clued[player_id] = shift_knowledge(self.knowledge[player_id], self.clued[player_id], action.card_pos, hand[0] is not None, variant)
+            self.empathy.shift(player_id, action.card_pos, hand[0] is not None)
+
+            # the card is the last one of the discard pile (which includes the cards on the board)
+            card = strategy.discard_pile[-1]
+            i = variant.card_index(card)
+            if action.type == Action.PLAY and not self.played >> i & 1 and strategy.board[card.color] == card.number:
+                self.played |= 1 << i
+                self.playable &= ~(1 << i)
+                if card.number < NUM_NUMBERS:
+                    self.playable |= 1 << (i + variant.num_colors)
+            else:
+                self.discarded[i] += 1
+        else:
+            clue = action_clue_code(action, variant)
+            self.clued[action.target_id] = receive_clue(self.knowledge[action.target_id], self.clued[action.target_id], action.touched, clue,
+                                                        self.playable, critical_mask(self.played, self.discarded, variant), variant)
+            self.empathy.clue(action.target_id, action.touched, clue)
+        self.empathy.refresh()
+
+
+    def state(self):
+        """
+        The current state, without my cards and the deck (see deal()).
+        """
+        strategy = self.strategy
+        state = State.from_game(strategy.game, knowledge=[list(knowledge) for knowledge in self.knowledge], clued=list(self.clued))
+        state.hands[strategy.id] = [-1] * strategy.k
+        state.deck = []
+        return state
+
+
+    def sampler(self):
+        """
+        Sampler of my hand and the deck (see belief.DealSampler): my possible cards are given by the public
+        knowledge, unless it is inconsistent (e.g. after a clue which did not follow the convention),
+        and by what I can infer from the visible cards.
+        """
+        strategy = self.strategy
+        masks = [public & private for (public, private) in zip(self.knowledge[strategy.id], self.empathy[strategy.id])]
+        try:
+            return DealSampler.from_strategy(strategy, masks)
+        except ValueError:
+            return DealSampler.from_strategy(strategy, self.empathy[strategy.id])
+
+
+    def deal(self, state, sampler, rng=random):
+        """
+        Copy of the given state (see state()) with a sampled deal of my hand and the deck.
+        """
+        state = state.copy()
+        (hand, deck) = sampler.sample_deal(rng)
+        state.hands[self.strategy.id] = [i if i is not None else -1 for i in hand]
+        state.deck = deck
+        return state
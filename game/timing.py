@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time spent by the strategies, measured by the engine.
+Calls are measured after they return: a call which takes too long is recorded as an overrun, and with a hard
+deadline (see Game) its action is replaced by the default action, but it is never interrupted.
+"""
+
+# phases of a strategy
+INITIALIZE = 'initialize'
+DECISION = 'decision'   # get_turn_action()
+FEED = 'feed'           # feed_turn()
+
+PHASES = [INITIALIZE, DECISION, FEED]
+
+
+class Timing:
+    """
+    Time spent by a strategy in a phase, with the number of overruns (calls which took longer than the limit).
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.overruns = 0
+
+
+    def __repr__(self):
+        return "%d calls, mean %.1f ms, max %.1f ms, %d overruns" % (self.calls, self.mean() * 1000, self.max * 1000, self.overruns)
+
+
+    def mean(self):
+        return self.total / self.calls if self.calls > 0 else 0.0
+
+
+    def record(self, elapsed, limit=None):
+        """
+        Record a call which took the given time (in seconds); it is an overrun if it took longer than the limit.
+        Return whether it is an overrun.
+        """
+        self.calls += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+        overrun = limit is not None and elapsed > limit
+        if overrun:
+            self.overruns += 1
+        return overrun
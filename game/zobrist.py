@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Zobrist hashing of game states (see Game.key), e.g. for transposition tables.
+
+The key of a state is the XOR of one random 64-bit number for each component: the height of each stack
+of the board, the number of clues and of lives, the card in each position of each hand, the size of the deck,
+the number of discarded copies of each card, the player to move and the number of turns left in the last round.
+Each action changes only a few components, so the key is updated in constant time.
+Cards are identified by their appearance (see Variant.card_index() in deck.py), so states which only differ by
+the copies of the same card have the same key. The numbers are enough for every type of deck.
+"""
+
+import random
+
+from .card import Card
+from .deck import VARIANTS
+
+
+MAX_PLAYERS = 5
+MAX_K = 5
+MAX_CLUES = 8
+MAX_LIVES = 3
+MAX_DECK = 50
+MAX_COPIES = 3
+MAX_COLORS = max(variant.num_colors for variant in VARIANTS.values())
+MAX_CARDS = max(variant.num_cards for variant in VARIANTS.values())
+
+# the numbers are always the same, so that keys can be stored and compared between runs
+generator = random.Random(0x5EED)
+
+
+def random_keys(n):
+    return [generator.getrandbits(64) for i in range(n)]
+
+
+BOARD = [random_keys(Card.NUM_NUMBERS + 1) for color in range(MAX_COLORS)]
+CLUES = random_keys(MAX_CLUES + 1)
+LIVES = random_keys(MAX_LIVES + 1)
+HAND = [[random_keys(MAX_CARDS + 1) for card_pos in range(MAX_K)] for player_id in range(MAX_PLAYERS)]   # the last one is an empty position
+DECK = random_keys(MAX_DECK + 1)
+DISCARDED = [[0] + random_keys(MAX_COPIES) for i in range(MAX_CARDS)]
+TO_MOVE = random_keys(MAX_PLAYERS)
+TURNS_LEFT = [0] + random_keys(MAX_PLAYERS + 2)     # the first one is before the last round
+
+
+def card_key(player_id, card_pos, card, variant):
+    """
+    Number of the given card (possibly None) in the given position of the hand of the given player.
+    """
+    return HAND[player_id][card_pos][variant.card_index(card) if card is not None else MAX_CARDS]
+
+
+def hand_key(player_id, hand, variant, last_pos=None):
+    """
+    XOR of the numbers of the cards in the positions 0, ..., last_pos (by default, all) of the given hand.
+    """
+    res = 0
+    for card_pos in range(len(hand) if last_pos is None else last_pos + 1):
+        res ^= card_key(player_id, card_pos, hand[card_pos], variant)
+    return res
+
+
+def turn_key(num_players, turn, last_turn):
+    """
+    Number of the player to move and of the turns left in the last round (if last_turn is not None).
+    """
+    return TO_MOVE[turn % num_players] ^ TURNS_LEFT[0 if last_turn is None else last_turn - turn + 2]
+
+
+def state_key(game):
+    """
+    Part of the key of the given game which does not depend on the turn (computed from scratch,
+    see Game.zobrist).
+    """
+    res = CLUES[game.clues] ^ LIVES[game.lives] ^ DECK[len(game.deck)]
+    for (i, color) in enumerate(game.variant.colors):
+        res ^= BOARD[i][game.board[color]]
+    for player in game.players:
+        res ^= hand_key(player.id, player.hand, game.variant)
+    for (i, count) in enumerate(game.discard_counts):
+        res ^= DISCARDED[i][count]
+    return res
@@ -1,6 +1,7 @@
 import sys
 
 from game.game import Game
+from game.deck import DECK50, DECK55
 
 if __name__ == "__main__":
     # default values
@@ -12,6 +13,7 @@ if __name__ == "__main__":
     strategy_log = False
     dump_deck_to = "deck.txt"
     load_deck_from = None
+    deck_type = DECK50
     short_log = False
     interactive = False
     quit_immediately = False
@@ -46,6 +48,10 @@ if __name__ == "__main__":
         assert len(sys.argv) >= i+2
         dump_deck_to = sys.argv[i+1]
     
+    if '-b' in sys.argv[1:]:
+        # use the 55-card deck (as in the challenges)
+        deck_type = DECK55
+    
     if '-n' in sys.argv[1:]:
         # read number of players
         i = sys.argv.index('-n')
@@ -84,6 +90,7 @@ if __name__ == "__main__":
                 strategy_log=strategy_log,
                 dump_deck_to=dump_deck_to,
                 load_deck_from=load_deck_from,
+                deck_type=deck_type,
             )
 
         game.setup()
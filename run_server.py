@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Run the game server (see game/server.py for the protocol).
+Usage: python run_server.py [-P PORT] [-w NUM_WORKERS] [-a AI] [-T SECONDS]
+"""
+
+import sys
+import asyncio
+
+from game.server import Server, HOST, PORT, AIS
+
+if __name__ == "__main__":
+    # default values
+    port = PORT
+    num_workers = None
+    ai = "alphahanabi"
+    timeout = 60.0
+
+    args = sys.argv[1:]
+    while args:
+        option = args.pop(0)
+        if option == '-P':
+            port = int(args.pop(0))
+        elif option == '-w':
+            num_workers = int(args.pop(0))
+        elif option == '-a':
+            ai = args.pop(0)
+            assert ai in AIS
+        elif option == '-T':
+            timeout = float(args.pop(0))
+        else:
+            raise ValueError("Unknown option %s" % option)
+
+    server = Server(num_workers=num_workers, ai=ai, timeout=timeout)
+    print("Listening on %s:%d" % (HOST, port))
+    try:
+        asyncio.run(server.serve(port=port))
+    except KeyboardInterrupt:
+        pass
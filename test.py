@@ -6,7 +6,8 @@ import multiprocessing_on_dill as multiprocessing
 import sys
 
 from game.game import Game
-from game.deck import DECK50
+from game.deck import DECK50, VARIANTS
+from game.deck_analysis import analyse_deck
 
 if __name__ == "__main__":
     # default values
@@ -15,6 +16,12 @@ if __name__ == "__main__":
     num_players = 4
     num_simulations = 10
     deck_type = DECK50
+    time_per_move = None
+    hard_deadline = False
+    vector_beliefs = False
+    optimal_nodes = None
+    bot_command = None
+    bot_processes = 1
 
 
     if '-a' in sys.argv[1:]:
@@ -45,15 +52,45 @@ if __name__ == "__main__":
         # choose deck type
         i = sys.argv.index('-d')
         assert len(sys.argv) >= i+2
-        assert sys.argv[i+1] in ['standard']
-        if sys.argv[i+1] == 'standard':
-            deck_type = DECK50
+        deck_type = DECK50 if sys.argv[i+1] == 'standard' else sys.argv[i+1]
+        assert deck_type in VARIANTS
+
+    if '-T' in sys.argv[1:]:
+        # set time per move (in milliseconds)
+        i = sys.argv.index('-T')
+        assert len(sys.argv) >= i+2
+        time_per_move = int(sys.argv[i+1]) / 1000.0
+
+    if '-H' in sys.argv[1:]:
+        # replace late actions with the default action of the strategy
+        hard_deadline = True
+
+    if '-V' in sys.argv[1:]:
+        # keep the beliefs of all the players in the game (requires NumPy)
+        vector_beliefs = True
+
+    if '-O' in sys.argv[1:]:
+        # compare with the best possible scores (maximum number of nodes searched for each deck)
+        i = sys.argv.index('-O')
+        assert len(sys.argv) >= i+2
+        optimal_nodes = int(sys.argv[i+1])
+
+    if '-R' in sys.argv[1:]:
+        # play with an external bot (see game/bot_protocol.py), run by the given command
+        i = sys.argv.index('-R')
+        assert len(sys.argv) >= i+2
+        bot_command = sys.argv[i+1]
+
+    if '-w' in sys.argv[1:]:
+        # number of processes of the external bot
+        i = sys.argv.index('-w')
+        assert len(sys.argv) >= i+2
+        bot_processes = int(sys.argv[i+1])
 
     results = []
 
     print("Starting %d simulations with %d players..." % (num_simulations, num_players))
-    def run_game(i):
-        #print(i, end=' ', file=sys.stderr, flush = True)
+    def new_game(ai, ai_params):
         game = Game(
                 num_players=num_players,
                 ai=ai,
@@ -62,15 +99,35 @@ if __name__ == "__main__":
                 dump_deck_to='deck.txt',
                 load_deck_from=None,
                 deck_type=deck_type,
+                time_per_move=time_per_move,
+                hard_deadline=hard_deadline,
+                vector_beliefs=vector_beliefs,
             )
 
         game.setup()
+        return game
+
+    def run_game(i):
+        #print(i, end=' ', file=sys.stderr, flush = True)
+        game = new_game(ai, ai_params)
         for current_player, turn in game.run_game():
             pass
-        return game.statistics
-    pool = multiprocessing.Pool(4)
-    #pool.map = map # uncomment for debugging purposes
-    results = pool.map(run_game, list(range(num_simulations)))
+        return game.statistics, game.initial_deck
+
+    if bot_command is None:
+        pool = multiprocessing.Pool(4)
+        #pool.map = map # uncomment for debugging purposes
+        results, initial_decks = zip(*pool.map(run_game, list(range(num_simulations))))
+    else:
+        # the games are played at the same time, and the requests of all the games are sent
+        # to the bot processes in one round trip
+        from game.bot_protocol import BotPool, run_games
+        games = [new_game('remote', {'command': bot_command, 'processes': bot_processes, 'params': ai_params}) for i in range(num_simulations)]
+        try:
+            run_games(games)
+        finally:
+            BotPool.close_all()
+        results, initial_decks = zip(*[(game.statistics, game.initial_deck) for game in games])
     print()
 
     scores = [statistics.score for statistics in results]
@@ -81,10 +138,35 @@ if __name__ == "__main__":
     print("Average result:", float(sum(scores)) / len(scores))
     print("Best result:", max(scores))
     print("Worst result:", min(scores))
-    print("Rate of perfect scores: %.2f %%" % (float(scores.count(25)) / len(scores) * 100.0))
+    print("Rate of perfect scores: %.2f %%" % (float(scores.count(VARIANTS[deck_type].max_score)) / len(scores) * 100.0))
 
     lives = [statistics.lives for statistics in results]
     print("Average number of remaining lives:", float(sum(lives)) / len(lives))
 
     num_turns = [statistics.num_turns for statistics in results]
     print("Average number of turns:", float(sum(num_turns)) / len(num_turns))
+
+    if time_per_move is not None:
+        overruns = [statistics.overruns for statistics in results]
+        print("Average number of overruns:", float(sum(overruns)) / len(overruns))
+
+    # maximum scores allowed by the order of the decks (see game/deck_analysis.py)
+    analyses = [analyse_deck(deck, num_players, deck_type) for deck in initial_decks]
+    bounds = [analysis.max_score for analysis in analyses]
+    print("Average maximum score allowed by the decks:", float(sum(bounds)) / len(bounds))
+    print("Games below the maximum score of their deck: %d/%d" % (sum(s < b for (s, b) in zip(scores, bounds)), len(scores)))
+
+    if optimal_nodes is not None:
+        # best possible scores with full information (cached, see game/solver.py);
+        # a game with the maximum score of its deck is already optimal
+        from game.solver import Solution, solve_decks
+        below = [i for (i, s) in enumerate(scores) if s < bounds[i]]
+        solutions = [Solution(score=s, upper_bound=s, nodes=0) for s in scores]
+        for (i, solution) in zip(below, solve_decks([initial_decks[i] for i in below], num_players, deck_type=deck_type, max_nodes=optimal_nodes, cache_file='optimal.json')):
+            solutions[i] = solution
+        optimal = [solution.score for solution in solutions]
+        bounds = [solution.upper_bound for solution in solutions]
+        print("Average optimal score: %.3f (at most %.3f)" % (float(sum(optimal)) / len(optimal), float(sum(bounds)) / len(bounds)))
+        gaps = [o - s for (o, s) in zip(optimal, scores)]
+        print("Average gap to optimal score:", float(sum(gaps)) / len(gaps))
+        print("Games with proven optimal score: %d/%d" % (sum(o == b for (o, b) in zip(optimal, bounds)), len(solutions)))